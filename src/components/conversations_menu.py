@@ -1,12 +1,12 @@
 import streamlit as st
 from langchain_core.messages.human import HumanMessage
 from langchain_core.messages.ai import AIMessage
-from tools.chat import get_all_users_chats, get_chat_session, display_chat
-from tools.user import get_all_users
+from tools.chat import get_chat_history, get_chat_session, display_chat
+from tools.user import get_usernames
 from utils.helpers import clear_chat_states
 
 def conversations_menu():
-    users = get_all_users()
+    users = get_usernames()
     user_options = {user["username"]: user["_id"] for user in users}
 
     st.subheader("Chats Preview")
@@ -19,12 +19,14 @@ def conversations_menu():
                 selected_user_id = user_options[selected_username]
                 if st.session_state.user_preview_id != selected_user_id:
                     st.session_state.user_preview_id = selected_user_id
+                    st.session_state.history_pages = 1
                     clear_chat_states()
                     st.rerun()
 
             if st.session_state.user_preview_id is not None:
                 st.markdown("#### History")
-                for chat in get_all_users_chats({"user_id": st.session_state.user_preview_id}):
+                chats, has_more = get_chat_history(st.session_state.user_preview_id, st.session_state.history_pages)
+                for chat in chats:
                     if st.session_state.chat_session_id == chat["session_id"]:
                         chat_button = st.button(chat["title"], use_container_width=True, type="primary", key=chat["session_id"])
                     else:
@@ -36,12 +38,16 @@ def conversations_menu():
                         st.session_state.chat_title = chat["title"]
 
                         chat_session_messages = get_chat_session(st.session_state.chat_session_id)
-                        for message in chat_session_messages.messages:
+                        for message in chat_session_messages:
                             if isinstance(message, HumanMessage):
                                 st.session_state.messages.append({"role": "user", "content": message.content})
                             elif isinstance(message, AIMessage):
                                 st.session_state.messages.append({"role": "assistant", "content": message.content})
 
+                if has_more and st.button("Load more", use_container_width=True, key="load_more_preview"):
+                    st.session_state.history_pages += 1
+                    st.rerun()
+
         with chat_col2:
             if st.session_state.chat_title is not None:
                 st.subheader(st.session_state.chat_title)
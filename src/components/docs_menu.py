@@ -1,9 +1,10 @@
 import os
 import json
+import math
 import streamlit as st
 import pandas as pd
 from streamlit_pdf_viewer import pdf_viewer
-from tools.rag import get_all_vectors, delete_all_vectors, create_vectors, create_json_vectors, upload_pdf, delete_pdf, upload_json, delete_json
+from tools.rag import ALL_SOURCES, get_vectors_page, count_vectors, get_vector_source_counts, delete_all_vectors, create_vectors, create_json_vectors, build_local_index, upload_pdf, delete_pdf, upload_json, delete_json
 
 def docs_menu():
     current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -126,14 +127,37 @@ def docs_menu():
 
     with st.container():
         st.subheader("Vector stores in DB")
-        vectors = get_all_vectors()
+        source_counts = get_vector_source_counts()
+        count_col1, count_col2 = st.columns(2)
+        with count_col1.container(border=True):
+            st.metric("Total Vectors", sum(source_counts.values()))
+        with count_col2.container(border=True):
+            st.metric("Sources", len(source_counts))
+
+        filter_col1, filter_col2, filter_col3 = st.columns([0.4, 0.4, 0.2])
+        with filter_col1:
+            search = st.text_input("Search text")
+        with filter_col2:
+            source_options = {f"{source or 'No source'} ({count})": source for source, count in source_counts.items()}
+            selected_source = st.selectbox("Source", options=["All sources"] + list(source_options.keys()))
+            source = source_options.get(selected_source, ALL_SOURCES)
+        with filter_col3:
+            page_size = st.selectbox("Page size", options=[25, 50, 100], index=1)
+
+        total = count_vectors(search, source)
+        num_pages = max(1, math.ceil(total / page_size))
+        page = st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages, value=1)
+        vectors = get_vectors_page(page, page_size, search, source)
 
         if vectors:
             vectors_data_list = []
-            for i, vector in enumerate(vectors, start=1):
+            for i, vector in enumerate(vectors, start=(page - 1) * page_size + 1):
                 vec = {
                     "No.": i,
                     "Text": vector["text"],
+                    "Source": vector["source"],
+                    "Page": vector["page"],
+                    "Section": vector["section"],
                 }
                 vectors_data_list.append(vec)
 
@@ -151,31 +175,56 @@ def docs_menu():
                     "Text": st.column_config.Column(
                         "Text",
                         width="large",
+                    ),
+                    "Source": st.column_config.Column(
+                        "Source",
+                        width="small",
                     )
                 },
                 width=700
             )
+            st.caption(f"Showing {len(vectors)} of {total} matching vectors.")
         else:
             st.write("No vectors found.")
 
-        vec_col1, vec_col2, vec_col3 = st.columns([0.2, 0.2, 0.6])
+        vec_col1, vec_col2, vec_col3, vec_col4 = st.columns([0.2, 0.2, 0.2, 0.4])
         with vec_col1:
-            if st.button("Create PDF Vectors"):
-                create_vectors()
+            if st.button("Sync PDF Vectors"):
+                ingestion_toast(create_vectors())
                 st.cache_data.clear()
                 st.rerun()
         with vec_col2:
-            if st.button("Create JSON Vectors"):
-                create_json_vectors()
+            if st.button("Sync JSON Vectors"):
+                ingestion_toast(create_json_vectors())
                 st.cache_data.clear()
                 st.rerun()
         with vec_col3:
+            if st.button("Build Local Index"):
+                try:
+                    index_meta = build_local_index()
+                    if index_meta is None:
+                        st.warning("No vectors to index. Sync the documents first.")
+                    else:
+                        st.success(f"Built {index_meta['index_type']} index with {index_meta['count']} vectors")
+                except Exception as e:
+                    st.error(f"{e} {e.__cause__ or ''}")
+        with vec_col4:
             if st.button("Delete All Vectors", type="primary"):
                 delete_all_vectors()
                 st.cache_data.clear()
                 st.rerun()
 
 
+def ingestion_toast(stats):
+    """Shows the file changes and throughput of a vector sync run."""
+    if stats is None:
+        st.toast("Failed to create vectors!")
+    else:
+        st.toast(
+            f"{stats['new']} new, {stats['changed']} changed, {stats['removed']} removed and {stats['unchanged']} unchanged files. "
+            f"Stored {stats['chunks']} vectors in {stats['seconds']:.1f}s ({stats['chunks_per_sec']:.1f} chunks/sec)"
+        )
+
 def pdf_preview(filename, path):
     file_path = os.path.join(path, filename)
     with open(file_path, "rb") as f:
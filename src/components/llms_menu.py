@@ -1,38 +1,83 @@
 import os
 import streamlit as st
 import pandas as pd
-from tools.evaluations.evaluation import evaluate_chatbot
+from tools.cache import get_model_registry, get_semantic_cache, get_query_embedding_cache, get_retrieval_cache
 from tools.chat import load_llm_model
+from tools.persistence import get_chat_turn_writer, is_write_behind_enabled
+from tools.warmup import DEFAULT_MODEL_CONFIG
 
 def llms_menu():
     TEMPERATURE_RANGE = (0.1, 2.0)
     TOP_P_RANGE = (0.1, 1.0)
     MAX_TOKENS_RANGE = (100, 5000)
-    model_config = {
-        "model_name": "meta-llama/Meta-Llama-3-8B-Instruct",
-        "temperature": 1.0,
-        "top_p": 0.8,
-        "max_tokens": 4000
-    }
+    MODEL_NAMES = ["meta-llama/Meta-Llama-3-8B-Instruct", "mistralai/Mistral-7B-Instruct-v0.3", "HuggingFaceH4/zephyr-7b-beta"]
+    model_config = dict(st.session_state.model_config or DEFAULT_MODEL_CONFIG)
 
     st.subheader("Model Configuration")
     with st.form("config"):
         col1, col2 = st.columns(2)
         with col1:
-            model_config["temperature"] = st.slider("Temperature", min_value=TEMPERATURE_RANGE[0], max_value=TEMPERATURE_RANGE[1], step=0.01, value=1.0)
-            model_config["top_p"] = st.slider("Top-P (Nucleus) Sampling", min_value=TOP_P_RANGE[0], max_value=TOP_P_RANGE[1], step=0.01, value=0.8)
-            model_config["max_tokens"] = st.slider("Max Tokens", min_value=MAX_TOKENS_RANGE[0], max_value=MAX_TOKENS_RANGE[1], step=100, value=4000)
+            model_config["temperature"] = st.slider("Temperature", min_value=TEMPERATURE_RANGE[0], max_value=TEMPERATURE_RANGE[1], step=0.01, value=model_config["temperature"])
+            model_config["top_p"] = st.slider("Top-P (Nucleus) Sampling", min_value=TOP_P_RANGE[0], max_value=TOP_P_RANGE[1], step=0.01, value=model_config["top_p"])
+            model_config["max_tokens"] = st.slider("Max Tokens", min_value=MAX_TOKENS_RANGE[0], max_value=MAX_TOKENS_RANGE[1], step=100, value=model_config["max_tokens"])
 
         with col2:
-            model_config["model_name"] = st.radio("Choose model", ["meta-llama/Meta-Llama-3-8B-Instruct", "mistralai/Mistral-7B-Instruct-v0.3", "HuggingFaceH4/zephyr-7b-beta"])
+            model_config["model_name"] = st.radio("Choose model", MODEL_NAMES, index=MODEL_NAMES.index(model_config["model_name"]))
         if st.form_submit_button("Save"):
-            st.session_state.llm_model = load_llm_model(model_config)
+            st.session_state.model_config = model_config
+            load_llm_model(model_config)
+
+    st.subheader("Caches")
+    cache_metrics("Response", get_semantic_cache().stats())
+    cache_metrics("Query Embedding", get_query_embedding_cache().stats())
+    cache_metrics("Retrieval", get_retrieval_cache().stats())
+    if st.button("Clear Caches"):
+        get_semantic_cache().clear()
+        get_query_embedding_cache().clear()
+        get_retrieval_cache().clear()
+        st.rerun()
+
+    st.subheader("Loaded Models")
+    registry_stats = get_model_registry().stats()
+    model_col1, model_col2, model_col3, model_col4 = st.columns(4)
+    with model_col1.container(border=True):
+        st.metric("Models", registry_stats["entries"])
+    with model_col2.container(border=True):
+        st.metric("Memory", f"{registry_stats['size_bytes'] / 1024 / 1024:.0f} MB")
+    with model_col3.container(border=True):
+        st.metric("Loads", registry_stats["loads"])
+    with model_col4.container(border=True):
+        st.metric("Evictions", registry_stats["evictions"])
+    if registry_stats["models"]:
+        st.dataframe(pd.DataFrame([{
+            "Model": " / ".join(str(part) for part in model["key"] if part),
+            "In Use": model["refs"],
+            "Memory (MB)": round(model["size_bytes"] / 1024 / 1024),
+            "Idle (s)": round(model["idle_seconds"]),
+        } for model in registry_stats["models"]]), hide_index=True)
+
+    if is_write_behind_enabled():
+        st.subheader("Chat Writes")
+        writer_stats = get_chat_turn_writer().stats()
+        write_col1, write_col2, write_col3 = st.columns(3)
+        with write_col1.container(border=True):
+            st.metric("Queued", writer_stats["pending"])
+        with write_col2.container(border=True):
+            st.metric("Written", writer_stats["written"])
+        with write_col3.container(border=True):
+            st.metric("Spilled", writer_stats["spilled"])
+        if writer_stats["spilled"]:
+            st.error(f"{writer_stats['spilled']} chat turns could not be saved and are kept on disk until the database accepts writes. Last error: {writer_stats['last_error']}")
 
     eval_col1, eval_col2 = st.columns(2)
     with eval_col1:
         st.subheader("Model Evaluation")
+        use_stub = st.toggle("Use offline stub LLM", help="Runs offline on a small local sample dataset, answering from the retrieved passages without calling the LLM, for reproducible runs.")
         if st.button("Evaluate Model Performance", type="primary"):
-            if evaluate_chatbot(model_config):
+            from tools.evaluations.evaluation import evaluate_chatbot
+            progress_bar = st.progress(0.0, text="Evaluating...")
+            on_progress = lambda finished, total: progress_bar.progress(finished / total, text=f"Evaluated {finished} of {total} questions")
+            if evaluate_chatbot(model_config, use_stub=use_stub, on_progress=on_progress):
                 st.success("Model evaluation successful!")
                 st.rerun()
             else:
@@ -79,3 +124,15 @@ def llms_menu():
                 st.warning("No evaluation results found")
         else:
             st.warning("Path not found")
+
+def cache_metrics(name, cache_stats):
+    """Displays the hit rate, hits, misses and size of a cache."""
+    cache_col1, cache_col2, cache_col3, cache_col4 = st.columns(4)
+    with cache_col1.container(border=True):
+        st.metric(f"{name} Hit Rate", f"{cache_stats['hit_rate']:.0%}")
+    with cache_col2.container(border=True):
+        st.metric(f"{name} Hits", cache_stats["hits"])
+    with cache_col3.container(border=True):
+        st.metric(f"{name} Misses", cache_stats["misses"])
+    with cache_col4.container(border=True):
+        st.metric(f"{name} Entries", cache_stats["entries"])
@@ -0,0 +1,53 @@
+import streamlit as st
+import pandas as pd
+from tools.db import check_query_plans
+from tools.metrics import get_metrics_recorder
+
+def metrics_menu():
+    recorder = get_metrics_recorder()
+
+    st.subheader("Chat Request Latency")
+    summaries = recorder.summaries()
+    if summaries:
+        st.caption(f"Percentiles over the last {recorder.window_size} requests of {recorder.traces} recorded since startup.")
+        st.dataframe(
+            pd.DataFrame(summaries),
+            hide_index=True,
+            column_config={
+                "p50 (ms)": st.column_config.NumberColumn("p50 (ms)", format="%.1f"),
+                "p95 (ms)": st.column_config.NumberColumn("p95 (ms)", format="%.1f"),
+                "p99 (ms)": st.column_config.NumberColumn("p99 (ms)", format="%.1f"),
+            },
+            use_container_width=True
+        )
+    else:
+        st.write("No chat requests recorded yet.")
+
+    st.subheader("Tokens")
+    tok_col1, tok_col2, tok_col3, tok_col4 = st.columns(4)
+    with tok_col1.container(border=True):
+        st.metric("Prompt Tokens", recorder.counters.get("prompt_tokens", 0))
+    with tok_col2.container(border=True):
+        st.metric("Completion Tokens", recorder.counters.get("completion_tokens", 0))
+    with tok_col3.container(border=True):
+        st.metric("Cache Hits", recorder.counters.get("cache_hits", 0))
+    with tok_col4.container(border=True):
+        st.metric("Coalesced Requests", recorder.counters.get("coalesced_requests", 0))
+
+    with st.expander("Prometheus metrics"):
+        prometheus_text = recorder.prometheus_text()
+        st.code(prometheus_text, language="text")
+        st.download_button("Download", data=prometheus_text, file_name="chatbot_metrics.prom")
+
+    st.subheader("Query Plans")
+    if st.button("Check Query Plans"):
+        report = check_query_plans()
+        collscans = [row for row in report if row["COLLSCAN"]]
+        unexplained = [row for row in report if row["COLLSCAN"] is None]
+        if collscans:
+            st.warning(f"{len(collscans)} queries fall back to a collection scan.")
+        if unexplained:
+            st.error(f"{len(unexplained)} queries could not be explained.")
+        if all(row["COLLSCAN"] is False for row in report):
+            st.success("All queries use an index.")
+        st.dataframe(pd.DataFrame(report), hide_index=True, use_container_width=True)
@@ -15,7 +15,7 @@ def profile_modal(username):
                 with st.container(height=150, border=True):
                     st.markdown("No picture yet.")
             else:
-                st.image(convert_image_to_base64(user_data["picture_path"]), use_column_width=True)
+                st.image(convert_image_to_base64(user_data["picture_path"], thumbnail=False), use_column_width=True)
 
             with st.popover("Change profile picture"):
                 uploaded_file = st.file_uploader("Update Picture", ["jpg", "jpeg", "png"])
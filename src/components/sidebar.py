@@ -3,7 +3,7 @@ from langchain_core.messages.human import HumanMessage
 from langchain_core.messages.ai import AIMessage
 from components.profile_modal import profile_modal
 from tools.auth import logout
-from tools.chat import get_all_users_chats, get_chat_session
+from tools.chat import get_chat_history, get_chat_session
 from utils.helpers import clear_chat_states
 
 def sidebar():
@@ -20,7 +20,8 @@ def sidebar():
 
         with st.container(height=250, border=False):
             st.markdown("## History")
-            for chat in get_all_users_chats({"user_id": st.session_state.user_id}):
+            chats, has_more = get_chat_history(st.session_state.user_id, st.session_state.history_pages)
+            for chat in chats:
                 if st.session_state.chat_session_id == chat["session_id"]:
                     chat_button = st.button(chat["title"], use_container_width=True, type="primary", key=chat["session_id"])
                 else:
@@ -32,13 +33,17 @@ def sidebar():
                     st.session_state.chat_title = chat["title"]
 
                     chat_session_messages = get_chat_session(st.session_state.chat_session_id)
-                    for message in chat_session_messages.messages:
+                    for message in chat_session_messages:
                         if isinstance(message, HumanMessage):
                             st.session_state.messages.append({"role": "user", "content": message.content})
                         elif isinstance(message, AIMessage):
                             st.session_state.messages.append({"role": "assistant", "content": message.content})
                     st.rerun()
 
+            if has_more and st.button("Load more", use_container_width=True, key="load_more_history"):
+                st.session_state.history_pages += 1
+                st.rerun()
+
         with st.container(border=False):
             st.divider()
             with st.popover("Settings", use_container_width=True):
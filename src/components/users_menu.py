@@ -1,14 +1,48 @@
+import math
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timezone
-from tools.user import get_all_users, get_one_user, create_user, update_user, delete_user, change_password, change_picture, remove_picture
+from tools.user import get_users_page, count_users, get_user_stats, get_one_user, create_user, update_user, delete_user, change_password, change_picture, remove_picture
 from utils.helpers import convert_image_to_base64, convert_to_local
 
+SORT_LABELS = {
+    "Join Date": "created_at",
+    "Last Login": "last_login",
+    "Update Date": "updated_at",
+    "Username": "username",
+    "Name": "first_name",
+}
+
 def users_menu():
-    users = get_all_users()
-    if users:
+    stats = get_user_stats()
+    if stats["total"]:
+        with st.container():
+            col1, col2, col3 = st.columns(3)
+            with col1.container(border=True):
+                st.metric("Total Users", stats["total"])
+            with col2.container(border=True):
+                st.metric("Active Users", stats["active"])
+            with col3.container(border=True):
+                st.metric("Administrators", stats["admins"])
+
+        filter_col1, filter_col2, filter_col3, filter_col4, filter_col5 = st.columns([0.36, 0.2, 0.14, 0.14, 0.16])
+        with filter_col1:
+            search = st.text_input("Search users", placeholder="Username, email or name").strip()
+        with filter_col2:
+            sort_label = st.selectbox("Sort by", options=list(SORT_LABELS.keys()))
+        with filter_col3:
+            descending = st.selectbox("Order", options=["Descending", "Ascending"]) == "Descending"
+        with filter_col4:
+            page_size = st.selectbox("Page size", options=[25, 50, 100], index=1)
+
+        total = count_users(search)
+        num_pages = max(1, math.ceil(total / page_size))
+        with filter_col5:
+            page = st.number_input(f"Page (of {num_pages})", min_value=1, max_value=num_pages, value=1)
+
+        users = get_users_page(page, page_size, search, SORT_LABELS[sort_label], descending)
         user_data_list = []
-        for i, user in enumerate(users, start=1):
+        for i, user in enumerate(users, start=(page - 1) * page_size + 1):
             user_data = {
                 "No": i,
                 "Username": user["username"],
@@ -24,15 +58,8 @@ def users_menu():
             }
             user_data_list.append(user_data)
 
-        users_df = pd.DataFrame(user_data_list)
-        with st.container():
-            col1, col2, col3 = st.columns(3)
-            with col1.container(border=True):
-                num_users = len(users_df)
-                st.metric("Total Users", num_users)
-            with col2.container(border=True):
-                active_users = users_df['Active'].sum()
-                st.metric("Active Users", active_users)
+        users_df = pd.DataFrame(user_data_list, columns=["No", "Username", "Email", "Name", "Role", "Picture", "Administrator", "Join Date", "Update Date", "Last Login", "Active"])
+        st.caption(f"{total} matching users")
 
         user_event = st.dataframe(
             users_df,
@@ -82,7 +109,7 @@ def details_modal(username):
                 with st.container(height=150, border=True):
                     st.markdown("No picture yet.")
             else:
-                st.image(convert_image_to_base64(user_data["picture_path"]), use_column_width=True)
+                st.image(convert_image_to_base64(user_data["picture_path"], thumbnail=False), use_column_width=True)
 
             with st.popover("Change profile picture"):
                 uploaded_file = st.file_uploader("Update Picture", ["jpg", "jpeg", "png"])
@@ -73,6 +73,39 @@ class Conversation:
         except Exception as e:
             raise Exception(f"Failed to get all user's chats! Error: {e}") from e
 
+    @classmethod
+    def get_user_chats_page(cls, user_id, cursor=None, limit=20):
+        """
+        Retrieves one page of a user's conversations, most recently updated first, with only the fields the history list shows.
+        Returns the page and the cursor of the next page, or None if this is the last page.
+        """
+        try:
+            conversations_collection = cls.get_collection()
+            criteria = {"user_id": user_id}
+            if cursor is not None:
+                updated_at, last_id = cursor
+                criteria["$or"] = [
+                    {"updated_at": {"$lt": updated_at}},
+                    {"updated_at": updated_at, "_id": {"$lt": last_id}}
+                ]
+
+            conversations_data = list(
+                conversations_collection.find(criteria, {"title": 1, "session_id": 1, "updated_at": 1})
+                .sort([("updated_at", -1), ("_id", -1)])
+                .limit(limit + 1)
+            )
+            next_cursor = None
+            if len(conversations_data) > limit:
+                conversations_data = conversations_data[:limit]
+                next_cursor = (conversations_data[-1]["updated_at"], conversations_data[-1]["_id"])
+
+            return [
+                {"title": conversation["title"], "session_id": conversation["session_id"], "updated_at": conversation["updated_at"]}
+                for conversation in conversations_data
+            ], next_cursor
+        except Exception as e:
+            raise Exception(f"Failed to get user's chats! Error: {e}") from e
+
     @classmethod
     def update_title(cls, criteria, title):
         """Updates a conversations' title in the database based on given criteria."""
@@ -1,7 +1,21 @@
+import re
 from datetime import datetime, timezone
 from tools.db import get_collection
 from utils.helpers import hash_password
 
+TABLE_FIELDS = ["username", "email", "first_name", "last_name", "picture_path", "role", "is_admin", "is_active", "created_at", "updated_at", "last_login"]
+SEARCH_FIELDS = ["username", "email", "first_name", "last_name"]
+# Fields the users table can be sorted on. Each has a (field, _id) index in tools.db.INDEXES.
+SORT_FIELDS = ["created_at", "last_login", "updated_at", "username", "first_name"]
+STATS_PIPELINE = [
+    {"$group": {
+        "_id": None,
+        "total": {"$sum": 1},
+        "active": {"$sum": {"$cond": [{"$eq": ["$is_active", True]}, 1, 0]}},
+        "admins": {"$sum": {"$cond": [{"$eq": ["$is_admin", True]}, 1, 0]}},
+    }},
+]
+
 class User:
     _id: str
     username: str
@@ -98,6 +112,66 @@ class User:
         except Exception as e:
             raise Exception("Failed to get all users!") from e
 
+    @classmethod
+    def get_search_criteria(cls, search=""):
+        """Returns the query matching users whose username, email or name contains the search text, ignoring case."""
+        if not search:
+            return {}
+        pattern = {"$regex": re.escape(search), "$options": "i"}
+        return {"$or": [{field: pattern} for field in SEARCH_FIELDS]}
+
+    @classmethod
+    def get_page(cls, search="", sort_by="created_at", descending=True, skip=0, limit=50):
+        """
+        Retrieves one page of users matching the search, sorted on the server, with only the fields the users table shows.
+        Password hashes are never returned. sort_by must be one of SORT_FIELDS.
+        """
+        if sort_by not in SORT_FIELDS:
+            raise ValueError(f"Users cannot be sorted on {sort_by}")
+        try:
+            users_collection = cls.get_collection()
+            direction = -1 if descending else 1
+            users_data = (
+                users_collection.find(cls.get_search_criteria(search), {field: 1 for field in TABLE_FIELDS})
+                .sort([(sort_by, direction), ("_id", direction)])
+                .skip(skip)
+                .limit(limit)
+            )
+            return [{field: user_data.get(field) for field in ["_id"] + TABLE_FIELDS} for user_data in users_data]
+        except Exception as e:
+            raise Exception("Failed to get users!") from e
+
+    @classmethod
+    def count(cls, search=""):
+        """Counts the users matching the search. Without a search the count comes from the collection metadata."""
+        try:
+            users_collection = cls.get_collection()
+            if not search:
+                return users_collection.estimated_document_count()
+            return users_collection.count_documents(cls.get_search_criteria(search))
+        except Exception as e:
+            raise Exception("Failed to count users!") from e
+
+    @classmethod
+    def get_stats(cls):
+        """Computes the total, active and administrator user counts in one aggregation."""
+        try:
+            users_collection = cls.get_collection()
+            stats = next(users_collection.aggregate(STATS_PIPELINE), None)
+            return {key: stats[key] if stats else 0 for key in ["total", "active", "admins"]}
+        except Exception as e:
+            raise Exception("Failed to get user statistics!") from e
+
+    @classmethod
+    def get_usernames(cls):
+        """Retrieves the ID and username of every user, sorted by username."""
+        try:
+            users_collection = cls.get_collection()
+            users_data = users_collection.find({}, {"username": 1}).sort("username", 1)
+            return [{"_id": user_data["_id"], "username": user_data["username"]} for user_data in users_data]
+        except Exception as e:
+            raise Exception("Failed to get usernames!") from e
+
 
     @classmethod
     def update(cls, criteria, new_data):
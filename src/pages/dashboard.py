@@ -3,6 +3,7 @@ from components.users_menu import users_menu
 from components.conversations_menu import conversations_menu
 from components.docs_menu import docs_menu
 from components.llms_menu import llms_menu
+from components.metrics_menu import metrics_menu
 from components.profile_modal import profile_modal
 from tools.auth import logout
 from utils.helpers import check_auth, initialize_session, clear_chat_states
@@ -27,7 +28,7 @@ def main():
                     logout()
 
         st.header("Dashboard")
-        tab1, tab2, tab3, tab4 = st.tabs(["Users", "Conversations", "Documents", "LLMs"])
+        tab1, tab2, tab3, tab4, tab5 = st.tabs(["Users", "Conversations", "Documents", "LLMs", "Metrics"])
 
         with tab1:
             users_menu()
@@ -41,6 +42,9 @@ def main():
         with tab4:
             llms_menu()
 
+        with tab5:
+            metrics_menu()
+
     else:
         if not st.session_state.is_authenticated:
             st.warning("You need to log in first!")
@@ -1,10 +1,12 @@
 import streamlit as st
 from components.sidebar import sidebar
-from tools.chat import display_chat, generate_response, load_llm_model, update_chat_title, delete_chat
+from tools.chat import display_chat, display_chat_stream, generate_response, generate_response_stream, load_llm_model, update_chat_title, delete_chat
+from tools.warmup import DEFAULT_MODEL_CONFIG, start_model_warmup
 from utils.helpers import check_auth, initialize_session, clear_chat_states
 
 def main():
     initialize_session()
+    start_model_warmup()
 
     if check_auth("Home"):
         sidebar()
@@ -36,33 +38,36 @@ def main():
             TEMPERATURE_RANGE = (0.1, 2.0)
             TOP_P_RANGE = (0.1, 1.0)
             MAX_TOKENS_RANGE = (100, 5000)
-            model_config = {
-                "model_name": "meta-llama/Meta-Llama-3-8B-Instruct",
-                "temperature": 1.0,
-                "top_p": 0.8,
-                "max_tokens": 4000
-            }
+            MODEL_NAMES = ["meta-llama/Meta-Llama-3-8B-Instruct", "mistralai/Mistral-7B-Instruct-v0.3", "HuggingFaceH4/zephyr-7b-beta"]
+            model_config = dict(st.session_state.model_config or DEFAULT_MODEL_CONFIG)
 
             with st.form("config"):
                 col1, col2 = st.columns(2)
                 with col1:
-                    model_config["temperature"] = st.slider("Temperature", min_value=TEMPERATURE_RANGE[0], max_value=TEMPERATURE_RANGE[1], step=0.01, value=1.0)
-                    model_config["top_p"] = st.slider("Top-P (Nucleus) Sampling", min_value=TOP_P_RANGE[0], max_value=TOP_P_RANGE[1], step=0.01, value=0.8)
-                    model_config["max_tokens"] = st.slider("Max Tokens", min_value=MAX_TOKENS_RANGE[0], max_value=MAX_TOKENS_RANGE[1], step=100, value=4000)
+                    model_config["temperature"] = st.slider("Temperature", min_value=TEMPERATURE_RANGE[0], max_value=TEMPERATURE_RANGE[1], step=0.01, value=model_config["temperature"])
+                    model_config["top_p"] = st.slider("Top-P (Nucleus) Sampling", min_value=TOP_P_RANGE[0], max_value=TOP_P_RANGE[1], step=0.01, value=model_config["top_p"])
+                    model_config["max_tokens"] = st.slider("Max Tokens", min_value=MAX_TOKENS_RANGE[0], max_value=MAX_TOKENS_RANGE[1], step=100, value=model_config["max_tokens"])
 
                 with col2:
-                    model_config["model_name"] = st.radio("Choose model", ["meta-llama/Meta-Llama-3-8B-Instruct", "mistralai/Mistral-7B-Instruct-v0.3", "HuggingFaceH4/zephyr-7b-beta"])
+                    model_config["model_name"] = st.radio("Choose model", MODEL_NAMES, index=MODEL_NAMES.index(model_config["model_name"]))
+                    stream_response = st.toggle("Stream response", value=True)
                 if st.form_submit_button("Save"):
-                    st.session_state.llm_model = load_llm_model(model_config)
+                    st.session_state.model_config = model_config
+                    load_llm_model(model_config)
 
         if prompt := st.chat_input("Send a message"):
             st.session_state.messages.append({"role": "user", "content": prompt})
             with tab1:
                 display_chat({"role": "user", "content": prompt})
 
-                with st.spinner("Thinking..."):
-                    response = generate_response(prompt, model_config)
-                    display_chat({"role": "assistant", "content": response})
+                if stream_response:
+                    with st.spinner("Thinking..."):
+                        response_stream = generate_response_stream(prompt, model_config)
+                    response = display_chat_stream(response_stream)
+                else:
+                    with st.spinner("Thinking..."):
+                        response = generate_response(prompt, model_config)
+                        display_chat({"role": "assistant", "content": response})
             st.session_state.messages.append({"role": "assistant", "content": response})
             st.session_state.chat_title = prompt
 
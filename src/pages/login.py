@@ -1,9 +1,11 @@
 import streamlit as st
 from tools.auth import login
+from tools.warmup import start_model_warmup
 from utils.helpers import check_auth, initialize_session
 
 def main():
     initialize_session()
+    start_model_warmup()
 
     if check_auth("Login"):
         with st.form("login"):
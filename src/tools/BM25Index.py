@@ -0,0 +1,159 @@
+import re
+import math
+import numpy as np
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from langchain_core.documents import Document
+
+TOKEN_PATTERN = re.compile(r"\d+(?:[./-]\d+)*|[a-z]+(?:-[a-z]+)*")
+
+STOPWORDS = {
+    "ada", "adalah", "agar", "akan", "aku", "anda", "apa", "apakah", "atau", "bagaimana", "bagi", "bahwa", "beberapa",
+    "belum", "berapa", "bisa", "boleh", "dalam", "dan", "dapat", "dari", "di", "dia", "dengan", "hal", "harus", "hanya",
+    "ia", "ini", "itu", "jadi", "jika", "juga", "kami", "kamu", "kapan", "karena", "ke", "kepada", "kita", "lagi", "mana",
+    "maka", "masih", "mereka", "mengapa", "namun", "oleh", "pada", "para", "saat", "saja", "saya", "sebagai", "sedang",
+    "sehingga", "sejak", "selama", "seperti", "siapa", "sudah", "tentang", "tetapi", "tidak", "untuk", "yaitu", "yang",
+}
+
+INFLECTIONAL_SUFFIXES = ("kah", "pun", "nya")
+DERIVATIONAL_SUFFIXES = ("kan", "an")
+PREFIXES = (
+    ("ber", "", ""), ("ter", "", ""), ("per", "", ""), ("di", "", ""),
+    ("meny", "aiueo", "s"), ("peny", "aiueo", "s"),
+    ("meng", "aiueoghk", ""), ("peng", "aiueoghk", ""),
+    ("mem", "aiueo", "p"), ("pem", "aiueo", "p"), ("mem", "bfpv", ""), ("pem", "bfpv", ""),
+    ("men", "aiueo", "t"), ("pen", "aiueo", "t"), ("men", "dcjz", ""), ("pen", "dcjz", ""),
+    ("me", "lrmnwy", ""), ("pe", "lrmnwy", ""),
+)
+# Roots the rules above would cut, kept whole: roots that start like a prefix or end like a suffix (perintah, perempuan),
+# and roots starting with a nasal, which take me-/pe- as they are (menilai, penamaan) and so cannot be told apart
+# from the nasalized t-, p- or s- of meN-/peN- (menulis, pemakai).
+ROOT_WORDS = {
+    "berat", "beras", "berita", "beritahu", "bersih", "perempuan", "perintah", "periksa", "pernah", "pertama",
+    "terima", "terus",
+    "maaf", "makan", "malam", "masuk", "milik", "minat", "minta", "minum", "mulai",
+    "naik", "nama", "nanti", "nasihat", "nikah", "nilai", "nyala", "nyanyi", "nyata",
+}
+# Only peN-/pe-/per- can follow another prefix (diperlukan, berpengalaman). A second ber-, ter- or di- is far more
+# often part of the root (pemberitahuan, ditanya).
+INNER_PREFIX = "pe"
+MIN_STEM_LENGTH = 4
+# Stored with the terms tokenized at ingestion. Bump it when the tokenizer or the stemmer changes the terms they produce.
+STEMMER_VERSION = 2
+
+def stem(word: str) -> str:
+    """
+    Light, conservative Indonesian stemmer: strips an inflectional suffix, a derivational suffix and up to two prefixes,
+    restoring the initial consonant that meN-/peN- nasalization removes. Affixes are only stripped when at least
+    MIN_STEM_LENGTH letters remain, and ke-/se- are left alone because too many roots start with them (kelas, sekolah).
+    An inflectional suffix is kept when stripping it leaves a prefixed word too short for a root, as in ditanya or bertanya.
+    """
+    if not word.isalpha() or word in ROOT_WORDS:
+        return word
+
+    for suffix in INFLECTIONAL_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            root, blocked = _strip_affixes(word[:-len(suffix)])
+            if not blocked:
+                return root
+            break
+    return _strip_affixes(word)[0]
+
+def _strip_affixes(word: str) -> Tuple[str, bool]:
+    """
+    Strips a derivational suffix and up to two prefixes, stopping at a word of ROOT_WORDS. Returns the root,
+    and whether a prefix matched but was kept because too few letters would remain.
+    """
+    for suffix in DERIVATIONAL_SUFFIXES:
+        # peN-/per- nouns take -an, never -kan: pendidikan is pendidik-an.
+        if suffix == "kan" and word.startswith("pe"):
+            continue
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH:
+            word = word[:-len(suffix)]
+            break
+
+    blocked = False
+    for depth in range(2):
+        if word in ROOT_WORDS:
+            return word, False
+        if word[:2] in ("me", "pe") and word[2:] in ROOT_WORDS:
+            return word[2:], False
+        for prefix, next_letters, restored in PREFIXES:
+            if depth > 0 and not prefix.startswith(INNER_PREFIX):
+                continue
+            rest = word[len(prefix):]
+            if not word.startswith(prefix) or (next_letters and rest[:1] not in next_letters):
+                continue
+            if len(restored + rest) < MIN_STEM_LENGTH:
+                blocked = True
+                continue
+            word = restored + rest
+            break
+        else:
+            break
+        # A restored consonant starts the root, so the root cannot carry another prefix: pemerintah is peN-perintah.
+        if restored:
+            break
+    return word, blocked
+
+def tokenize(text: str) -> List[str]:
+    """
+    Splits a text into lowercase, stemmed terms without stopwords. Numbers with separators, like dates and regulation
+    numbers ("23-24", "12/2023"), and hyphenated words are kept as single terms.
+    """
+    return [stem(token) for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+class BM25Index:
+    """In-process inverted index that ranks documents with Okapi BM25."""
+
+    def __init__(self, texts: List[str], metadatas: Optional[List[dict]] = None, terms: Optional[List[Optional[List[str]]]] = None, k1: float = 1.5, b: float = 0.75):
+        """Indexes the texts. Pre-computed terms are used where given, the other texts are tokenized."""
+        self.k1 = k1
+        self.b = b
+        self._texts = texts
+        self._metadatas = metadatas or [{} for _ in texts]
+        self._postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+        postings = defaultdict(lambda: ([], []))
+        doc_lengths = np.zeros(len(texts), dtype=np.float32)
+        for i, text in enumerate(texts):
+            doc_terms = terms[i] if terms is not None and terms[i] is not None else tokenize(text)
+            doc_lengths[i] = len(doc_terms)
+            for term, frequency in Counter(doc_terms).items():
+                postings[term][0].append(i)
+                postings[term][1].append(frequency)
+
+        num_docs = len(texts)
+        self._length_norm = k1 * (1 - b + b * doc_lengths / doc_lengths.mean()) if num_docs and doc_lengths.mean() > 0 else np.full(num_docs, k1, dtype=np.float32)
+        self._idf: Dict[str, float] = {}
+        for term, (doc_ids, frequencies) in postings.items():
+            self._postings[term] = (np.asarray(doc_ids, dtype=np.int64), np.asarray(frequencies, dtype=np.float32))
+            self._idf[term] = math.log(1 + (num_docs - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+
+    def __len__(self) -> int:
+        return len(self._texts)
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[int, float]]:
+        """Returns the (document index, BM25 score) pairs of the top-k documents that share a term with the query."""
+        scores = np.zeros(len(self._texts), dtype=np.float32)
+        for term in set(tokenize(query)):
+            if term not in self._postings:
+                continue
+            doc_ids, frequencies = self._postings[term]
+            scores[doc_ids] += self._idf[term] * frequencies * (self.k1 + 1) / (frequencies + self._length_norm[doc_ids])
+
+        matches = np.flatnonzero(scores)
+        if len(matches) > k:
+            matches = matches[np.argpartition(-scores[matches], k)[:k]]
+        matches = matches[np.argsort(-scores[matches])]
+        return [(int(i), float(scores[i])) for i in matches]
+
+    def similarity_search_with_score(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return [(self.get_document(i), score) for i, score in self.search(query, k)]
+
+    def similarity_search(self, query: str, k: int = 4) -> List[Document]:
+        return [self.get_document(i) for i, _ in self.search(query, k)]
+
+    def get_document(self, i: int) -> Document:
+        metadata: Dict[str, Any] = dict(self._metadatas[i])
+        return Document(page_content=self._texts[i], metadata=metadata)
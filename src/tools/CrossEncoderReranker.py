@@ -0,0 +1,63 @@
+import threading
+import numpy as np
+from time import perf_counter
+from typing import List, Optional, Tuple
+from langchain_core.documents import Document
+
+class CrossEncoderReranker:
+    """
+    Reranks retrieved passages with a cross-encoder that reads the query and each passage together.
+    All candidates are scored in one batched CPU pass. With a latency budget, the number of candidates is capped
+    by the measured cost per pair, so the pass stays within the budget as the corpus or the model changes.
+    """
+
+    def __init__(self, model_name: str, max_length: int = 512, latency_budget_ms: Optional[float] = None):
+        """Loads the cross-encoder. sentence_transformers is only imported when a reranker is actually created."""
+        from sentence_transformers import CrossEncoder
+
+        self.model_name = model_name
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.latency_budget_ms = latency_budget_ms
+        self.ms_per_pair: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def max_candidates(self, num_candidates: int) -> int:
+        """Returns how many of the candidates can be scored within the latency budget."""
+        with self._lock:
+            ms_per_pair = self.ms_per_pair
+        if self.latency_budget_ms is None or ms_per_pair is None:
+            return num_candidates
+        return max(1, min(num_candidates, int(self.latency_budget_ms / ms_per_pair)))
+
+    def score(self, query: str, passages: List[str]) -> Tuple[np.ndarray, float]:
+        """Scores every passage against the query in one batch. Returns the scores and the duration in milliseconds."""
+        if not passages:
+            return np.zeros(0, dtype=np.float32), 0.0
+
+        start_time = perf_counter()
+        scores = self.model.predict(
+            [(query, passage) for passage in passages],
+            batch_size=len(passages),
+            show_progress_bar=False,
+            convert_to_numpy=True,
+        )
+        duration_ms = (perf_counter() - start_time) * 1000
+
+        with self._lock:
+            ms_per_pair = duration_ms / len(passages)
+            self.ms_per_pair = ms_per_pair if self.ms_per_pair is None else 0.8 * self.ms_per_pair + 0.2 * ms_per_pair
+        return np.asarray(scores, dtype=np.float32).reshape(-1), duration_ms
+
+    def rerank(self, query: str, docs: List[Document], top_k: int = 4, threshold: float = 0.0, min_k: int = 1) -> List[Tuple[Document, float]]:
+        """
+        Returns up to top_k (document, score) pairs, best first, keeping only the documents scored at or above the threshold.
+        The best min_k documents are always kept so the prompt never loses its context entirely.
+        Candidates are expected in first-stage rank order, the ones past the latency budget are dropped unscored.
+        """
+        docs = docs[:self.max_candidates(len(docs))]
+        scores, _ = self.score(query, [doc.page_content for doc in docs])
+        order = np.argsort(-scores)
+        ranked = [(docs[i], float(scores[i])) for i in order[:top_k] if scores[i] >= threshold]
+        if len(ranked) < min_k:
+            ranked = [(docs[i], float(scores[i])) for i in order[:min_k]]
+        return ranked
@@ -1,8 +1,8 @@
 import json
 from pathlib import Path
 from typing import Callable, Dict, List, Optional, Union, Any
-from langchain.document_loaders.base import BaseLoader
-from langchain.docstore.document import Document
+from langchain_core.document_loaders import BaseLoader
+from langchain_core.documents import Document
 
 class JSONLoader(BaseLoader):
     def __init__(
@@ -0,0 +1,271 @@
+import os
+import copy
+import json
+import shutil
+import tempfile
+import threading
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store backed by a memory-mapped embedding matrix on disk.
+    Small corpora are searched exactly with a brute-force scan ("flat"), large corpora
+    with an inverted file index ("ivf") that only scans the lists of the nearest centroids.
+    Every build is written to its own directory inside index_dir and switched in by atomically replacing
+    the CURRENT_FILE pointer, so readers never see a half-written index and mapped files are never rewritten.
+    """
+
+    CURRENT_FILE = "CURRENT"
+    BUILD_PREFIX = "build-"
+    _build_lock = threading.Lock()
+
+    META_FILE = "meta.json"
+    EMBEDDINGS_FILE = "embeddings.npy"
+    DOCS_FILE = "docs.jsonl"
+    CENTROIDS_FILE = "centroids.npy"
+    OFFSETS_FILE = "offsets.npy"
+
+    def __init__(self, index_dir: Union[str, Path], embedding: Optional[Embeddings] = None, nprobe: int = 8):
+        """Loads the current build of the index in index_dir, memory-mapping the embedding matrix."""
+        self.index_dir = Path(index_dir)
+        self.build_id = self.get_build_id(self.index_dir)
+        if self.build_id is None:
+            raise FileNotFoundError(f"No vector index in {self.index_dir}")
+        self.build_dir = self.index_dir / self.build_id
+        self._embedding = embedding
+        self.nprobe = nprobe
+
+        with (self.build_dir / self.META_FILE).open(encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.index_type = self.meta["index_type"]
+        self._vectors = np.load(self.build_dir / self.EMBEDDINGS_FILE, mmap_mode="r")
+
+        self._docs: List[Dict[str, Any]] = []
+        with (self.build_dir / self.DOCS_FILE).open(encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    self._docs.append(json.loads(line))
+
+        if self.index_type == "ivf":
+            self._centroids = np.load(self.build_dir / self.CENTROIDS_FILE)
+            self._offsets = np.load(self.build_dir / self.OFFSETS_FILE)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    def bind(self, embedding: Embeddings) -> "LocalVectorStore":
+        """Returns a view of the index that embeds queries with the given model, sharing the loaded index data."""
+        view = copy.copy(self)
+        view._embedding = embedding
+        return view
+
+    @classmethod
+    def get_build_id(cls, index_dir: Union[str, Path]) -> Optional[str]:
+        """Returns the name of the current build directory of the index in index_dir, or None if it was never built."""
+        try:
+            return (Path(index_dir) / cls.CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+        except FileNotFoundError:
+            return None
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    @classmethod
+    def build(
+        cls,
+        index_dir: Union[str, Path],
+        vectors: Iterable[List[float]],
+        texts: List[str],
+        metadatas: Optional[List[dict]] = None,
+        index_type: str = "auto",
+        ivf_min_vectors: int = 20000,
+        nlist: Optional[int] = None,
+    ) -> Dict[str, Any]:
+        """
+        Writes an index for the given vectors and texts to a new build directory in index_dir, makes it the current build
+        and returns its metadata. The previous builds are removed; readers that still map their files keep working on POSIX.
+        With index_type "auto", corpora smaller than ivf_min_vectors get a flat index.
+        """
+        if not texts:
+            raise ValueError("Cannot build a vector index without documents.")
+        index_dir = Path(index_dir)
+        index_dir.mkdir(parents=True, exist_ok=True)
+        metadatas = metadatas if metadatas is not None else [{} for _ in texts]
+
+        matrix = np.asarray(list(vectors), dtype=np.float32)
+        if matrix.ndim != 2 or len(matrix) != len(texts):
+            raise ValueError("Expected one embedding vector per text.")
+        matrix = normalize(matrix)
+
+        with cls._build_lock:
+            build_dir = Path(tempfile.mkdtemp(prefix=cls.BUILD_PREFIX, dir=index_dir))
+            try:
+                meta = cls._write_build(build_dir, matrix, texts, metadatas, index_type, ivf_min_vectors, nlist)
+                pointer_path = index_dir / f"{cls.CURRENT_FILE}.{build_dir.name}"
+                pointer_path.write_text(build_dir.name, encoding="utf-8")
+                os.replace(pointer_path, index_dir / cls.CURRENT_FILE)
+            except BaseException:
+                shutil.rmtree(build_dir, ignore_errors=True)
+                raise
+
+            for path in index_dir.iterdir():
+                if path.is_dir() and path.name.startswith(cls.BUILD_PREFIX) and path != build_dir:
+                    shutil.rmtree(path, ignore_errors=True)
+        return meta
+
+    @classmethod
+    def _write_build(cls, build_dir: Path, matrix: np.ndarray, texts: List[str], metadatas: List[dict],
+                     index_type: str, ivf_min_vectors: int, nlist: Optional[int]) -> Dict[str, Any]:
+        """Writes the index files of one build into build_dir and returns its metadata."""
+        if index_type == "auto":
+            index_type = "ivf" if len(matrix) >= ivf_min_vectors else "flat"
+
+        order = np.arange(len(matrix))
+        meta = {"index_type": index_type, "count": len(matrix), "dim": int(matrix.shape[1])}
+
+        if index_type == "ivf":
+            nlist = nlist if nlist else max(1, int(np.sqrt(len(matrix))))
+            centroids, assignments = kmeans(matrix, nlist)
+            nlist = len(centroids)
+            order = np.argsort(assignments, kind="stable")
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=nlist))])
+            np.save(build_dir / cls.CENTROIDS_FILE, centroids)
+            np.save(build_dir / cls.OFFSETS_FILE, offsets)
+            meta["nlist"] = nlist
+        elif index_type != "flat":
+            raise ValueError(f"Unknown index type: {index_type}")
+
+        np.save(build_dir / cls.EMBEDDINGS_FILE, matrix[order])
+        with (build_dir / cls.DOCS_FILE).open("w", encoding="utf-8") as f:
+            for i in order:
+                f.write(json.dumps({"text": texts[i], "metadata": metadatas[i]}, default=str) + "\n")
+        with (build_dir / cls.META_FILE).open("w", encoding="utf-8") as f:
+            json.dump(meta, f)
+
+        return meta
+
+    def search_vector(self, query_vector: List[float], k: int = 4, exact: bool = False,
+                      filter: Optional[Dict[str, Any]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Returns the row ids and cosine scores of the k nearest neighbours of query_vector.
+        With a filter, only the rows whose metadata matches it are searched, see match_filter.
+        """
+        query = normalize(np.asarray(query_vector, dtype=np.float32)[None, :])[0]
+
+        candidates = None
+        if self.index_type == "ivf" and not exact:
+            centroid_scores = self._centroids @ query
+            probes = np.argsort(-centroid_scores)[:self.nprobe]
+            candidates = np.concatenate([np.arange(self._offsets[p], self._offsets[p + 1]) for p in probes])
+        if filter is not None:
+            rows = candidates if candidates is not None else range(len(self._docs))
+            candidates = np.array([i for i in rows if match_filter(self._docs[int(i)]["metadata"], filter)], dtype=np.int64)
+        scores = self._vectors[candidates] @ query if candidates is not None else self._vectors @ query
+
+        k = min(k, len(scores))
+        if k == 0:
+            return np.array([], dtype=np.int64), np.array([], dtype=np.float32)
+
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        ids = candidates[top] if candidates is not None else top
+        return ids, scores[top]
+
+    def similarity_search_with_score_by_vector(self, embedding: List[float], k: int = 4, exact: bool = False,
+                                               filter: Optional[Dict[str, Any]] = None, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """
+        Returns the documents most similar to the embedding vector with their cosine scores.
+        Search options of other vector stores, e.g. the pre_filter of Atlas Vector Search, are rejected.
+        """
+        if kwargs:
+            raise TypeError(f"Unsupported search arguments for LocalVectorStore: {', '.join(sorted(kwargs))}")
+        ids, scores = self.search_vector(embedding, k=k, exact=exact, filter=filter)
+        results = []
+        for i, score in zip(ids, scores):
+            doc = self._docs[int(i)]
+            results.append((Document(page_content=doc["text"], metadata=doc["metadata"]), float(score)))
+        return results
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        """Returns the documents most similar to the embedding vector."""
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k=k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        """Returns the documents most similar to the query with their cosine scores."""
+        return self.similarity_search_with_score_by_vector(self._embedding.embed_query(query), k=k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        """Returns the documents most similar to the query."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        return self._cosine_relevance_score_fn
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("LocalVectorStore is read-only, rebuild it with LocalVectorStore.build().")
+
+    @classmethod
+    def from_texts(cls, texts: List[str], embedding: Embeddings, metadatas: Optional[List[dict]] = None, **kwargs: Any) -> "LocalVectorStore":
+        """Embeds the texts, builds an index in the index_dir keyword argument and loads it."""
+        index_dir = kwargs.pop("index_dir")
+        nprobe = kwargs.pop("nprobe", 8)
+        cls.build(index_dir, embedding.embed_documents(texts), texts, metadatas, **kwargs)
+        return cls(index_dir, embedding, nprobe=nprobe)
+
+FILTER_OPERATORS = {
+    "$eq": lambda value, operand: value == operand,
+    "$ne": lambda value, operand: value != operand,
+    "$in": lambda value, operand: value in operand,
+    "$nin": lambda value, operand: value not in operand,
+}
+
+def match_filter(metadata: Dict[str, Any], filter: Dict[str, Any]) -> bool:
+    """
+    Returns True if the metadata matches a MongoDB-style filter of field conditions, all of which must hold.
+    A condition is a value to compare with or a dict of the FILTER_OPERATORS. Any other operator raises ValueError.
+    """
+    for field, condition in filter.items():
+        if field.startswith("$"):
+            raise ValueError(f"Unsupported filter operator: {field}")
+        value = metadata.get(field)
+        if not isinstance(condition, dict):
+            condition = {"$eq": condition}
+        for operator, operand in condition.items():
+            if operator not in FILTER_OPERATORS:
+                raise ValueError(f"Unsupported filter operator: {operator}")
+            if not FILTER_OPERATORS[operator](value, operand):
+                return False
+    return True
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """Scales every row of the matrix to unit length so dot products are cosine similarities."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+def kmeans(matrix: np.ndarray, n_clusters: int, iterations: int = 10, sample_size: int = 50000, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """Clusters unit vectors with spherical k-means and returns the centroids and the assignment of every row."""
+    rng = np.random.default_rng(seed)
+    sample = matrix[rng.choice(len(matrix), size=min(sample_size, len(matrix)), replace=False)]
+    n_clusters = min(n_clusters, len(sample))
+    centroids = sample[rng.choice(len(sample), size=n_clusters, replace=False)]
+
+    for _ in range(iterations):
+        assignments = np.argmax(sample @ centroids.T, axis=1)
+        for c in range(n_clusters):
+            members = sample[assignments == c]
+            if len(members):
+                centroids[c] = members.sum(axis=0)
+        centroids = normalize(centroids)
+
+    assignments = np.concatenate([
+        np.argmax(matrix[start:start + 10000] @ centroids.T, axis=1)
+        for start in range(0, len(matrix), 10000)
+    ])
+    return centroids, assignments
\ No newline at end of file
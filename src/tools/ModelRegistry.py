@@ -0,0 +1,163 @@
+import gc
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from time import monotonic
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded models, keyed by their configuration, so every session shares one instance per model.
+    Requests hold a reference to the models they use with acquire/release. Once the estimated memory of the loaded models
+    exceeds max_bytes, or more than max_entries are loaded, the least recently used models nobody holds are unloaded.
+    """
+
+    def __init__(self, max_bytes: Optional[int] = None, max_entries: Optional[int] = None):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.loads = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Dict[str, Any]]" = OrderedDict()
+        self._loading: Dict[Hashable, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Returns the model registered under the key, loading it with the loader first if needed."""
+        return self._get(key, loader, refs=0)
+
+    def acquire(self, key: Hashable, loader: Callable[[], Any]) -> Any:
+        """Returns the model registered under the key like get, and holds a reference so it is not evicted until released."""
+        return self._get(key, loader, refs=1)
+
+    def release(self, key: Hashable) -> None:
+        """Drops a reference taken with acquire, and evicts idle models if the registry is over its limits."""
+        with self._lock:
+            if key in self._entries and self._entries[key]["refs"] > 0:
+                self._entries[key]["refs"] -= 1
+            evicted = self._evict_idle()
+        if evicted:
+            gc.collect()
+
+    @contextmanager
+    def use(self, key: Hashable, loader: Callable[[], Any]):
+        """Holds a reference to the model for the duration of the with block."""
+        model = self.acquire(key, loader)
+        try:
+            yield model
+        finally:
+            self.release(key)
+
+    def evict(self, key: Hashable) -> bool:
+        """Unloads the model if nobody holds it. Returns True if it was unloaded."""
+        with self._lock:
+            if key not in self._entries or self._entries[key]["refs"] > 0:
+                return False
+            del self._entries[key]
+            self.evictions += 1
+        gc.collect()
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the number of loaded models, their estimated memory, the load and eviction counts and one row per model."""
+        with self._lock:
+            now = monotonic()
+            models: List[Dict[str, Any]] = [
+                {
+                    "key": key,
+                    "refs": entry["refs"],
+                    "size_bytes": entry["size_bytes"],
+                    "idle_seconds": now - entry["last_used"],
+                }
+                for key, entry in reversed(self._entries.items())
+            ]
+            return {
+                "entries": len(self._entries),
+                "size_bytes": sum(entry["size_bytes"] for entry in self._entries.values()),
+                "loads": self.loads,
+                "evictions": self.evictions,
+                "models": models,
+            }
+
+    def _get(self, key: Hashable, loader: Callable[[], Any], refs: int) -> Any:
+        with self._lock:
+            entry = self._touch(key, refs)
+            if entry is not None:
+                return entry["model"]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        # Models are loaded outside the registry lock, so loading one model does not block lookups of the others.
+        # The per-key lock makes concurrent requests for the same model wait for one load instead of loading it twice.
+        with loading:
+            with self._lock:
+                entry = self._touch(key, refs)
+                if entry is not None:
+                    return entry["model"]
+
+            model = loader()
+            size_bytes = estimate_model_size(model)
+            with self._lock:
+                self._entries[key] = {"model": model, "refs": refs, "size_bytes": size_bytes, "last_used": monotonic()}
+                self._loading.pop(key, None)
+                self.loads += 1
+                evicted = self._evict_idle()
+            if evicted:
+                gc.collect()
+            return model
+
+    def _touch(self, key: Hashable, refs: int) -> Optional[Dict[str, Any]]:
+        """Marks the model as most recently used and adds the references. Must be called with the lock held."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            entry["refs"] += refs
+            entry["last_used"] = monotonic()
+            self._entries.move_to_end(key)
+        return entry
+
+    def _evict_idle(self) -> int:
+        """
+        Unloads the least recently used models nobody holds while over the limits, and returns how many it unloaded.
+        Must be called with the lock held. The memory is only freed once nothing outside the registry references the model,
+        so callers collect garbage after releasing the lock, and the app never caches model instances anywhere else.
+        """
+        size_bytes = sum(entry["size_bytes"] for entry in self._entries.values())
+        evicted = 0
+        for key in list(self._entries):
+            over_size = self.max_bytes is not None and size_bytes > self.max_bytes
+            over_count = self.max_entries is not None and len(self._entries) > self.max_entries
+            if not over_size and not over_count:
+                break
+            entry = self._entries[key]
+            if entry["refs"] > 0 or key == next(reversed(self._entries)):
+                continue
+            del self._entries[key]
+            size_bytes -= entry["size_bytes"]
+            self.evictions += 1
+            evicted += 1
+        return evicted
+
+def estimate_model_size(model: Any) -> int:
+    """
+    Estimates the memory a model holds in bytes: the size of the parameters of the first PyTorch module found on it,
+    or the size of its ONNX file. Clients of remote models count as zero.
+    """
+    # Wrappers such as CachedEmbeddings, HuggingFaceEmbeddings and CrossEncoder keep the actual model a few attributes down.
+    candidates = [model]
+    for _ in range(3):
+        inner = next((getattr(model, name) for name in ("embeddings", "client", "model") if getattr(model, name, None) is not None), None)
+        if inner is None:
+            break
+        model = inner
+        candidates.append(model)
+
+    for candidate in candidates:
+        parameters = getattr(candidate, "parameters", None)
+        if callable(parameters):
+            try:
+                return sum(parameter.numel() * parameter.element_size() for parameter in parameters())
+            except Exception:
+                continue
+        model_path = getattr(candidate, "model_path", None)
+        if model_path is not None and Path(model_path).is_file():
+            return Path(model_path).stat().st_size
+    return 0
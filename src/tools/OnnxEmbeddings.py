@@ -0,0 +1,163 @@
+import os
+import json
+import shutil
+import tempfile
+import numpy as np
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from langchain_core.embeddings import Embeddings
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence-transformers embeddings served by ONNX Runtime on the CPU, optionally with dynamically int8-quantized weights.
+    The transformer is exported to ONNX once and cached in model_dir, torch is only needed for that export.
+    Exports and quantized copies are written next to their final path and renamed into place, so an interrupted export
+    or a concurrent load never sees a partly written model.
+    Pooling, normalization and the maximum sequence length follow the model's sentence-transformers configuration,
+    so the vectors have the same dimensions, and nearly the same values, as the PyTorch backend.
+    """
+
+    MODEL_FILE = "model.onnx"
+    QUANTIZED_MODEL_FILE = "model.int8.onnx"
+    CONFIG_FILE = "sentence_config.json"
+
+    def __init__(self, model_name: str, model_dir: Union[str, Path], quantize: bool = True, batch_size: int = 64, num_threads: Optional[int] = None):
+        """Loads the ONNX model from model_dir, exporting and quantizing it first if needed."""
+        import onnxruntime
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.model_dir = Path(model_dir)
+        self.batch_size = batch_size
+
+        if not (self.model_dir / self.MODEL_FILE).exists():
+            self.export(model_name, self.model_dir)
+        model_path = self.model_dir / self.MODEL_FILE
+        if quantize:
+            model_path = self.model_dir / self.QUANTIZED_MODEL_FILE
+            if not model_path.exists():
+                self.quantize(self.model_dir / self.MODEL_FILE, model_path)
+        self.model_path = model_path
+
+        with (self.model_dir / self.CONFIG_FILE).open(encoding="utf-8") as f:
+            self.config: Dict[str, Any] = json.load(f)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = onnxruntime.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    @classmethod
+    def export(cls, model_name: str, model_dir: Union[str, Path]) -> None:
+        """
+        Exports the transformer of a sentence-transformers model to ONNX, with its tokenizer and pooling settings.
+        The export is written into a temporary directory beside model_dir, which is then renamed to model_dir.
+        """
+        model_dir = Path(model_dir)
+        model_dir.parent.mkdir(parents=True, exist_ok=True)
+        export_dir = Path(tempfile.mkdtemp(prefix=f".{model_dir.name}.export-", dir=model_dir.parent))
+        try:
+            cls._export(model_name, export_dir)
+            if model_dir.exists() and not (model_dir / cls.MODEL_FILE).exists():
+                # Left over by an export that was interrupted before exports were renamed into place.
+                shutil.rmtree(model_dir)
+            try:
+                os.replace(export_dir, model_dir)
+            except OSError:
+                # Another process finished the same export first.
+                if not (model_dir / cls.MODEL_FILE).exists():
+                    raise
+        finally:
+            shutil.rmtree(export_dir, ignore_errors=True)
+
+    @classmethod
+    def _export(cls, model_name: str, model_dir: Path) -> None:
+        """Writes the ONNX export of the model into model_dir."""
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Normalize, Pooling, Transformer
+
+        sentence_model = SentenceTransformer(model_name, device="cpu")
+
+        config = {"pooling": "mean", "normalize": False, "max_seq_length": sentence_model.max_seq_length}
+        for module in sentence_model:
+            if isinstance(module, Pooling):
+                config["pooling"] = "cls" if module.pooling_mode_cls_token else "max" if module.pooling_mode_max_tokens else "mean"
+            elif isinstance(module, Normalize):
+                config["normalize"] = True
+            elif not isinstance(module, Transformer):
+                raise ValueError(f"Unsupported sentence-transformers module for the ONNX backend: {type(module).__name__}")
+
+        transformer = sentence_model[0].auto_model.eval()
+        tokenizer = sentence_model.tokenizer
+        dummy = tokenizer(["contoh kalimat"], return_tensors="pt")
+        input_names = [name for name in ["input_ids", "attention_mask", "token_type_ids"] if name in dummy]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                tuple(dummy[name] for name in input_names),
+                str(model_dir / cls.MODEL_FILE),
+                input_names=input_names,
+                output_names=["last_hidden_state"],
+                dynamic_axes=dynamic_axes,
+                opset_version=14,
+            )
+        tokenizer.save_pretrained(model_dir)
+        with (model_dir / cls.CONFIG_FILE).open("w", encoding="utf-8") as f:
+            json.dump(config, f)
+
+    @staticmethod
+    def quantize(model_path: Union[str, Path], quantized_path: Union[str, Path]) -> None:
+        """Writes a copy of the ONNX model with dynamically int8-quantized weights, through a temporary file renamed into place."""
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantized_path = Path(quantized_path)
+        fd, tmp_path = tempfile.mkstemp(prefix=f".{quantized_path.stem}-", suffix=".onnx", dir=quantized_path.parent)
+        os.close(fd)
+        try:
+            quantize_dynamic(str(model_path), tmp_path, weight_type=QuantType.QInt8)
+            os.replace(tmp_path, quantized_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encodes texts into a (len(texts), dim) float32 matrix, batch_size texts per ONNX Runtime call."""
+        batches = []
+        for start in range(0, len(texts), self.batch_size):
+            inputs = self.tokenizer(
+                texts[start:start + self.batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.config["max_seq_length"],
+                return_tensors="np",
+            )
+            feeds = {name: inputs[name].astype(np.int64) for name in self._input_names if name in inputs}
+            hidden_states = self.session.run(["last_hidden_state"], feeds)[0]
+            batches.append(self.pool(hidden_states, inputs["attention_mask"]))
+
+        vectors = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+        if self.config["normalize"] and len(vectors):
+            vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors.astype(np.float32)
+
+    def pool(self, hidden_states: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+        """Pools token embeddings into sentence embeddings the way the sentence-transformers Pooling module does."""
+        if self.config["pooling"] == "cls":
+            return hidden_states[:, 0]
+        mask = attention_mask[..., None].astype(hidden_states.dtype)
+        if self.config["pooling"] == "max":
+            return np.where(mask > 0, hidden_states, -1e9).max(axis=1)
+        return (hidden_states * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.encode(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
@@ -1,7 +1,7 @@
 import streamlit as st
 from datetime import datetime, timezone
 from utils.helpers import check_password, clear_session
-from tools.user import get_one_user, create_user, save_picture, update_user
+from tools.user import clear_user_list_caches, get_one_user, create_user, save_picture, update_user
 
 def login(username, password):
     """Logs in a user by checking their credentials."""
@@ -22,6 +22,7 @@ def login(username, password):
             "last_login": user["last_login"]
         }
         update_user({"username": username}, user_data)
+        clear_user_list_caches()
     else:
         return False
 
@@ -56,6 +57,7 @@ def logout():
         }
 
         update_user({"username": st.session_state.username}, user_data)
+        clear_user_list_caches()
         clear_session()
 
         st.switch_page("app.py")
@@ -76,4 +78,6 @@ def register(username, email, password, first_name, last_name, uploaded_file, ro
     }
 
     success, error_message = create_user(user_data)
+    if success:
+        clear_user_list_caches()
     return success, error_message
\ No newline at end of file
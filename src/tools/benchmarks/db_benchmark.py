@@ -0,0 +1,44 @@
+import logging
+import streamlit as st
+from statistics import mean, median
+from time import perf_counter
+from pymongo.mongo_client import MongoClient
+from tools.db import DB_NAME, get_collection, get_client_options
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def time_calls(func, iterations):
+    """Calls func the given number of times and returns the duration of each call in milliseconds."""
+    durations = []
+    for _ in range(iterations):
+        start_time = perf_counter()
+        func()
+        durations.append((perf_counter() - start_time) * 1000)
+    return durations
+
+def query_with_new_client():
+    """Runs a query the way get_collection used to, with a new MongoClient per call."""
+    client = MongoClient(st.secrets.mongo.MONGODB_ATLAS_CLUSTER_URI, **get_client_options())
+    try:
+        client.get_database(DB_NAME).get_collection("users").find_one({}, {"_id": 1})
+    finally:
+        client.close()
+
+def query_with_pooled_client():
+    """Runs a query through the shared, pooled MongoClient."""
+    get_collection("users").find_one({}, {"_id": 1})
+
+def run_benchmark(iterations=20):
+    """Compares the cost per database call before and after client pooling."""
+    query_with_pooled_client()
+    results = {
+        "new client per call": time_calls(query_with_new_client, iterations),
+        "pooled client": time_calls(query_with_pooled_client, iterations),
+    }
+
+    for name, durations in results.items():
+        logging.info(f"{name}: mean {mean(durations):.1f} ms, median {median(durations):.1f} ms, max {max(durations):.1f} ms over {iterations} calls")
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,83 @@
+import logging
+import resource
+import numpy as np
+import multiprocessing
+from statistics import mean
+from time import perf_counter
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SAMPLE_TEXTS = [
+    "Kapan jadwal ujian tengah semester untuk kelas 7?",
+    "Siswa wajib hadir di sekolah paling lambat pukul 06.45 WIB.",
+    "Kegiatan ekstrakurikuler pramuka dilaksanakan setiap hari Sabtu setelah jam pelajaran.",
+    "Bagaimana cara mendaftar sebagai siswa baru di SMP Santo Leo III?",
+    "Seragam batik dipakai pada hari Kamis dan Jumat sesuai dengan peraturan sekolah.",
+    "Siswa yang terlambat lebih dari 15 menit harus melapor kepada guru piket.",
+    "Libur akhir semester ganjil dimulai pada minggu ketiga bulan Desember.",
+    "Orang tua dapat menghubungi wali kelas melalui buku penghubung atau telepon sekolah.",
+]
+
+def get_rss_mb():
+    """Returns the peak resident set size of this process in megabytes."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def measure_backend(backend, model_name, num_queries, batch_texts, results):
+    """Loads one embedding backend in a fresh process and measures load time, query latency, batch throughput and RSS."""
+    from tools.rag import create_embeddings
+
+    start_time = perf_counter()
+    embeddings = create_embeddings(model_name, backend)
+    load_seconds = perf_counter() - start_time
+    embeddings.embed_query("pemanasan")
+
+    latencies = []
+    for i in range(num_queries):
+        start_time = perf_counter()
+        embeddings.embed_query(SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)])
+        latencies.append((perf_counter() - start_time) * 1000)
+
+    texts = [SAMPLE_TEXTS[i % len(SAMPLE_TEXTS)] for i in range(batch_texts)]
+    start_time = perf_counter()
+    embeddings.embed_documents(texts)
+    batch_seconds = perf_counter() - start_time
+
+    results[backend] = {
+        "load_s": load_seconds,
+        "query_p50_ms": float(np.percentile(latencies, 50)),
+        "query_p95_ms": float(np.percentile(latencies, 95)),
+        "texts_per_sec": batch_texts / batch_seconds,
+        "rss_mb": get_rss_mb(),
+        "vectors": embeddings.embed_documents(SAMPLE_TEXTS),
+    }
+
+def run_benchmark(model_name="firqaaa/indo-sentence-bert-base", backends=("torch", "onnx"), num_queries=200, batch_texts=512):
+    """
+    Compares the embedding backends, each in its own process so the resident memory of one does not count for the other.
+    Also reports the dimensions and the mean cosine similarity of each backend's vectors to the first backend's.
+    """
+    context = multiprocessing.get_context("spawn")
+    with context.Manager() as manager:
+        results = manager.dict()
+        for backend in backends:
+            process = context.Process(target=measure_backend, args=(backend, model_name, num_queries, batch_texts, results))
+            process.start()
+            process.join()
+        results = dict(results)
+
+    reference = np.asarray(results[backends[0]]["vectors"]) if backends[0] in results else None
+    for backend in backends:
+        if backend not in results:
+            logging.info(f"{backend}: failed")
+            continue
+        vectors = np.asarray(results[backend].pop("vectors"))
+        results[backend]["dim"] = int(vectors.shape[1])
+        if reference is not None and reference.shape == vectors.shape:
+            cosine = (reference * vectors).sum(axis=1) / (np.linalg.norm(reference, axis=1) * np.linalg.norm(vectors, axis=1))
+            results[backend]["cosine_to_reference"] = mean(cosine.tolist())
+        logging.info(f"{backend}: {results[backend]}")
+
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
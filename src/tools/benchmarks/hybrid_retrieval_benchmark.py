@@ -0,0 +1,72 @@
+import re
+import logging
+import numpy as np
+from statistics import mean
+from time import perf_counter
+from tools.db import get_collection
+from tools.evaluations.evaluation import load_and_extract_conversations
+from tools.rag import EMBEDDING_MODEL_NAME, dense_search, hybrid_search, lexical_search, load_embedding_model
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+WORD_PATTERN = re.compile(r"\w+")
+
+def get_words(text):
+    """Returns the set of lowercase words of a text, without stemming, so the labels do not favour the BM25 tokenizer."""
+    return {word for word in WORD_PATTERN.findall(text.lower()) if len(word) > 2}
+
+def label_relevant_chunks(answers, min_coverage=0.6):
+    """
+    Labels the chunks of the vectors collection that contain at least min_coverage of the words of each reference answer.
+    The eval set has no chunk-level labels, so answer containment stands in for relevance.
+    """
+    chunks = [(document.get("source"), document["text"]) for document in get_collection("vectors").find({}, {"_id": 0, "source": 1, "text": 1})]
+    chunk_words = [get_words(text) for _, text in chunks]
+
+    relevant = []
+    for answer in answers:
+        answer_words = get_words(answer)
+        relevant.append({
+            chunk for chunk, words in zip(chunks, chunk_words)
+            if answer_words and len(answer_words & words) / len(answer_words) >= min_coverage
+        })
+    return relevant
+
+def run_benchmark(ks=(2, 4, 8)):
+    """Measures recall@k and search latency of dense-only, lexical-only and hybrid retrieval on the eval set."""
+    questions, answers = load_and_extract_conversations("semv/chatbot-sl-test-dataset")
+    relevant = label_relevant_chunks(answers)
+    labeled = [(question, chunks) for question, chunks in zip(questions, relevant) if chunks]
+    logging.info(f"{len(labeled)} of {len(questions)} questions have a chunk containing their answer")
+    if not labeled:
+        logging.warning("No question has a chunk containing its answer, sync the documents before running the benchmark")
+        return {}
+
+    model = load_embedding_model(EMBEDDING_MODEL_NAME)
+    for question, _ in labeled:
+        model.embed_query(question)
+    lexical_search(labeled[0][0])
+
+    searches = {
+        "dense": lambda question, k: dense_search(question, model, k),
+        "lexical": lexical_search,
+        "hybrid": lambda question, k: hybrid_search(question, model, k),
+    }
+    results = {}
+    for k in ks:
+        for name, search in searches.items():
+            recalls, latencies = [], []
+            for question, chunks in labeled:
+                start_time = perf_counter()
+                docs = search(question, k)
+                latencies.append((perf_counter() - start_time) * 1000)
+                retrieved = {(doc.metadata.get("source"), doc.page_content) for doc in docs}
+                recalls.append(1.0 if retrieved & chunks else 0.0)
+
+            results[f"{name} k={k}"] = {"recall": mean(recalls), "latency_ms": mean(latencies), "p95_ms": float(np.percentile(latencies, 95))}
+            logging.info(f"{name} k={k}: recall@{k} {mean(recalls):.3f}, mean latency {mean(latencies):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms")
+
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,68 @@
+import logging
+import numpy as np
+from time import perf_counter
+from tools.llm import apply_chat_template, create_llm_client, get_provider_config
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SYSTEM_MESSAGE = "Anda adalah chatbot berbahasa Indonesia yang bertugas untuk menjawab pertanyaan terkait SMP Santo Leo III."
+SAMPLE_PROMPTS = [
+    "Kapan jadwal ujian tengah semester untuk kelas 7?",
+    "Jam berapa siswa harus datang ke sekolah?",
+    "Apa saja kegiatan ekstrakurikuler yang ada?",
+    "Bagaimana cara mendaftar sebagai siswa baru?",
+]
+
+def measure_requests(client, model_name, num_requests, max_tokens):
+    """Sends streaming chat requests one after another and returns the time to first token and the total time of each in milliseconds."""
+    first_token_ms, total_ms = [], []
+    for i in range(num_requests):
+        messages = apply_chat_template([
+            {"role": "system", "content": SYSTEM_MESSAGE},
+            {"role": "user", "content": SAMPLE_PROMPTS[i % len(SAMPLE_PROMPTS)]},
+        ], model_name)
+        start_time = perf_counter()
+        first_token = None
+        for chunk in client.chat_completion(messages, max_tokens=max_tokens, temperature=0.2, stream=True):
+            if first_token is None and getattr(chunk.choices[0].delta, "content", None):
+                first_token = perf_counter()
+        end_time = perf_counter()
+        first_token_ms.append(((first_token or end_time) - start_time) * 1000)
+        total_ms.append((end_time - start_time) * 1000)
+    return first_token_ms, total_ms
+
+def summarize(latencies):
+    """Returns the median and 95th percentile of the latencies."""
+    return {"p50_ms": float(np.percentile(latencies, 50)), "p95_ms": float(np.percentile(latencies, 95))}
+
+def run_benchmark(model_name="meta-llama/Meta-Llama-3-8B-Instruct", providers=("hf", "openai", "llamacpp"), num_requests=10, max_tokens=64):
+    """
+    Compares the LLM providers configured in the [llm] secrets on client load time, time to first token and total latency.
+    For the openai provider it also measures a new client per request, to show what the pooled keep-alive connections save.
+    Providers that are not configured or not installed are reported as failed.
+    """
+    results = {}
+    for provider in providers:
+        try:
+            provider_config = {**get_provider_config(model_name), "provider": provider}
+            start_time = perf_counter()
+            client = create_llm_client(provider_config)
+            load_seconds = perf_counter() - start_time
+            measure_requests(client, model_name, 1, max_tokens)
+
+            first_token_ms, total_ms = measure_requests(client, model_name, num_requests, max_tokens)
+            results[provider] = {"load_s": load_seconds, "first_token": summarize(first_token_ms), "total": summarize(total_ms)}
+            if provider == "openai":
+                first_token_ms, total_ms = [], []
+                for _ in range(num_requests):
+                    request_first_token_ms, request_total_ms = measure_requests(create_llm_client(provider_config), model_name, 1, max_tokens)
+                    first_token_ms += request_first_token_ms
+                    total_ms += request_total_ms
+                results[provider]["new_client_per_request"] = {"first_token": summarize(first_token_ms), "total": summarize(total_ms)}
+            logging.info(f"{provider}: {results[provider]}")
+        except Exception as e:
+            logging.info(f"{provider}: failed: {e}")
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
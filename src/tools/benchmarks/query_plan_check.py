@@ -0,0 +1,31 @@
+import sys
+import logging
+from pymongo.mongo_client import MongoClient
+from tools.db import DB_NAME, check_query_plans, ensure_indexes
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def run_check(uri=None):
+    """
+    Creates the app's indexes and reports the query plan of every query shape the app runs.
+    With a URI, e.g. mongodb://localhost:27017 for a local mongod, the check runs there instead of the configured cluster.
+    Returns False if any query falls back to a collection scan or could not be explained.
+    """
+    if uri is None:
+        report = check_query_plans()
+    else:
+        client = MongoClient(uri)
+        try:
+            db = client.get_database(DB_NAME)
+            ensure_indexes(db)
+            report = check_query_plans(db)
+        finally:
+            client.close()
+
+    for row in report:
+        level = logging.WARNING if row["COLLSCAN"] is not False else logging.INFO
+        logging.log(level, f"{row['Collection']}: {row['Query']}: {row['Plan']}")
+    return all(row["COLLSCAN"] is False for row in report)
+
+if __name__ == "__main__":
+    sys.exit(0 if run_check(sys.argv[1] if len(sys.argv) > 1 else None) else 1)
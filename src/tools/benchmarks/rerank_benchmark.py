@@ -0,0 +1,64 @@
+import logging
+import numpy as np
+from statistics import mean
+from time import perf_counter
+from tools.benchmarks.hybrid_retrieval_benchmark import label_relevant_chunks
+from tools.evaluations.evaluation import load_and_extract_conversations
+from tools.rag import EMBEDDING_MODEL_NAME, RERANKER_MODEL_NAME, hybrid_search, load_embedding_model
+from tools.CrossEncoderReranker import CrossEncoderReranker
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def run_benchmark(k=4, candidates_factor=5, thresholds=(0.0, 0.1, 0.3, 0.5, 0.7), min_k=1):
+    """
+    Measures recall@k, the number of passages kept, the prompt context size and the rerank latency of hybrid retrieval
+    with and without the cross-encoder rerank stage on the eval set, for a range of score thresholds.
+    """
+    questions, answers = load_and_extract_conversations("semv/chatbot-sl-test-dataset")
+    relevant = label_relevant_chunks(answers)
+    labeled = [(question, chunks) for question, chunks in zip(questions, relevant) if chunks]
+    logging.info(f"{len(labeled)} of {len(questions)} questions have a chunk containing their answer")
+
+    model = load_embedding_model(EMBEDDING_MODEL_NAME)
+    reranker = CrossEncoderReranker(RERANKER_MODEL_NAME)
+    reranker.score("", ["warm-up"])
+
+    baseline_recalls, baseline_chars = [], []
+    scored, latencies = [], []
+    for question, chunks in labeled:
+        candidates = hybrid_search(question, model, k * candidates_factor)
+        keys = [(doc.metadata.get("source"), doc.page_content) for doc in candidates]
+        baseline_recalls.append(1.0 if set(keys[:k]) & chunks else 0.0)
+        baseline_chars.append(sum(len(doc.page_content) for doc in candidates[:k]))
+
+        start_time = perf_counter()
+        scores, _ = reranker.score(question, [doc.page_content for doc in candidates])
+        latencies.append((perf_counter() - start_time) * 1000)
+        scored.append((keys, scores, chunks))
+
+    results = {"hybrid": {"recall": mean(baseline_recalls), "passages": float(k), "context_chars": mean(baseline_chars), "rerank_ms": 0.0}}
+    logging.info(f"hybrid top-{k}: recall {mean(baseline_recalls):.3f}, {k} passages, {mean(baseline_chars):.0f} context chars")
+    logging.info(f"rerank of {k * candidates_factor} candidates: mean {mean(latencies):.1f} ms, p95 {np.percentile(latencies, 95):.1f} ms")
+
+    for threshold in thresholds:
+        recalls, passages, context_chars = [], [], []
+        for keys, scores, chunks in scored:
+            order = np.argsort(-scores)
+            kept = [i for i in order[:k] if scores[i] >= threshold] or list(order[:min_k])
+            kept_keys = {keys[i] for i in kept}
+            recalls.append(1.0 if kept_keys & chunks else 0.0)
+            passages.append(len(kept))
+            context_chars.append(sum(len(keys[i][1]) for i in kept))
+
+        results[f"rerank threshold={threshold}"] = {
+            "recall": mean(recalls),
+            "passages": mean(passages),
+            "context_chars": mean(context_chars),
+            "rerank_ms": mean(latencies),
+        }
+        logging.info(f"rerank threshold={threshold}: recall {mean(recalls):.3f}, {mean(passages):.2f} passages, {mean(context_chars):.0f} context chars")
+
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
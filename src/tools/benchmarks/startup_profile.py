@@ -0,0 +1,94 @@
+import os
+import sys
+import logging
+import subprocess
+from time import perf_counter
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+MODULES = [
+    "utils.helpers",
+    "tools.auth",
+    "tools.warmup",
+    "tools.chat",
+    "tools.rag",
+    "components.users_menu",
+    "components.docs_menu",
+    "components.llms_menu",
+    "components.metrics_menu",
+    "tools.evaluations.evaluation",
+]
+PAGES = ["app.py", "pages/login.py", "pages/register.py"]
+
+def profile_import(module, top=5):
+    """
+    Imports a module in a fresh interpreter with -X importtime.
+    Returns the cumulative import time of the module in milliseconds and the slowest top-level packages it pulled in.
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        env={**os.environ, "PYTHONPATH": SRC_DIR},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+
+    packages = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not name.startswith("  "):
+            packages[name.strip()] = int(cumulative) / 1000
+    total = packages.get(module, 0.0)
+    slowest = sorted(((name, ms) for name, ms in packages.items() if name != module), key=lambda item: -item[1])[:top]
+    return total, slowest
+
+def profile_first_paint(page, timeout=60):
+    """Runs a page once with Streamlit's AppTest in a fresh interpreter and returns the time to a finished run in milliseconds."""
+    script = (
+        "from time import perf_counter\n"
+        "start_time = perf_counter()\n"
+        "from streamlit.testing.v1 import AppTest\n"
+        f"app = AppTest.from_file({page!r}, default_timeout={timeout})\n"
+        "app.run()\n"
+        "print((perf_counter() - start_time) * 1000)\n"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=SRC_DIR,
+        env={**os.environ, "PYTHONPATH": SRC_DIR},
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    return float(result.stdout.strip().splitlines()[-1])
+
+def run_benchmark(modules=MODULES, pages=PAGES):
+    """Reports the cold import time of the app's modules, the packages that dominate it, and the first-run latency of the entry pages."""
+    results = {"imports": {}, "pages": {}}
+    for module in modules:
+        try:
+            start_time = perf_counter()
+            total, slowest = profile_import(module)
+            results["imports"][module] = {"import_ms": total, "slowest": slowest}
+            logging.info(f"import {module}: {total:.0f} ms (interpreter {(perf_counter() - start_time) * 1000:.0f} ms), slowest: "
+                         + ", ".join(f"{name} {ms:.0f} ms" for name, ms in slowest))
+        except Exception as e:
+            logging.info(f"import {module}: failed: {e}")
+
+    for page in pages:
+        try:
+            results["pages"][page] = profile_first_paint(page)
+            logging.info(f"first run of {page}: {results['pages'][page]:.0f} ms")
+        except Exception as e:
+            logging.info(f"first run of {page}: failed: {e}")
+
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
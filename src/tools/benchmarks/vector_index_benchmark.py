@@ -0,0 +1,53 @@
+import logging
+import tempfile
+import numpy as np
+from statistics import mean
+from time import perf_counter
+from tools.LocalVectorStore import LocalVectorStore
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+def make_corpus(num_vectors, dim, num_topics, seed=0):
+    """Generates clustered unit vectors that mimic sentence embeddings grouped by topic."""
+    rng = np.random.default_rng(seed)
+    topics = rng.normal(size=(num_topics, dim))
+    vectors = topics[rng.integers(0, num_topics, num_vectors)] + 0.5 * rng.normal(size=(num_vectors, dim))
+    return vectors.astype(np.float32)
+
+def run_benchmark(num_vectors=100000, dim=768, num_queries=200, k=4, nprobes=(1, 4, 8, 16, 32)):
+    """Measures recall@k and query latency of the IVF index against exact brute-force search."""
+    vectors = make_corpus(num_vectors, dim, num_topics=max(1, num_vectors // 500))
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(num_vectors, num_queries, replace=False)] + 0.2 * rng.normal(size=(num_queries, dim))
+    texts = [str(i) for i in range(num_vectors)]
+
+    with tempfile.TemporaryDirectory() as index_dir:
+        start_time = perf_counter()
+        meta = LocalVectorStore.build(index_dir, vectors, texts, index_type="ivf")
+        logging.info(f"Built IVF index with {meta['nlist']} lists over {num_vectors} vectors in {perf_counter() - start_time:.1f} s")
+        store = LocalVectorStore(index_dir, embedding=None)
+
+        exact_ids, exact_latencies = [], []
+        for query in queries:
+            start_time = perf_counter()
+            ids, _ = store.search_vector(query, k=k, exact=True)
+            exact_latencies.append((perf_counter() - start_time) * 1000)
+            exact_ids.append(set(ids.tolist()))
+        logging.info(f"flat: recall@{k} 1.000, mean latency {mean(exact_latencies):.2f} ms")
+
+        results = {"flat": {"recall": 1.0, "latency_ms": mean(exact_latencies)}}
+        for nprobe in nprobes:
+            store.nprobe = nprobe
+            recalls, latencies = [], []
+            for query, expected in zip(queries, exact_ids):
+                start_time = perf_counter()
+                ids, _ = store.search_vector(query, k=k)
+                latencies.append((perf_counter() - start_time) * 1000)
+                recalls.append(len(expected & set(ids.tolist())) / k)
+            results[f"ivf nprobe={nprobe}"] = {"recall": mean(recalls), "latency_ms": mean(latencies)}
+            logging.info(f"ivf nprobe={nprobe}: recall@{k} {mean(recalls):.3f}, mean latency {mean(latencies):.2f} ms")
+
+    return results
+
+if __name__ == "__main__":
+    run_benchmark()
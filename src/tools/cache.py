@@ -0,0 +1,328 @@
+import weakref
+import threading
+import numpy as np
+import streamlit as st
+from collections import OrderedDict
+from itertools import count
+from time import monotonic
+from langchain_core.embeddings import Embeddings
+from tools.ModelRegistry import ModelRegistry
+from tools.metrics import span
+from utils.helpers import get_secret
+
+class LRUCache:
+    """Thread-safe, bounded key-value cache with least-recently-used eviction and hit/miss counters."""
+
+    def __init__(self, max_entries=1000, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Returns the value cached for the key, or the default if it is missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or (self.ttl is not None and monotonic() - entry[1] > self.ttl):
+                self._entries.pop(key, None)
+                self.misses += 1
+                return default
+
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def set(self, key, value):
+        """Caches the value for the key, evicting the least recently used entries if the cache is full."""
+        with self._lock:
+            self._entries[key] = (value, monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, predicate=None):
+        """Removes every entry, or only the entries whose key matches the predicate."""
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+            else:
+                for key in [key for key in self._entries if predicate(key)]:
+                    del self._entries[key]
+
+    def clear(self):
+        """Removes all entries and resets the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns the number of entries, hits, misses and the hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper that caches query embeddings, so a repeated prompt is only encoded once.
+    Encoding a query is timed as the embed_prompt stage of the current trace.
+    """
+
+    def __init__(self, embeddings, cache, namespace=""):
+        self.embeddings = embeddings
+        self.cache = cache
+        self.namespace = namespace
+
+    def embed_documents(self, texts):
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text):
+        key = (self.namespace, text)
+        vector = self.cache.get(key)
+        if vector is None:
+            with span("embed_prompt"):
+                vector = self.embeddings.embed_query(text)
+            self.cache.set(key, vector)
+        return vector
+
+class SemanticCache:
+    """
+    Thread-safe cache of chatbot answers keyed on the embedding of the prompt.
+    A lookup hits when a prompt in the same scope is at least `threshold` cosine-similar.
+    Entries are evicted least-recently-used first once max_entries is reached, and expire after ttl seconds.
+    """
+
+    def __init__(self, threshold=0.95, max_entries=1000, ttl=86400):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._ids = count()
+        self._lock = threading.Lock()
+
+    def get(self, scope, vector):
+        """Returns the cached answer of the most similar prompt in the scope, or None."""
+        query = normalize_vector(vector)
+        with self._lock:
+            self._evict_expired()
+            best_id, best_score = None, self.threshold
+            for entry_id, (entry_scope, entry_vector, _, _) in self._entries.items():
+                if entry_scope == scope:
+                    score = float(entry_vector @ query)
+                    if score >= best_score:
+                        best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id][2]
+
+    def set(self, scope, vector, answer):
+        """Stores the answer for the prompt embedding in the scope."""
+        with self._lock:
+            self._entries[next(self._ids)] = (scope, normalize_vector(vector), answer, monotonic())
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Removes all entries and resets the statistics."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Returns the number of entries, hits, misses and the hit rate."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _evict_expired(self):
+        """Drops the entries older than ttl. Must be called with the lock held."""
+        now = monotonic()
+        for entry_id in [entry_id for entry_id, entry in self._entries.items() if now - entry[3] > self.ttl]:
+            del self._entries[entry_id]
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent computations: the first caller of a key runs it, and callers that arrive
+    while it is still running wait for it and share its result, or its error, instead of running it again.
+    Streamed results are shared as they are produced, so every caller receives the tokens as they arrive.
+    Waiting callers give up after timeout seconds without progress.
+    """
+
+    def __init__(self, timeout=120):
+        self.timeout = timeout
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Returns the result of fn for the key, and whether it was shared with a computation already in flight.
+        A caller that waited longer than the timeout for the computation in flight runs fn itself.
+        """
+        call, leader = self._join(key)
+        if not leader:
+            if call["done"].wait(self.timeout):
+                if call["error"] is not None:
+                    raise call["error"]
+                return call["result"], True
+            return fn(), False
+
+        try:
+            call["result"] = fn()
+        except Exception as e:
+            call["error"] = e
+            raise
+        finally:
+            self._finish(key, call)
+        return call["result"], False
+
+    def stream(self, key, fn):
+        """
+        Returns an iterator over the items of the iterable returned by fn for the key, and whether it is shared.
+        The first caller's iterator drives fn, the others replay the items produced so far and then follow along.
+        If the first caller drops its iterator without finishing it, even before starting it, the others fail instead of waiting.
+        """
+        call, leader = self._join(key)
+        if not leader:
+            return self._follow(call), True
+
+        try:
+            items = self._lead(key, call, iter(fn()))
+        except Exception as e:
+            call["error"] = e
+            self._finish(key, call)
+            raise
+        weakref.finalize(items, self._abandon, key, call)
+        return items, False
+
+    def _join(self, key):
+        """Returns the call in flight for the key, starting it if there is none, and whether the caller leads it."""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                return call, False
+            call = {"done": threading.Event(), "result": None, "error": None, "items": [], "changed": threading.Condition(self._lock)}
+            self._calls[key] = call
+            return call, True
+
+    def _finish(self, key, call):
+        with self._lock:
+            if self._calls.get(key) is call:
+                del self._calls[key]
+            call["done"].set()
+            call["changed"].notify_all()
+
+    def _abandon(self, key, call):
+        """Fails a streamed call whose leading iterator was garbage-collected before it finished."""
+        if not call["done"].is_set():
+            call["error"] = RuntimeError("The shared response stream was interrupted")
+            self._finish(key, call)
+
+    def _lead(self, key, call, items):
+        try:
+            for item in items:
+                with self._lock:
+                    call["items"].append(item)
+                    call["changed"].notify_all()
+                yield item
+        except Exception as e:
+            call["error"] = e
+            raise
+        except GeneratorExit:
+            call["error"] = RuntimeError("The shared response stream was interrupted")
+            raise
+        finally:
+            close = getattr(items, "close", None)
+            if close is not None:
+                close()
+            self._finish(key, call)
+
+    def _follow(self, call):
+        index = 0
+        while True:
+            with self._lock:
+                while index == len(call["items"]) and not call["done"].is_set():
+                    if not call["changed"].wait(self.timeout):
+                        raise TimeoutError("Timed out waiting for the shared response stream")
+                items = call["items"][index:]
+                finished = call["done"].is_set()
+            yield from items
+            index += len(items)
+            if finished and index == len(call["items"]):
+                if call["error"] is not None:
+                    raise call["error"]
+                return
+
+def normalize_vector(vector):
+    """Returns the vector scaled to unit length as a float32 numpy array."""
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm > 0 else vector
+
+@st.cache_resource(show_spinner=False)
+def get_semantic_cache():
+    """Returns the semantic response cache shared by the whole process."""
+    return SemanticCache(
+        threshold=float(get_secret("cache", "SEMANTIC_CACHE_THRESHOLD", 0.95)),
+        max_entries=int(get_secret("cache", "SEMANTIC_CACHE_MAX_ENTRIES", 1000)),
+        ttl=int(get_secret("cache", "SEMANTIC_CACHE_TTL", 86400)),
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_query_embedding_cache():
+    """Returns the query embedding cache shared by the whole process."""
+    return LRUCache(max_entries=int(get_secret("cache", "QUERY_EMBEDDING_CACHE_MAX_ENTRIES", 5000)))
+
+@st.cache_resource(show_spinner=False)
+def get_retrieval_cache():
+    """Returns the top-k retrieval result cache shared by the whole process."""
+    return LRUCache(
+        max_entries=int(get_secret("cache", "RETRIEVAL_CACHE_MAX_ENTRIES", 2000)),
+        ttl=int(get_secret("cache", "RETRIEVAL_CACHE_TTL", 3600)),
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_chat_history_cache():
+    """Returns the cache of users' chat history pages shared by the whole process."""
+    return LRUCache(
+        max_entries=int(get_secret("cache", "CHAT_HISTORY_CACHE_MAX_ENTRIES", 1000)),
+        ttl=int(get_secret("cache", "CHAT_HISTORY_CACHE_TTL", 30)),
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_model_registry():
+    """Returns the registry of loaded embedding models, rerankers and LLM clients shared by the whole process."""
+    max_memory_mb = get_secret("models", "MAX_MEMORY_MB", 4096)
+    max_entries = get_secret("models", "MAX_ENTRIES", 6)
+    return ModelRegistry(
+        max_bytes=int(max_memory_mb) * 1024 * 1024 if max_memory_mb else None,
+        max_entries=int(max_entries) if max_entries else None,
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_inflight_requests():
+    """Returns the single-flight layer that coalesces identical concurrent chat requests across the whole process."""
+    return SingleFlight(timeout=float(get_secret("chat", "COALESCE_TIMEOUT", 120)))
+
+def is_semantic_cache_enabled():
+    """Returns True if answers should be served from the semantic response cache."""
+    return bool(get_secret("cache", "SEMANTIC_CACHE_ENABLED", True))
\ No newline at end of file
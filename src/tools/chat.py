@@ -1,17 +1,26 @@
+import json
 import uuid
+import hashlib
 import streamlit as st
+from contextlib import ExitStack, contextmanager
 from datetime import datetime, timezone
-from huggingface_hub import InferenceClient
-from langchain_mongodb.chat_message_histories import MongoDBChatMessageHistory
-from langchain_core.runnables import RunnablePassthrough
-from langchain_huggingface import HuggingFaceEmbeddings
+from time import perf_counter
 from models.Conversation import Conversation
-from tools.rag import get_retriever
-from utils.helpers import convert_image_to_base64
+from tools.cache import get_chat_history_cache, get_inflight_requests, get_model_registry, get_semantic_cache, is_semantic_cache_enabled
+from tools.llm import apply_chat_template, close_stream, create_llm_client, get_llm_client_key, get_provider_config
+from tools.metrics import Trace, activate_trace, count, current_trace, record_trace, span, trace_request
+from tools.persistence import get_chat_turn_writer, is_write_behind_enabled, new_chat_turn, read_chat_messages, write_chat_turns
+from tools.prompt import count_message_tokens, count_tokens, fit_context, get_prompt_budget, load_tokenizer, split_history, summarize_messages
+from tools.rag import EMBEDDING_MODEL_NAME, retrieve_documents, get_embedding_model_spec, get_index_version, get_reranker_model_name, get_reranker_spec, is_rerank_enabled, load_embedding_model
+from utils.helpers import convert_image_to_base64, get_secret
+
+PROMPT_TEMPLATE = "Berikut ini adalah pertanyaan yang harus Anda jawab. Pertanyaan: "
 
 def create_chat(chat_data):
     """Creates a new conversation."""
-    return Conversation.create(chat_data)
+    result = Conversation.create(chat_data)
+    invalidate_chat_history(chat_data["user_id"])
+    return result
 
 @st.cache_data(show_spinner=False)
 def get_one_chat(criteria):
@@ -22,17 +31,56 @@ def get_all_users_chats(criteria):
     """Retrieves all user's conversations based on given criteria."""
     return Conversation.get_user_chats(criteria)
 
+def get_chat_history(user_id, pages=1):
+    """
+    Retrieves the first pages of a user's conversations for the history list, serving each page from a short-lived cache.
+    Returns the conversations and whether more pages are available.
+    """
+    page_size = int(get_secret("chat", "HISTORY_PAGE_SIZE", 20))
+    history_cache = get_chat_history_cache()
+    chats, cursor = [], None
+    for _ in range(pages):
+        cache_key = (user_id, cursor, page_size)
+        page = history_cache.get(cache_key)
+        if page is None:
+            page = Conversation.get_user_chats_page(user_id, cursor, page_size)
+            history_cache.set(cache_key, page)
+
+        page_chats, cursor = page
+        chats.extend(page_chats)
+        if cursor is None:
+            break
+    return chats, cursor is not None
+
+def invalidate_chat_history(user_id):
+    """Drops the cached history pages of a user."""
+    get_chat_history_cache().invalidate(lambda cache_key: cache_key[0] == user_id)
+
+def invalidate_chat_owner_history(criteria):
+    """Drops the cached history pages of the owner of the conversation matching the criteria."""
+    conversation = Conversation.get_one(criteria)
+    if conversation is not None:
+        invalidate_chat_history(conversation["user_id"])
+
 def update_chat_title(criteria, chat_title):
     """Updates a conversation's title based on given criteria."""
-    return Conversation.update_title(criteria, chat_title)
+    result = Conversation.update_title(criteria, chat_title)
+    invalidate_chat_owner_history(criteria)
+    return result
 
 def update_chat_updated_at(criteria):
     """Updates a conversation's updated_at based on given criteria."""
-    return Conversation.update_updated_at(criteria)
+    result = Conversation.update_updated_at(criteria)
+    invalidate_chat_owner_history(criteria)
+    return result
 
 def delete_chat(criteria):
     """Deletes a conversation based on given criteria."""
-    return Conversation.delete(criteria)
+    conversation = Conversation.get_one(criteria)
+    result = Conversation.delete(criteria)
+    if conversation is not None:
+        invalidate_chat_history(conversation["user_id"])
+    return result
 
 def generate_session_id():
     """Generates a new unique session ID."""
@@ -45,8 +93,12 @@ def display_chat(message):
     else:
         return st.chat_message(message["role"]).markdown(message["content"])
 
-def generate_response(prompt, model_config):
-    """Generates a response based on the prompt and model configuration."""
+def display_chat_stream(response_stream):
+    """Renders a streamed chatbot response incrementally and returns the full text."""
+    return st.chat_message("assistant").write_stream(response_stream)
+
+def start_chat_session(prompt):
+    """Creates a new conversation for the prompt if the user is not in one yet."""
     if st.session_state.chat_session_id is None:
         session_id = generate_session_id()
         st.session_state.chat_session_id = session_id
@@ -61,104 +113,309 @@ def generate_response(prompt, model_config):
             }
             create_chat(chat_data)
 
-    if st.session_state.embedding_model is None:
-        embedding_model = load_embedding_model("firqaaa/indo-sentence-bert-base")
-    else:
-        embedding_model = st.session_state.embedding_model
+def get_embedding_model():
+    """Returns the shared embedding model, loading it if needed."""
+    return load_embedding_model(EMBEDDING_MODEL_NAME)
+
+@contextmanager
+def use_models(model_config=None):
+    """
+    Holds references to the embedding model, the reranker if reranking is enabled and, given a model configuration, its LLM client
+    for the duration of the with block, so the model registry does not evict them while a request is using them.
+    """
+    registry = get_model_registry()
+    with ExitStack() as stack:
+        stack.enter_context(registry.use(*get_embedding_model_spec(EMBEDDING_MODEL_NAME)))
+        if is_rerank_enabled():
+            stack.enter_context(registry.use(*get_reranker_spec(get_reranker_model_name())))
+        if model_config is not None:
+            stack.enter_context(registry.use(*get_llm_model_spec(model_config)))
+        yield
+
+def retrieve_context(prompt):
+    """Retrieves the documents relevant to the prompt and joins them into a context string."""
+    docs = retrieve_documents(prompt, get_embedding_model())
+    return "\n\n".join([d.page_content for d in docs])
+
+def get_cache_scope(model_config):
+    """
+    Returns the semantic cache scope of the current prompt: the model settings, the vector index version
+    and the earlier turns of the conversation, so follow-up questions never reuse answers given in another context.
+    """
+    history = json.dumps(st.session_state.messages[1:-1], sort_keys=True, default=str)
+    return (
+        model_config["model_name"],
+        model_config["temperature"],
+        model_config["top_p"],
+        model_config["max_tokens"],
+        get_index_version(),
+        hashlib.sha256(history.encode("utf-8")).hexdigest(),
+    )
 
-    retriever = get_retriever(embedding_model)
-    retrieve = {"context": retriever | (lambda docs: "\n\n".join([d.page_content for d in docs])), "question": RunnablePassthrough()}
+def get_cached_response(prompt, model_config):
+    """Looks the prompt up in the semantic cache and returns the cached answer and the cache key."""
+    if not is_semantic_cache_enabled():
+        return None, None
 
-    context = retrieve["context"].invoke(prompt)
+    cache_key = (get_cache_scope(model_config), get_embedding_model().embed_query(prompt))
+    with span("semantic_cache_lookup"):
+        return get_semantic_cache().get(*cache_key), cache_key
 
+def get_request_key(prompt, model_config):
+    """Returns the key identical requests are coalesced on: the normalized prompt and its semantic cache scope."""
+    return (normalize_prompt(prompt), get_cache_scope(model_config))
+
+def normalize_prompt(prompt):
+    """Returns the prompt case-folded, with runs of whitespace collapsed and surrounding punctuation removed."""
+    return " ".join(prompt.casefold().split()).strip(" .,!?")
+
+def run_single_flight(prompt, model_config, answer, stream=False):
+    """
+    Returns answer(prompt, model_config), computed once for identical concurrent requests when chat.COALESCE_REQUESTS is on.
+    With stream=True the answer is an iterator of tokens that every waiting request receives as they are generated.
+    """
+    if not bool(get_secret("chat", "COALESCE_REQUESTS", True)):
+        return answer(prompt, model_config)
+
+    inflight_requests = get_inflight_requests()
+    run = inflight_requests.stream if stream else inflight_requests.do
+    result, shared = run(get_request_key(prompt, model_config), lambda: answer(prompt, model_config))
+    if shared:
+        count("coalesced_requests", 1)
+    return result
+
+def answer_prompt(prompt, model_config):
+    """Answers the prompt from the semantic cache, or from the retrieved context with the LLM and caches the answer."""
+    response, cache_key = get_cached_response(prompt, model_config)
+    if response is not None:
+        count("cache_hits", 1)
+        return response
+
+    context = retrieve_context(prompt)
     response = llm_chat_completion(prompt, context, model_config)
-    insert_chat_session(st.session_state.chat_session_id, {"user": prompt, "ai": response})
+    if cache_key is not None:
+        get_semantic_cache().set(*cache_key, response)
+    return response
+
+def answer_prompt_stream(prompt, model_config):
+    """Like answer_prompt, but returns an iterator of the response tokens. The answer is cached once the stream finishes."""
+    response, cache_key = get_cached_response(prompt, model_config)
+    if response is not None:
+        count("cache_hits", 1)
+        return iter([response])
+
+    context = retrieve_context(prompt)
+    return cache_response_stream(llm_chat_completion_stream(prompt, context, model_config), cache_key)
+
+def cache_response_stream(tokens, cache_key):
+    """Yields the response tokens and stores the full response in the semantic cache once the stream finishes."""
+    response_tokens = []
+    try:
+        for token in tokens:
+            response_tokens.append(token)
+            yield token
+    finally:
+        close_stream(tokens)
+    if cache_key is not None:
+        get_semantic_cache().set(*cache_key, "".join(response_tokens))
+
+def generate_response(prompt, model_config):
+    """
+    Generates a response based on the prompt and model configuration.
+    Identical concurrent requests share one answer, but each saves it to its own chat history.
+    """
+    with trace_request("chat"), use_models(model_config):
+        with span("start_chat_session"):
+            start_chat_session(prompt)
+        response = run_single_flight(prompt, model_config, answer_prompt)
+
+        with span("persist_chat"):
+            insert_chat_session(st.session_state.chat_session_id, {"user": prompt, "ai": response})
     return response
 
+def generate_response_stream(prompt, model_config):
+    """
+    Retrieves the context for the prompt and returns a generator that streams the response tokens.
+    Identical concurrent requests share one stream, but each saves the response to its own chat history.
+    """
+    trace = Trace("chat_stream")
+    with activate_trace(trace), use_models(model_config):
+        with span("start_chat_session"):
+            start_chat_session(prompt)
+        tokens = run_single_flight(prompt, model_config, answer_prompt_stream, stream=True)
+    return stream_and_save_response(prompt, tokens, st.session_state.chat_session_id, trace, model_config)
+
+def stream_and_save_response(prompt, tokens, session_id, trace, model_config):
+    """
+    Yields response tokens as they arrive and saves the full response once the stream finishes.
+    The models of the configuration are held until the stream ends. A stream abandoned by the page is closed
+    right away, so an in-process model is free for the next request.
+    """
+    response_tokens = []
+    start_time = perf_counter()
+    with use_models(model_config):
+        try:
+            for token in tokens:
+                if not response_tokens:
+                    trace.add_span("llm_first_token", (perf_counter() - start_time) * 1000)
+                response_tokens.append(token)
+                yield token
+        finally:
+            close_stream(tokens)
+    trace.add_span("llm_completion", (perf_counter() - start_time) * 1000)
+
+    response = "".join(response_tokens)
+    with trace.span("persist_chat"):
+        insert_chat_session(session_id, {"user": prompt, "ai": response})
+    record_trace(trace)
+
+def build_chat_messages(prompt, context, model_config):
+    """
+    Builds the list of chat messages sent to the LLM from the prompt, context and chat history, fitted into the prompt token budget.
+    The retrieved context gets up to chat.CONTEXT_TOKEN_SHARE of the tokens left after the system message and the question,
+    the most recent turns get the rest, and the older turns are replaced by a rolling summary.
+    The messages are adapted to the model's chat template.
+    """
+    tokenizer = load_tokenizer(model_config["model_name"])
+    system_message = st.session_state.messages[0]["content"]
+    history = st.session_state.messages[1:-1]
+    summarize = bool(get_secret("chat", "SUMMARIZE_HISTORY", True))
+    summary_max_tokens = int(get_secret("chat", "SUMMARY_MAX_TOKENS", 256)) if summarize else 0
+
+    budget = get_prompt_budget(model_config) - count_message_tokens([
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": f"{PROMPT_TEMPLATE}{prompt}"},
+    ], tokenizer)
+    context = fit_context(context, int(budget * float(get_secret("chat", "CONTEXT_TOKEN_SHARE", 0.6))), tokenizer)
+    budget -= count_tokens(context, tokenizer) + summary_max_tokens
+    older_messages, recent_messages = split_history(history, budget, tokenizer)
+
+    summary = ""
+    if older_messages and summarize:
+        summary = get_history_summary(older_messages, model_config, summary_max_tokens)
+    summary = f" \nRingkasan percakapan sebelumnya: {summary}" if summary else ""
+
+    final_prompt = {
+        "role": "user",
+        "content": f"\nKonteks: {context} \n{PROMPT_TEMPLATE}{prompt}"
+    }
+    messages = [{"role": "system", "content": f"{system_message}{summary}"}] + recent_messages + [final_prompt]
+    return apply_chat_template(messages, model_config["model_name"])
+
+def get_history_summary(older_messages, model_config, max_tokens):
+    """
+    Returns the rolling summary of the turns that no longer fit into the prompt, kept in the session.
+    The session keeps a summary per prefix of the conversation that was summarized, keyed on a digest of its messages.
+    The longest prefix of older_messages with a summary is reused and only the messages after it are summarized on top.
+    When the window grows, a shorter prefix is reused, so turns that are back in the prompt are not in the summary.
+    """
+    summaries = [
+        summary for summary in st.session_state.history_summary or []
+        if summary["messages"] > len(older_messages) or summary["digest"] == get_messages_digest(older_messages[:summary["messages"]])
+    ]
+    base = max(
+        (summary for summary in summaries if summary["messages"] <= len(older_messages)),
+        key=lambda summary: summary["messages"],
+        default={"text": "", "messages": 0},
+    )
+    new_messages = older_messages[base["messages"]:]
+    if not new_messages:
+        st.session_state.history_summary = summaries
+        return base["text"]
+    try:
+        with span("summarize_history"):
+            text = summarize_messages(new_messages, base["text"], load_llm_model(model_config), max_tokens)
+    except Exception as e:
+        print(f"Error summarizing chat history: {e}")
+        st.session_state.history_summary = summaries
+        return base["text"]
+    summaries.append({"text": text, "messages": len(older_messages), "digest": get_messages_digest(older_messages)})
+    st.session_state.history_summary = summaries
+    return text
+
+def get_messages_digest(messages):
+    """Returns a digest of the roles and contents of the messages."""
+    payload = json.dumps([[message["role"], message["content"]] for message in messages], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 def llm_chat_completion(prompt, context, model_config):
     """Generates a chat completion response from LLM using the provided prompt and model configuration."""
-    if st.session_state.llm_model is None:
-        llm_model = load_llm_model(model_config)
-    else:
-        llm_model = st.session_state.llm_model
+    llm_model = load_llm_model(model_config)
+    messages = build_chat_messages(prompt, context, model_config)
 
-    system_message = st.session_state.messages[0]["content"]
-    messages = []
-
-    if model_config["model_name"] == "mistralai/Mistral-7B-Instruct-v0.3":
-        final_prompt = {
-            "role": "user",
-            "content": f"{system_message} \nKonteks: {context} \nBerikut ini adalah pertanyaan yang harus Anda jawab. Pertanyaan: {prompt}"
-        }
-
-        if len(st.session_state.messages) > 7:
-            system_prompt = st.session_state.messages[0]
-            last_six_messages = st.session_state.messages[-7:]
-            messages = [system_prompt] + last_six_messages
-        else:
-            messages = st.session_state.messages[1:]
-    else:
-        final_prompt = {
-            "role": "user",
-            "content": f"\nKonteks: {context} \nBerikut ini adalah pertanyaan yang harus Anda jawab. Pertanyaan: {prompt}"
-        }
-
-        if len(st.session_state.messages) > 7:
-            last_six_messages = st.session_state.messages[-7:]
-            messages = last_six_messages
-        else:
-            messages = st.session_state.messages
-
-    messages_copy = messages.copy()
-    messages_copy[-1] = final_prompt
-
-    response = llm_model.chat_completion(
-        messages_copy,
+    with span("llm_completion"):
+        response = llm_model.chat_completion(
+            messages,
+            max_tokens=model_config["max_tokens"],
+            temperature=model_config["temperature"],
+            top_p=model_config["top_p"],
+        )
+
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        count("prompt_tokens", usage.prompt_tokens)
+        count("completion_tokens", usage.completion_tokens)
+    return response.choices[0].message.content
+
+def llm_chat_completion_stream(prompt, context, model_config):
+    """
+    Starts streaming a chat completion response from LLM and returns a generator of the tokens as they are generated.
+    Streamed responses carry no usage, so the prompt and completion tokens are counted with the model's tokenizer.
+    """
+    llm_model = load_llm_model(model_config)
+    tokenizer = load_tokenizer(model_config["model_name"])
+    messages = build_chat_messages(prompt, context, model_config)
+    count("prompt_tokens", count_message_tokens(messages, tokenizer))
+
+    chunks = llm_model.chat_completion(
+        messages,
         max_tokens=model_config["max_tokens"],
         temperature=model_config["temperature"],
         top_p=model_config["top_p"],
+        stream=True,
     )
+    return stream_completion_tokens(chunks, tokenizer, current_trace.get())
 
-    return response.choices[0].message.content
+def stream_completion_tokens(chunks, tokenizer, trace):
+    """Yields the content of the streamed chunks, and adds the tokens of the response to the trace's completion_tokens once the stream ends."""
+    response_tokens = []
+    try:
+        for chunk in chunks:
+            token = getattr(chunk.choices[0].delta, "content", None)
+            if token:
+                response_tokens.append(token)
+                yield token
+    finally:
+        close_stream(chunks)
+        if trace is not None:
+            trace.count("completion_tokens", count_tokens("".join(response_tokens), tokenizer))
 
-@st.cache_resource(show_spinner=False)
 def get_chat_session(session_id):
-    """Retrieves a chat session history from the database based on the session ID."""
-    return MongoDBChatMessageHistory(
-        session_id=session_id,
-        connection_string=st.secrets.mongo.MONGODB_ATLAS_CLUSTER_URI,
-        database_name="chatbot_db",
-        collection_name="chat_histories",
-    )
+    """Retrieves the messages of a chat session from the database based on the session ID."""
+    if is_write_behind_enabled():
+        get_chat_turn_writer().flush()
+    return read_chat_messages(session_id)
 
 def insert_chat_session(session_id, messages):
-    """Inserts user and chatbot messages into the database."""
-    chat_message_history = MongoDBChatMessageHistory(
-        session_id=session_id,
-        connection_string=st.secrets.mongo.MONGODB_ATLAS_CLUSTER_URI,
-        database_name="chatbot_db",
-        collection_name="chat_histories",
-    )
-
-    chat_message_history.add_user_message(messages["user"])
-    chat_message_history.add_ai_message(messages["ai"])
+    """
+    Saves the user and chatbot messages of a turn and bumps the conversation's updated_at in one batch,
+    either right away or through the write-behind queue. The user's cached history pages are dropped once the turn is stored,
+    by the writer's thread for write-behind, so they are never cached again with the old updated_at in between.
+    """
+    if is_write_behind_enabled():
+        get_chat_turn_writer().submit(session_id, messages["user"], messages["ai"], st.session_state.user_id)
+    else:
+        write_chat_turns([new_chat_turn(session_id, messages["user"], messages["ai"], st.session_state.user_id)])
+        invalidate_chat_history(st.session_state.user_id)
 
-@st.cache_resource(show_spinner=False)
 def load_llm_model(model_config):
-    """Loads the large language model (LLM) based on the provided model configuration."""
-    return InferenceClient(
-        model_config["model_name"],
-        token=st.secrets.hf.HUGGINGFACEHUB_API_TOKEN
-    )
+    """Returns the LLM client of the model configuration from the model registry, loading it if needed."""
+    return get_model_registry().get(*get_llm_model_spec(model_config))
 
-@st.cache_resource(show_spinner=False)
-def load_embedding_model(model_name):
-    """Loads the large embedding model based on the provided model name."""
-    model_kwargs = {'device': 'cpu'}
-    encode_kwargs = {'normalize_embeddings': False}
-
-    return HuggingFaceEmbeddings(
-        model_name=model_name,
-        model_kwargs=model_kwargs,
-        encode_kwargs=encode_kwargs
-    )
\ No newline at end of file
+def get_llm_model_spec(model_config):
+    """
+    Returns the model registry key of the LLM client and the loader that creates it with the model's provider.
+    The key only holds what the client depends on, so configurations that differ in sampling settings share one client.
+    """
+    provider_config = get_provider_config(model_config["model_name"])
+    return get_llm_client_key(model_config["model_name"], provider_config), lambda: create_llm_client(provider_config)
\ No newline at end of file
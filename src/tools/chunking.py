@@ -0,0 +1,161 @@
+import re
+import json
+import hashlib
+from fnmatch import fnmatch
+from langchain_core.documents import Document
+from tools.prompt import count_tokens
+from utils.helpers import get_secret
+
+CHUNKER_VERSION = 1
+DEFAULT_POLICY = {
+    "strategy": "tokens",
+    "chunk_tokens": 256,
+    "overlap_tokens": 32,
+    "min_chunk_tokens": 32,
+}
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+(?=[\"'(\[]?[A-Z0-9])")
+HEADING_PATTERN = re.compile(r"^(?:BAB|PASAL|BAGIAN|Bab|Pasal|Bagian)\b|^(?:[IVXLC]+|\d+(?:\.\d+)*|[A-Z])[.)]\s+\S")
+
+def get_chunking_policy(source):
+    """
+    Returns the chunking policy of a source file: DEFAULT_POLICY, with rag.CHUNK_TOKENS and rag.CHUNK_OVERLAP_TOKENS,
+    overridden by the first entry of rag.CHUNKING_POLICIES whose filename pattern matches the source, e.g.
+    {"Kalender Akademik*.pdf": {"chunk_tokens": 128}} or {"*.json": {"strategy": "whole"}}.
+    """
+    policy = dict(DEFAULT_POLICY)
+    policy["chunk_tokens"] = int(get_secret("rag", "CHUNK_TOKENS", policy["chunk_tokens"]))
+    policy["overlap_tokens"] = int(get_secret("rag", "CHUNK_OVERLAP_TOKENS", policy["overlap_tokens"]))
+    for pattern, overrides in dict(get_secret("rag", "CHUNKING_POLICIES", {})).items():
+        if fnmatch(source, pattern):
+            policy.update(dict(overrides))
+            break
+    return policy
+
+def get_policy_hash(content_hash, policy):
+    """Returns the hash that identifies a file's vectors: its content, the chunking policy and the chunker version."""
+    fingerprint = json.dumps({"content_hash": content_hash, "policy": policy, "version": CHUNKER_VERSION}, sort_keys=True)
+    return hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+
+def is_heading(line):
+    """Returns True if a line looks like a heading: a chapter or article title, a numbered title, or a short uppercase line."""
+    line = line.strip()
+    if not line or len(line) > 100 or line.endswith((".", ",", ";")):
+        return False
+    letters = [c for c in line if c.isalpha()]
+    return bool(HEADING_PATTERN.match(line)) or (len(letters) >= 3 and all(c.isupper() for c in letters))
+
+def split_units(text, page=None):
+    """
+    Splits a page of text into headings and sentences, with the character offset of each in the page.
+    Returns a list of (text, page, offset, is_heading) tuples.
+    """
+    units = []
+    offset = 0
+    for line in text.splitlines(keepends=True):
+        stripped = line.strip()
+        if stripped:
+            line_offset = offset + line.index(stripped)
+            if is_heading(stripped):
+                units.append((stripped, page, line_offset, True))
+            else:
+                sentence_offset = 0
+                for sentence in SENTENCE_BOUNDARY.split(stripped):
+                    sentence_offset = stripped.index(sentence, sentence_offset)
+                    units.append((sentence, page, line_offset + sentence_offset, False))
+                    sentence_offset += len(sentence)
+        offset += len(line)
+    return merge_wrapped_lines(units)
+
+def merge_wrapped_lines(units):
+    """Joins sentence fragments that PDF extraction broke over several lines back into sentences."""
+    merged = []
+    for unit in units:
+        previous = merged[-1] if merged else None
+        if previous and not unit[3] and not previous[3] and previous[1] == unit[1] and not previous[0].endswith((".", "!", "?", ":", ";")):
+            merged[-1] = (f"{previous[0]} {unit[0]}", previous[1], previous[2], False)
+        else:
+            merged.append(unit)
+    return merged
+
+def split_long_unit(unit, max_tokens, tokenizer):
+    """Splits a sentence longer than max_tokens into word windows that fit."""
+    text, page, offset, heading = unit
+    parts, words, start = [], [], 0
+    for match in re.finditer(r"\S+", text):
+        if words and count_tokens(" ".join(words + [match.group()]), tokenizer) > max_tokens:
+            parts.append((" ".join(words), page, offset + start, heading))
+            words = []
+        if not words:
+            start = match.start()
+        words.append(match.group())
+    if words:
+        parts.append((" ".join(words), page, offset + start, heading))
+    return parts
+
+def chunk_pages(pages, policy, tokenizer, metadata=None, paged=True):
+    """
+    Splits the pages of a document into chunks of at most policy["chunk_tokens"] tokens of the embedding tokenizer.
+    Chunks end at sentence boundaries, a heading starts a new chunk once the current one has min_chunk_tokens, and
+    a chunk continuing a section starts with the section heading. Consecutive chunks share up to overlap_tokens
+    tokens of whole sentences. Every chunk records its section, its first and last page and its offset in the first page.
+    Pass paged=False for documents without pages, like JSON records.
+    """
+    metadata = metadata or {}
+    if policy["strategy"] == "whole":
+        text = "\n".join(page or "" for page in pages).strip()
+        if not text:
+            return []
+        chunk_metadata = {**metadata, "chunk": 0, "section": None, "offset": 0}
+        if paged:
+            chunk_metadata.update({"page": 1, "end_page": len(pages)})
+        return [Document(page_content=text, metadata=chunk_metadata)]
+
+    max_tokens = policy["chunk_tokens"]
+    model_max_length = getattr(tokenizer, "model_max_length", None)
+    if model_max_length and model_max_length < 100000:
+        max_tokens = min(max_tokens, model_max_length - 2)
+
+    units = []
+    for page_number, text in enumerate(pages, start=1):
+        for unit in split_units(text or "", page_number):
+            if count_tokens(unit[0], tokenizer) > max_tokens:
+                units.extend(split_long_unit(unit, max_tokens, tokenizer))
+            else:
+                units.append(unit)
+    tokens = [count_tokens(unit[0], tokenizer) for unit in units]
+
+    chunks, current, section = [], [], None
+
+    def flush():
+        chunk_metadata = {**metadata, "chunk": len(chunks), "section": section, "offset": units[current[0]][2]}
+        if paged:
+            chunk_metadata.update({"page": units[current[0]][1], "end_page": units[current[-1]][1]})
+        text = " ".join(section if i is None else units[i][0] for i in [None] * heading_prefix + current)
+        chunks.append(Document(page_content=text, metadata=chunk_metadata))
+
+    heading_prefix, used = 0, 0
+    for i, unit in enumerate(units):
+        starts_section = unit[3] and used >= policy["min_chunk_tokens"] and not all(units[j][3] for j in current)
+        if current and (starts_section or used + tokens[i] > max_tokens):
+            flush()
+            overlap = []
+            if not starts_section:
+                for j in reversed(current):
+                    if units[j][3] or sum(tokens[k] for k in overlap) + tokens[j] > policy["overlap_tokens"]:
+                        break
+                    overlap.insert(0, j)
+            current = overlap
+            heading_prefix = int(not unit[3] and section is not None)
+            used = sum(tokens[j] for j in current) + (count_tokens(section, tokenizer) if heading_prefix else 0)
+            if used + tokens[i] > max_tokens:
+                current, heading_prefix, used = [], 0, 0
+
+        if unit[3]:
+            section = unit[0]
+        current.append(i)
+        used += tokens[i]
+
+    if current and not all(units[i][3] for i in current):
+        flush()
+    return chunks
@@ -1,13 +1,211 @@
+import atexit
 import streamlit as st
+from pymongo import ASCENDING, DESCENDING, IndexModel
 from pymongo.mongo_client import MongoClient
+from utils.helpers import get_secret
 
+DB_NAME = "chatbot_db"
+
+INDEXES = {
+    "users": [
+        IndexModel([("username", ASCENDING)], unique=True, name="username_unique"),
+        IndexModel([("email", ASCENDING)], unique=True, name="email_unique"),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at"),
+        IndexModel([("last_login", DESCENDING), ("_id", DESCENDING)], name="last_login"),
+        IndexModel([("updated_at", DESCENDING), ("_id", DESCENDING)], name="updated_at"),
+        IndexModel([("username", ASCENDING), ("_id", ASCENDING)], name="username"),
+        IndexModel([("first_name", ASCENDING), ("_id", ASCENDING)], name="first_name"),
+        IndexModel([("last_name", ASCENDING)], name="last_name"),
+    ],
+    "conversations": [
+        IndexModel([("session_id", ASCENDING)], unique=True, name="session_id_unique"),
+        IndexModel([("user_id", ASCENDING), ("updated_at", DESCENDING), ("_id", DESCENDING)], name="user_id_updated_at"),
+    ],
+    "chat_histories": [
+        IndexModel([("SessionId", ASCENDING), ("_id", ASCENDING)], name="session_id_order"),
+    ],
+    "vectors": [
+        IndexModel([("source", ASCENDING), ("content_hash", ASCENDING)], name="source_content_hash"),
+    ],
+    "metrics": [
+        IndexModel([("timestamp", DESCENDING)], name="timestamp"),
+    ],
+}
+
+# Queries that read every document of their collection by design. Their plans are reported, but a collection scan
+# does not fail the check.
+FULL_SCAN_QUERIES = {"User.get_stats", "count_vectors with search"}
+
+class Aggregation:
+    """An aggregation pipeline that can be explained like a cursor."""
+
+    def __init__(self, collection, pipeline):
+        self.collection = collection
+        self.pipeline = pipeline
+
+    def explain(self):
+        """Returns the query planner output of the pipeline."""
+        command = {"aggregate": self.collection.name, "pipeline": self.pipeline, "cursor": {}}
+        return self.collection.database.command("explain", command, verbosity="queryPlanner")
+
+def count_documents_shape(collection, criteria):
+    """Returns the aggregation Collection.count_documents runs for the criteria."""
+    return Aggregation(collection, [{"$match": criteria}, {"$group": {"_id": 1, "n": {"$sum": 1}}}])
+
+def get_client_options():
+    """Returns the connection pool options for the MongoDB client."""
+    return {
+        "maxPoolSize": int(get_secret("mongo", "MAX_POOL_SIZE", 50)),
+        "minPoolSize": int(get_secret("mongo", "MIN_POOL_SIZE", 0)),
+        "maxIdleTimeMS": int(get_secret("mongo", "MAX_IDLE_TIME_MS", 300000)),
+        "connectTimeoutMS": int(get_secret("mongo", "CONNECT_TIMEOUT_MS", 10000)),
+        "socketTimeoutMS": int(get_secret("mongo", "SOCKET_TIMEOUT_MS", 30000)),
+        "serverSelectionTimeoutMS": int(get_secret("mongo", "SERVER_SELECTION_TIMEOUT_MS", 10000)),
+        "heartbeatFrequencyMS": int(get_secret("mongo", "HEARTBEAT_FREQUENCY_MS", 10000)),
+        "retryWrites": True,
+        "retryReads": True,
+    }
+
+@st.cache_resource(show_spinner=False)
 def get_db_conn():
-    """Returns a MongoDB client connection."""
+    """Returns the MongoDB client shared by the whole process."""
     MONGODB_ATLAS_CLUSTER_URI = st.secrets.mongo.MONGODB_ATLAS_CLUSTER_URI
-    return MongoClient(MONGODB_ATLAS_CLUSTER_URI)
+    client = MongoClient(MONGODB_ATLAS_CLUSTER_URI, **get_client_options())
+    atexit.register(client.close)
+    if get_secret("mongo", "AUTO_CREATE_INDEXES", True):
+        ensure_indexes(client.get_database(DB_NAME))
+    return client
+
+def close_db_conn():
+    """Closes the shared MongoDB client and drops it from the resource cache."""
+    get_db_conn().close()
+    get_db_conn.clear()
+
+def check_db_health():
+    """Pings the database and returns True if the server is reachable."""
+    try:
+        get_db_conn().admin.command("ping")
+        return True
+    except Exception as e:
+        print(f"Database health check failed: {e}")
+        return False
 
 def get_collection(collection_name):
     """Returns a MongoDB collection."""
     client = get_db_conn()
-    db = client.get_database("chatbot_db")
-    return db.get_collection(collection_name)
\ No newline at end of file
+    db = client.get_database(DB_NAME)
+    return db.get_collection(collection_name)
+
+def ensure_indexes(db):
+    """Creates the indexes in INDEXES that do not exist yet. Failures are reported but do not stop the app."""
+    for collection_name, indexes in INDEXES.items():
+        try:
+            db.get_collection(collection_name).create_indexes(indexes)
+        except Exception as e:
+            print(f"Failed to create indexes on {collection_name}: {e}")
+
+def get_query_shapes(db):
+    """
+    Returns the query shapes the app runs, as (collection name, description, cursor) tuples ready to be explained.
+    An Aggregation stands in for the cursor of an aggregation pipeline.
+    """
+    from models.User import SORT_FIELDS, STATS_PIPELINE, User
+    from tools.rag import ALL_SOURCES, VECTOR_SOURCE_COUNTS_PIPELINE, VECTORS_PAGE_PROJECTION, get_indexed_sources_pipeline, get_vectors_criteria
+    users = db.get_collection("users")
+    conversations = db.get_collection("conversations")
+    chat_histories = db.get_collection("chat_histories")
+    vectors = db.get_collection("vectors")
+    # The (description, search, source) filters of the vectors browser. A source of None matches vectors without a source.
+    vectors_filters = [
+        ("without filters", "", ALL_SOURCES),
+        ("by source", "", "x"),
+        ("without a source", "", None),
+        ("with search", "x", ALL_SOURCES),
+        ("with search by source", "x", "x"),
+    ]
+    return [
+        ("users", "User.create duplicate check", users.find({"$or": [{"username": "x"}, {"email": "x"}]}).limit(1)),
+        ("users", "User.get_one by username", users.find({"username": "x"}).limit(1)),
+        *[
+            (
+                "users",
+                f"User.get_page by {sort_by}" + (" with search" if search else ""),
+                users.find(User.get_search_criteria(search), {"username": 1, "email": 1}).sort([(sort_by, -1), ("_id", -1)]).skip(50).limit(50),
+            )
+            for sort_by in SORT_FIELDS
+            for search in ["", "x"]
+        ],
+        ("users", "User.count with search", count_documents_shape(users, User.get_search_criteria("x"))),
+        ("users", "User.get_stats", Aggregation(users, STATS_PIPELINE)),
+        ("users", "User.get_usernames", users.find({}, {"username": 1}).sort("username", 1)),
+        ("conversations", "Conversation.get_user_chats", conversations.find({"user_id": "x"}).sort("updated_at", -1)),
+        ("conversations", "Conversation.get_user_chats_page", conversations.find({"user_id": "x"}, {"title": 1, "session_id": 1, "updated_at": 1}).sort([("updated_at", -1), ("_id", -1)]).limit(21)),
+        ("conversations", "Conversation.get_one by session_id", conversations.find({"session_id": "x"}).limit(1)),
+        ("chat_histories", "read_chat_messages", chat_histories.find({"SessionId": "x"}, {"_id": 0, "History": 1}).sort("_id", 1)),
+        ("vectors", "delete_source_vectors", vectors.find({"source": {"$in": ["x"]}})),
+        *[
+            (
+                "vectors",
+                f"get_vectors_page {description}",
+                vectors.find(get_vectors_criteria(search, source), VECTORS_PAGE_PROJECTION).sort("_id", 1).skip(50).limit(50),
+            )
+            for description, search, source in vectors_filters
+        ],
+        *[
+            ("vectors", f"count_vectors {description}", count_documents_shape(vectors, get_vectors_criteria(search, source)))
+            for description, search, source in vectors_filters
+            if get_vectors_criteria(search, source)
+        ],
+        ("vectors", "get_vector_source_counts", Aggregation(vectors, VECTOR_SOURCE_COUNTS_PIPELINE)),
+        ("vectors", "get_indexed_sources", Aggregation(vectors, get_indexed_sources_pipeline(".pdf"))),
+    ]
+
+def find_winning_plans(explain):
+    """Returns every winning plan in an explain output, including those of the $cursor stages of an aggregation."""
+    plans = []
+    if isinstance(explain, dict):
+        for key, value in explain.items():
+            if key == "winningPlan":
+                plans.append(value)
+            else:
+                plans.extend(find_winning_plans(value))
+    elif isinstance(explain, list):
+        for item in explain:
+            plans.extend(find_winning_plans(item))
+    return plans
+
+def find_plan_stages(plan):
+    """Returns the names of all stages in an explain plan tree."""
+    stages = []
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+        for value in plan.values():
+            stages.extend(find_plan_stages(value))
+    elif isinstance(plan, list):
+        for item in plan:
+            stages.extend(find_plan_stages(item))
+    return stages
+
+def check_query_plans(db=None):
+    """
+    Explains every query shape the app runs and flags the ones whose winning plan is a collection scan,
+    except the FULL_SCAN_QUERIES that read the whole collection by design. Pass a Database to check another server, e.g. a local mongod.
+    """
+    db = db if db is not None else get_db_conn().get_database(DB_NAME)
+    report = []
+    for collection_name, description, cursor in get_query_shapes(db):
+        try:
+            winning_plans = find_winning_plans(cursor.explain())
+            if not winning_plans:
+                raise ValueError("the explain output has no winning plan")
+            stages = find_plan_stages(winning_plans)
+            report.append({
+                "Collection": collection_name,
+                "Query": description,
+                "Plan": " > ".join(stages),
+                "COLLSCAN": "COLLSCAN" in stages and description not in FULL_SCAN_QUERIES,
+            })
+        except Exception as e:
+            report.append({"Collection": collection_name, "Query": description, "Plan": f"Error: {e}", "COLLSCAN": None})
+    return report
\ No newline at end of file
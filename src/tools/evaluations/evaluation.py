@@ -1,46 +1,111 @@
 import os
 import csv
+import json
 import logging
-import streamlit as st
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import nullcontext
 from datetime import datetime, timezone
-from time import time
-from langchain_huggingface import ChatHuggingFace
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.runnables import RunnablePassthrough
-from langchain_core.output_parsers import StrOutputParser
-from datasets import load_dataset
-from utils.helpers import authorize_hf
-from tools.chat import load_llm_model, load_embedding_model
-from tools.rag import get_retriever
+from statistics import median
+from time import perf_counter, sleep
+from utils.helpers import authorize_hf, get_secret
+from tools.BM25Index import BM25Index
+from tools.chat import load_llm_model, load_embedding_model, use_models
+from tools.llm import StubLLM, apply_chat_template
+from tools.rag import EMBEDDING_MODEL_NAME, retrieve_documents
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def evaluate_chatbot(model_config):
-    logging.info("Starting chatbot evaluation.")
-    authorize_hf()
-    questions, answers = load_and_extract_conversations("semv/chatbot-sl-test-dataset")
-    evaluation_results = []
+DATASET_NAME = "semv/chatbot-sl-test-dataset"
+STUB_DATASET_FILE = "stub_dataset.json"
 
-    for i, (question, expected_answer) in enumerate(zip(questions, answers), start=1):
-        logging.info(f"Evaluating question {i}: {question}")
+class RateLimiter:
+    """Thread-safe limiter that spaces calls at least 1 / rate seconds apart."""
 
-        start_time = time()
-        response = simulate_response(question, model_config)
-        duration = time() - start_time
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self.next_time = 0.0
+        self.lock = threading.Lock()
 
-        evaluation_results.append({
-            "No.": i,
-            "Question": question,
-            "Response": response,
-            "Expected": expected_answer,
-            "Time Taken (s)": duration
-        })
+    def wait(self):
+        with self.lock:
+            now = perf_counter()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            sleep(wait_time)
 
-    logging.info("Evaluation completed. Saving results.")
-    return save_results(evaluation_results, model_config)
+def evaluate_chatbot(model_config, use_stub=False, on_progress=None):
+    """
+    Runs the chatbot over the test dataset with bounded concurrency and saves the results.
+    Failed questions are retried with exponential backoff. on_progress is called with the number of finished questions.
+    With use_stub the run is offline: the questions and passages come from STUB_DATASET_FILE, the passages are retrieved
+    with an in-process BM25 index and StubLLM answers, so no model, database or network is needed.
+    """
+    logging.info("Starting chatbot evaluation.")
+    if use_stub:
+        questions, answers, passages = load_stub_dataset()
+        models = nullcontext()
+    else:
+        authorize_hf()
+        questions, answers = load_and_extract_conversations(DATASET_NAME)
+        models = use_models(model_config)
+
+    max_concurrency = int(get_secret("evaluation", "MAX_CONCURRENCY", 4))
+    max_retries = int(get_secret("evaluation", "MAX_RETRIES", 3))
+    rate_limiter = RateLimiter(float(get_secret("evaluation", "REQUESTS_PER_SECOND", 2.0)))
+
+    wall_start_time = perf_counter()
+    with models, ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+        if use_stub:
+            llm_model = StubLLM()
+            retrieve = BM25Index(passages).similarity_search
+        else:
+            llm_model = load_llm_model(model_config)
+            embedding_model = load_embedding_model(EMBEDDING_MODEL_NAME)
+            retrieve = lambda prompt: retrieve_documents(prompt, embedding_model)
+        futures = [
+            executor.submit(evaluate_question, i, question, expected_answer, model_config, llm_model, retrieve, rate_limiter, max_retries)
+            for i, (question, expected_answer) in enumerate(zip(questions, answers), start=1)
+        ]
+        for finished, _ in enumerate(as_completed(futures), start=1):
+            if on_progress is not None:
+                on_progress(finished, len(futures))
+        evaluation_results = [future.result() for future in futures]
+    wall_time = perf_counter() - wall_start_time
+
+    logging.info(f"Evaluation completed in {wall_time:.1f}s. Saving results.")
+    return save_results(evaluation_results, model_config, wall_time)
+
+def evaluate_question(i, question, expected_answer, model_config, llm_model, retrieve, rate_limiter, max_retries):
+    """Evaluates one question, retrying failures, and returns its result row."""
+    logging.info(f"Evaluating question {i}: {question}")
+    response, duration = None, None
+    for attempt in range(1, max_retries + 2):
+        rate_limiter.wait()
+        start_time = perf_counter()
+        try:
+            response = simulate_response(question, model_config, llm_model, retrieve)
+            duration = perf_counter() - start_time
+            break
+        except Exception as e:
+            logging.warning(f"Question {i} failed on attempt {attempt}: {e}")
+            response = f"Error: {e}"
+            if attempt <= max_retries:
+                sleep(min(2 ** attempt, 30))
+
+    return {
+        "No.": i,
+        "Question": question,
+        "Response": response,
+        "Expected": expected_answer,
+        "Time Taken (s)": duration,
+        "Attempts": attempt
+    }
 
 def load_and_extract_conversations(dataset_name):
     logging.info(f"Loading dataset: {dataset_name}")
+    from datasets import load_dataset
     dataset = load_dataset(dataset_name)
     questions = []
     answers = []
@@ -53,7 +118,20 @@ def load_and_extract_conversations(dataset_name):
     logging.info(f"Extracted {len(questions)} question-answer pairs.")
     return questions, answers
 
-def save_results(results, model_config):
+def load_stub_dataset():
+    """
+    Returns the questions, expected answers and passages of the local STUB_DATASET_FILE,
+    a small sample in the shape of the test dataset for offline runs.
+    """
+    file_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), STUB_DATASET_FILE)
+    logging.info(f"Loading dataset: {file_path}")
+    with open(file_path, encoding="utf-8") as f:
+        dataset = json.load(f)
+    questions = [item["question"] for item in dataset["questions"]]
+    answers = [item["answer"] for item in dataset["questions"]]
+    return questions, answers, dataset["passages"]
+
+def save_results(results, model_config, wall_time):
     filename = "evaluation_results/evaluation_results_" + datetime.now().strftime('%Y-%m-%d_%H-%M-%S') + ".csv"
     current_dir = os.path.dirname(os.path.abspath(__file__))
     file_path = os.path.join(current_dir, filename)
@@ -61,7 +139,7 @@ def save_results(results, model_config):
     logging.info(f"Saving results to {file_path}")
 
     with open(file_path, "w", newline="", encoding="utf-8") as csvfile:
-        fieldnames = ["No.", "Question", "Response", "Expected", "Time Taken (s)"]
+        fieldnames = ["No.", "Question", "Response", "Expected", "Time Taken (s)", "Attempts"]
         writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
         writer.writeheader()
         for result in results:
@@ -72,37 +150,32 @@ def save_results(results, model_config):
         for key, value in model_config.items():
             writer.writerow({"No.": key, "Question": value})
 
+        latencies = [result["Time Taken (s)"] for result in results if result["Time Taken (s)"] is not None]
+        writer.writerow({})
+        writer.writerow({"No.": "Timing"})
+        writer.writerow({"No.": "Wall Time (s)", "Question": wall_time})
+        if latencies:
+            writer.writerow({"No.": "Mean Latency (s)", "Question": sum(latencies) / len(latencies)})
+            writer.writerow({"No.": "Median Latency (s)", "Question": median(latencies)})
+        writer.writerow({"No.": "Failed Questions", "Question": len(results) - len(latencies)})
+
         writer.writerow({})
         writer.writerow({"Question": "Date", "Response": datetime.now().strftime('%Y-%m-%d %H:%M:%S')})
 
     logging.info(f"Evaluation results saved to {file_path}")
     return filename
 
-def simulate_response(prompt, model_config):
-    """Generates a response based on the prompt and model configuration."""
-    logging.info("Loading embedding model.")
-    if st.session_state.embedding_model is None:
-        embedding_model = load_embedding_model("firqaaa/indo-sentence-bert-base")
-    else:
-        embedding_model = st.session_state.embedding_model
-
-    retriever = get_retriever(embedding_model)
-    retrieve = {"context": retriever | (lambda docs: "\n\n".join([d.page_content for d in docs])), "question": RunnablePassthrough()}
-
-    context = retrieve["context"].invoke(prompt)
+def simulate_response(prompt, model_config, llm_model, retrieve):
+    """Generates a response based on the prompt and model configuration, with the documents returned by retrieve(prompt)."""
+    docs = retrieve(prompt)
+    context = "\n\n".join([d.page_content for d in docs])
 
-    response = llm_chat_completion(prompt, context, model_config)
+    response = llm_chat_completion(prompt, context, model_config, llm_model)
     logging.info("Response generated.")
     return response
 
-def llm_chat_completion(prompt, context, model_config):
+def llm_chat_completion(prompt, context, model_config, llm_model):
     """Generates a chat completion response from LLM using the provided prompt and model configuration."""
-    logging.info("Loading LLM.")
-    if st.session_state.llm_model is None:
-        llm_model = load_llm_model(model_config)
-    else:
-        llm_model = st.session_state.llm_model
-
     messages = []
     SYSTEM_MESSAGE = """
     Anda adalah chatbot berbahasa Indonesia yang bertugas untuk menjawab pertanyaan terkait SMP Santo Leo III. \
@@ -111,22 +184,15 @@ def llm_chat_completion(prompt, context, model_config):
     """
     SYSTEM_MESSAGE_DICT = {"role": "system", "content": SYSTEM_MESSAGE}
 
-    if model_config["model_name"] == "mistralai/Mistral-7B-Instruct-v0.3":
-        final_prompt = {
-            "role": "user",
-            "content": f"{SYSTEM_MESSAGE} \nKonteks: {context} \nBerikut ini adalah pertanyaan yang harus Anda jawab. Pertanyaan: {prompt}"
-        }
-        messages.append(final_prompt)
-    else:
-        final_prompt = {
-            "role": "user",
-            "content": f"Konteks: {context} \nBerikut ini adalah pertanyaan yang harus Anda jawab. Pertanyaan: {prompt}"
-        }
-        messages.append(SYSTEM_MESSAGE_DICT)
-        messages.append(final_prompt)
+    final_prompt = {
+        "role": "user",
+        "content": f"Konteks: {context} \nBerikut ini adalah pertanyaan yang harus Anda jawab. Pertanyaan: {prompt}"
+    }
+    messages.append(SYSTEM_MESSAGE_DICT)
+    messages.append(final_prompt)
 
     response = llm_model.chat_completion(
-        messages,
+        apply_chat_template(messages, model_config["model_name"]),
         max_tokens=model_config["max_tokens"],
         temperature=model_config["temperature"],
         top_p=model_config["top_p"],
@@ -0,0 +1,120 @@
+import os
+import json
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfReader
+from utils.helpers import get_secret
+
+CACHE_DIR = "../../assets/cache/pdf_text"
+PAGES_PER_TASK = 8
+
+def get_cache_root():
+    """Returns the directory holding the cached pages of every PDF file."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, CACHE_DIR)
+
+def get_cache_dir(file_hash):
+    """Returns the cache directory of the PDF file with the given content hash."""
+    return os.path.join(get_cache_root(), file_hash)
+
+def read_cached_pages(file_hash):
+    """Returns the cached text of every page of a PDF file, or None if the file is not fully cached."""
+    cache_dir = get_cache_dir(file_hash)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        return None
+
+    with open(meta_path, "r", encoding="utf-8") as f:
+        num_pages = json.load(f)["pages"]
+
+    pages = []
+    for page_number in range(num_pages):
+        page_path = os.path.join(cache_dir, f"{page_number}.txt")
+        if not os.path.exists(page_path):
+            return None
+        with open(page_path, "r", encoding="utf-8") as f:
+            pages.append(f.read())
+    return pages
+
+def write_cached_pages(file_hash, pages):
+    """Writes the text of every page of a PDF file to the cache."""
+    cache_dir = get_cache_dir(file_hash)
+    os.makedirs(cache_dir, exist_ok=True)
+    for page_number, text in enumerate(pages):
+        with open(os.path.join(cache_dir, f"{page_number}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+    with open(os.path.join(cache_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"pages": len(pages)}, f)
+
+def delete_cached_pages(file_hash):
+    """Deletes the cached pages of the PDF file with the given content hash."""
+    shutil.rmtree(get_cache_dir(file_hash), ignore_errors=True)
+
+def prune_cached_pages(file_hashes):
+    """Deletes the cached pages of every PDF file whose content hash is not in file_hashes."""
+    cache_root = get_cache_root()
+    if not os.path.isdir(cache_root):
+        return
+    for file_hash in os.listdir(cache_root):
+        if file_hash not in file_hashes:
+            delete_cached_pages(file_hash)
+
+def count_pages(file_path):
+    """Returns the number of pages of a PDF file."""
+    with open(file_path, "rb") as f:
+        return len(PdfReader(f).pages)
+
+def extract_page_range(file_path, start, end):
+    """Extracts the text of the pages start to end (exclusive) of a PDF file."""
+    with open(file_path, "rb") as f:
+        pdf_reader = PdfReader(f)
+        return [pdf_reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+def extract_pdf_pages(files):
+    """
+    Extracts the text of every page of the given PDF files, a dict of file path to content hash.
+    Cached files are read from disk, the pages of the others are extracted in a process pool.
+    Returns a dict of file path to the list of page texts. A file with a page range that fails is left out,
+    and its other page ranges are cancelled or ignored.
+    """
+    results = {}
+    tasks = []
+    for file_path, file_hash in files.items():
+        pages = read_cached_pages(file_hash)
+        if pages is not None:
+            results[file_path] = pages
+            continue
+
+        try:
+            num_pages = count_pages(file_path)
+        except Exception as e:
+            print(f"Error reading file {file_path}: {e}")
+            continue
+        results[file_path] = [None] * num_pages
+        for start in range(0, num_pages, PAGES_PER_TASK):
+            tasks.append((file_path, start, min(start + PAGES_PER_TASK, num_pages)))
+
+    if tasks:
+        max_workers = int(get_secret("rag", "PDF_WORKERS", os.cpu_count() or 1))
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(extract_page_range, *task): task for task in tasks}
+            failed = set()
+            for future, (file_path, start, end) in futures.items():
+                if file_path in failed:
+                    continue
+                try:
+                    results[file_path][start:end] = future.result()
+                except Exception as e:
+                    print(f"Error extracting pages {start}-{end} of {file_path}: {e}")
+                    failed.add(file_path)
+                    for other_future, other_task in futures.items():
+                        if other_task[0] == file_path:
+                            other_future.cancel()
+
+        for file_path in {task[0] for task in tasks}:
+            if file_path in failed:
+                del results[file_path]
+            else:
+                write_cached_pages(files[file_path], results[file_path])
+
+    return results
\ No newline at end of file
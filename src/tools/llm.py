@@ -0,0 +1,217 @@
+import json
+import threading
+from fnmatch import fnmatch
+from types import SimpleNamespace
+from utils.helpers import get_secret
+
+PROVIDERS = ("hf", "openai", "llamacpp", "stub")
+# Chat templates by lowercase model name pattern, checked after llm.CHAT_TEMPLATES. Models without a match use "default".
+CHAT_TEMPLATES = {
+    "*mistral*": "system_in_last_user",
+}
+SYSTEM_SEPARATOR = " "
+
+class OpenAICompatibleLLM:
+    """
+    Client of any server with an OpenAI-compatible /chat/completions endpoint, such as vLLM, TGI or the llama.cpp server.
+    Requests share one session with a pool of keep-alive connections, so only the first request to the server pays for the connection.
+    """
+
+    def __init__(self, base_url, model, api_key=None, timeout=60, pool_size=16):
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        self.url = f"{base_url.rstrip('/')}/chat/completions"
+        self.model = model
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+
+    def chat_completion(self, messages, max_tokens=None, temperature=None, top_p=None, stream=False, **kwargs):
+        """Returns the completion, or with stream=True a generator of chunks, in the same shape as InferenceClient.chat_completion."""
+        payload = {"model": self.model, "messages": messages, "stream": stream, **kwargs}
+        payload.update(get_sampling_options(max_tokens, temperature, top_p))
+        response = self.session.post(self.url, json=payload, timeout=self.timeout, stream=stream)
+        response.raise_for_status()
+        if stream:
+            return self._stream(response)
+        return to_namespace(response.json())
+
+    def _stream(self, response):
+        """Yields the chunks of a server-sent events response until the server sends [DONE]."""
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                chunk = json.loads(data)
+                if chunk.get("choices"):
+                    yield to_chunk(chunk)
+
+class LlamaCppLLM:
+    """
+    Runs a quantized GGUF model in-process on the CPU with llama.cpp, for on-premises use without network access.
+    llama_cpp is only imported when a model is actually loaded. One model handles one completion at a time.
+    """
+
+    def __init__(self, model_path, n_ctx=8192, n_threads=None):
+        from llama_cpp import Llama
+
+        self.model_path = model_path
+        self.model = Llama(model_path=model_path, n_ctx=n_ctx, n_threads=n_threads, verbose=False)
+        self._lock = threading.Lock()
+
+    def chat_completion(self, messages, max_tokens=None, temperature=None, top_p=None, stream=False, **kwargs):
+        """Returns the completion, or with stream=True a generator of chunks, in the same shape as InferenceClient.chat_completion."""
+        kwargs.update(get_sampling_options(max_tokens, temperature, top_p))
+        if stream:
+            return self._stream(messages, kwargs)
+        with self._lock:
+            return to_namespace(self.model.create_chat_completion(messages, **kwargs))
+
+    def _stream(self, messages, kwargs):
+        """
+        Yields the chunks of a streamed completion. The model is locked until the stream finishes or is closed,
+        so consumers must close a stream they abandon, which stream_and_save_response does.
+        """
+        with self._lock:
+            chunks = self.model.create_chat_completion(messages, stream=True, **kwargs)
+            try:
+                for chunk in chunks:
+                    if chunk.get("choices"):
+                        yield to_chunk(chunk)
+            finally:
+                chunks.close()
+
+class StubLLM:
+    """
+    Offline stand-in for an LLM that answers deterministically from the retrieved context,
+    so evaluation runs are reproducible without network access.
+    """
+
+    def chat_completion(self, messages, max_tokens=None, temperature=None, top_p=None, stream=False, **kwargs):
+        content = messages[-1]["content"]
+        context = content.split("Konteks:", 1)[-1].split("Berikut ini adalah pertanyaan", 1)[0].strip()
+        answer = context.split("\n")[0][:500] if context else "Maaf, saya tidak tahu."
+        if stream:
+            return iter([SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(role="assistant", content=answer))])])
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(role="assistant", content=answer))])
+
+def get_provider_config(model_name):
+    """
+    Returns the provider settings of a model: the [llm] secrets, overridden by the entry of llm.MODELS for the model, e.g.
+    {"mistralai/Mistral-7B-Instruct-v0.3": {"provider": "llamacpp", "model_path": "models/mistral-7b-instruct-v0.3.Q4_K_M.gguf"}}.
+    The provider is "hf" (Hugging Face Inference, hf.INFERENCE_ENDPOINT_URL if set), "openai" (an OpenAI-compatible server at base_url),
+    "llamacpp" (a GGUF model at model_path) or "stub".
+    """
+    config = {
+        "provider": get_secret("llm", "PROVIDER", "hf"),
+        "base_url": get_secret("llm", "BASE_URL"),
+        "api_key": get_secret("llm", "API_KEY"),
+        "model": model_name,
+        "model_path": get_secret("llm", "MODEL_PATH"),
+        "n_ctx": int(get_secret("chat", "CONTEXT_WINDOW", 8192)),
+        "n_threads": get_secret("llm", "N_THREADS"),
+        "timeout": float(get_secret("llm", "TIMEOUT", 60)),
+        "pool_size": int(get_secret("llm", "POOL_SIZE", 16)),
+    }
+    config.update(dict(dict(get_secret("llm", "MODELS", {})).get(model_name, {})))
+    if config["provider"] == "hf":
+        config["base_url"] = config["base_url"] or get_secret("hf", "INFERENCE_ENDPOINT_URL")
+    if config["provider"] not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {config['provider']}")
+    return config
+
+def get_llm_client_key(model_name, provider_config):
+    """Returns the model registry key of the client of a model: the provider and the endpoint or file it talks to."""
+    target = provider_config["model_path"] if provider_config["provider"] == "llamacpp" else provider_config["base_url"]
+    return ("llm", provider_config["provider"], model_name, target)
+
+def create_llm_client(provider_config):
+    """Creates the client of the provider settings returned by get_provider_config."""
+    provider = provider_config["provider"]
+    if provider == "hf":
+        from huggingface_hub import InferenceClient
+
+        # InferenceClient sends its requests through huggingface_hub's shared session, which keeps connections alive.
+        return InferenceClient(
+            provider_config["base_url"] or provider_config["model"],
+            token=get_secret("hf", "HUGGINGFACEHUB_API_TOKEN"),
+            timeout=provider_config["timeout"],
+        )
+    elif provider == "openai":
+        if not provider_config["base_url"]:
+            raise ValueError("The openai LLM provider needs llm.BASE_URL")
+        return OpenAICompatibleLLM(
+            provider_config["base_url"],
+            provider_config["model"],
+            api_key=provider_config["api_key"],
+            timeout=provider_config["timeout"],
+            pool_size=provider_config["pool_size"],
+        )
+    elif provider == "llamacpp":
+        if not provider_config["model_path"]:
+            raise ValueError("The llamacpp LLM provider needs llm.MODEL_PATH")
+        n_threads = provider_config["n_threads"]
+        return LlamaCppLLM(provider_config["model_path"], n_ctx=provider_config["n_ctx"], n_threads=int(n_threads) if n_threads else None)
+    return StubLLM()
+
+def get_chat_template(model_name):
+    """Returns the name of the chat template of a model: the first pattern of llm.CHAT_TEMPLATES, then of CHAT_TEMPLATES, that matches it."""
+    for pattern, template in list(dict(get_secret("llm", "CHAT_TEMPLATES", {})).items()) + list(CHAT_TEMPLATES.items()):
+        if fnmatch(model_name.lower(), pattern.lower()):
+            return template
+    return "default"
+
+def apply_chat_template(messages, model_name):
+    """
+    Adapts chat messages to what the model's chat template accepts.
+    "default" keeps them as they are. "system_in_last_user", for models without a system role such as Mistral,
+    prepends the system message to the last user message, where their own templates put it.
+    """
+    template = get_chat_template(model_name)
+    if template == "default":
+        return messages
+    elif template != "system_in_last_user":
+        raise ValueError(f"Unknown chat template: {template}")
+
+    system = SYSTEM_SEPARATOR.join(message["content"] for message in messages if message["role"] == "system")
+    if not system or messages[-1]["role"] != "user":
+        return messages
+    messages = [message for message in messages if message["role"] != "system"]
+    messages[-1] = {**messages[-1], "content": f"{system}{SYSTEM_SEPARATOR}{messages[-1]['content']}"}
+    return messages
+
+def get_sampling_options(max_tokens, temperature, top_p):
+    """Returns the sampling options that are set, so the server's defaults apply to the others."""
+    options = {"max_tokens": max_tokens, "temperature": temperature, "top_p": top_p}
+    return {name: value for name, value in options.items() if value is not None}
+
+def to_chunk(chunk):
+    """
+    Converts a JSON stream chunk into attribute objects like to_namespace, giving every delta a content attribute,
+    since servers leave it out of the deltas that only carry the role or the finish reason.
+    """
+    for choice in chunk["choices"]:
+        choice["delta"] = {"content": None, **(choice.get("delta") or {})}
+    return to_namespace(chunk)
+
+def close_stream(items):
+    """Closes a stream of chunks or tokens if it is a generator, so the resources it holds are released right away."""
+    close = getattr(items, "close", None)
+    if close is not None:
+        close()
+
+def to_namespace(value):
+    """Converts a JSON completion into nested attribute objects, like the ones InferenceClient returns."""
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: to_namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [to_namespace(item) for item in value]
+    return value
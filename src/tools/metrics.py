@@ -0,0 +1,264 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+import numpy as np
+import streamlit as st
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from time import perf_counter, sleep
+from tools.db import get_collection
+from utils.helpers import get_secret
+
+current_trace = ContextVar("current_trace", default=None)
+
+class Trace:
+    """Timing spans and counters of one chat request."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started_at = datetime.now(timezone.utc)
+        self.start_time = perf_counter()
+        self.spans = {}
+        self.counters = {}
+        self._nested_ms = []
+
+    @contextmanager
+    def span(self, stage):
+        """
+        Times the enclosed block as the given stage, adding up repeated stages.
+        Time spent in a span nested in it only counts for the nested stage, so no time is counted twice.
+        """
+        start_time = perf_counter()
+        self._nested_ms.append(0.0)
+        try:
+            yield
+        finally:
+            duration_ms = (perf_counter() - start_time) * 1000
+            self.add_span(stage, duration_ms - self._nested_ms.pop())
+            if self._nested_ms:
+                self._nested_ms[-1] += duration_ms
+
+    def add_span(self, stage, duration_ms):
+        self.spans[stage] = self.spans.get(stage, 0.0) + duration_ms
+
+    def count(self, counter, value):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def finish(self):
+        """Records the total duration of the request."""
+        self.spans["total"] = (perf_counter() - self.start_time) * 1000
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "timestamp": self.started_at,
+            "spans_ms": self.spans,
+            "counters": self.counters,
+        }
+
+class LogSink:
+    """Writes every trace to the application log."""
+
+    def emit(self, trace):
+        logging.info(f"metrics {json.dumps(trace.to_dict(), default=str)}")
+
+class MongoSink:
+    """
+    Stores every trace as a document in the metrics collection. A background thread writes the traces in batches,
+    so requests never wait for the database. Traces are dropped, and counted in dropped, while the queue is full.
+    """
+
+    def __init__(self, max_queue_size=1000, batch_size=100):
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.batch_size = batch_size
+        self.dropped = 0
+        self.thread = threading.Thread(target=self._run, name="metrics-mongo-sink", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def emit(self, trace):
+        try:
+            self.queue.put_nowait(trace.to_dict())
+        except queue.Full:
+            self.dropped += 1
+
+    def flush(self):
+        """Blocks until every queued trace has been written or given up on."""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            try:
+                get_collection("metrics").insert_many(batch, ordered=False)
+            except Exception as e:
+                logging.warning(f"Error writing {len(batch)} traces to the metrics collection: {e}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+class PrometheusSink:
+    """
+    Rewrites a Prometheus text exposition file with the latest summaries, e.g. for the node_exporter textfile collector.
+    A background thread rewrites the file at most once every interval seconds after new traces, so requests never wait for it.
+    """
+
+    def __init__(self, recorder, file_path, interval=5.0):
+        self.recorder = recorder
+        self.file_path = file_path
+        self.interval = interval
+        self.changed = threading.Event()
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name="metrics-prometheus-sink", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def emit(self, trace):
+        self.changed.set()
+
+    def flush(self):
+        """Rewrites the file now if traces were recorded since it was last written."""
+        with self.lock:
+            if self.changed.is_set():
+                self.changed.clear()
+                self.write()
+
+    def write(self):
+        tmp_path = f"{self.file_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.recorder.prometheus_text())
+        os.replace(tmp_path, self.file_path)
+
+    def _run(self):
+        while True:
+            self.changed.wait()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.warning(f"Error writing Prometheus metrics to {self.file_path}: {e}")
+            sleep(self.interval)
+
+class MetricsRecorder:
+    """Keeps a sliding window of stage latencies for percentile summaries and forwards every trace to the sinks."""
+
+    def __init__(self, window_size=1000):
+        self.sinks = []
+        self.window_size = window_size
+        self.latencies = defaultdict(lambda: deque(maxlen=window_size))
+        self.counters = defaultdict(int)
+        self.traces = 0
+        self.lock = threading.Lock()
+
+    def record(self, trace):
+        with self.lock:
+            self.traces += 1
+            for stage, duration_ms in trace.spans.items():
+                self.latencies[stage].append(duration_ms)
+            for counter, value in trace.counters.items():
+                self.counters[counter] += value
+
+        for sink in self.sinks:
+            try:
+                sink.emit(trace)
+            except Exception as e:
+                print(f"Error in metrics sink {type(sink).__name__}: {e}")
+
+    def summaries(self):
+        """Returns the count and p50/p95/p99 latency in milliseconds of every stage."""
+        with self.lock:
+            latencies = {stage: list(values) for stage, values in self.latencies.items() if values}
+
+        summaries = []
+        for stage, values in sorted(latencies.items()):
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            summaries.append({"Stage": stage, "Count": len(values), "p50 (ms)": p50, "p95 (ms)": p95, "p99 (ms)": p99})
+        return summaries
+
+    def prometheus_text(self):
+        """Renders the summaries and counters in the Prometheus text exposition format."""
+        lines = [
+            "# HELP chatbot_stage_latency_ms Latency of each chat request stage in milliseconds.",
+            "# TYPE chatbot_stage_latency_ms summary",
+        ]
+        with self.lock:
+            latencies = {stage: list(values) for stage, values in self.latencies.items() if values}
+            counters = dict(self.counters)
+
+        for stage, values in sorted(latencies.items()):
+            for quantile, value in zip(["0.5", "0.95", "0.99"], np.percentile(values, [50, 95, 99])):
+                lines.append(f'chatbot_stage_latency_ms{{stage="{stage}",quantile="{quantile}"}} {value:.3f}')
+            lines.append(f'chatbot_stage_latency_ms_sum{{stage="{stage}"}} {sum(values):.3f}')
+            lines.append(f'chatbot_stage_latency_ms_count{{stage="{stage}"}} {len(values)}')
+
+        for counter, value in sorted(counters.items()):
+            lines.append(f"# TYPE chatbot_{counter}_total counter")
+            lines.append(f"chatbot_{counter}_total {value}")
+        return "\n".join(lines) + "\n"
+
+@st.cache_resource(show_spinner=False)
+def get_metrics_recorder():
+    """Returns the metrics recorder shared by the whole process, with the sinks listed in metrics.SINKS."""
+    recorder = MetricsRecorder(window_size=int(get_secret("metrics", "WINDOW_SIZE", 1000)))
+    for sink in get_secret("metrics", "SINKS", ["log"]):
+        if sink == "log":
+            recorder.sinks.append(LogSink())
+        elif sink == "mongo":
+            recorder.sinks.append(MongoSink(max_queue_size=int(get_secret("metrics", "MONGO_QUEUE_SIZE", 1000))))
+        elif sink == "prometheus":
+            recorder.sinks.append(PrometheusSink(
+                recorder,
+                get_secret("metrics", "PROMETHEUS_FILE", "chatbot_metrics.prom"),
+                interval=float(get_secret("metrics", "PROMETHEUS_INTERVAL", 5)),
+            ))
+        else:
+            print(f"Unknown metrics sink: {sink}")
+    return recorder
+
+@contextmanager
+def trace_request(name):
+    """Traces the enclosed block as one request and records it when the block exits."""
+    trace = Trace(name)
+    with activate_trace(trace):
+        yield trace
+    record_trace(trace)
+
+@contextmanager
+def activate_trace(trace):
+    """Makes the trace the target of span() and count() in the enclosed block."""
+    token = current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        current_trace.reset(token)
+
+def record_trace(trace):
+    """Finishes the trace and hands it to the metrics recorder."""
+    trace.finish()
+    get_metrics_recorder().record(trace)
+
+@contextmanager
+def span(stage):
+    """Times the enclosed block as a stage of the current trace, if there is one."""
+    trace = current_trace.get()
+    if trace is None:
+        yield
+    else:
+        with trace.span(stage):
+            yield
+
+def count(counter, value):
+    """Adds to a counter of the current trace, if there is one."""
+    trace = current_trace.get()
+    if trace is not None and value:
+        trace.count(counter, value)
\ No newline at end of file
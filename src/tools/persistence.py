@@ -0,0 +1,199 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+import streamlit as st
+from datetime import datetime, timezone
+from time import sleep
+from bson import ObjectId, json_util
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+from langchain_core.messages import AIMessage, HumanMessage, message_to_dict, messages_from_dict
+from models.Conversation import Conversation
+from tools.db import get_collection
+from utils.helpers import get_secret
+
+CHAT_HISTORIES_COLLECTION = "chat_histories"
+SPILL_PATH = "../../assets/spool/chat_turns.jsonl"
+DUPLICATE_KEY_ERROR = 11000
+SPILL_JSON_OPTIONS = json_util.DEFAULT_JSON_OPTIONS.with_options(tz_aware=True, tzinfo=timezone.utc)
+
+def new_chat_turn(session_id, user_message, ai_message, user_id=None):
+    """
+    Returns a chat turn ready for write_chat_turns. The message documents get their _id here, once,
+    so writing the same turn again after a partly failed write does not store its messages twice.
+    The messages are stored in the same format as MongoDBChatMessageHistory.
+    """
+    return {
+        "session_id": session_id,
+        "user_id": user_id,
+        "messages": [
+            {"_id": ObjectId(), "SessionId": session_id, "History": json.dumps(message_to_dict(message))}
+            for message in [HumanMessage(content=user_message), AIMessage(content=ai_message)]
+        ],
+        "updated_at": datetime.now(timezone.utc),
+    }
+
+def write_chat_turns(turns):
+    """
+    Writes chat turns created by new_chat_turn in one batch: a single insert_many for all messages,
+    then a single bulk_write bumping each conversation's updated_at. The two collections need a round trip each.
+    Writing a batch again is safe: messages that were already stored are skipped and updated_at never moves back.
+    """
+    history_docs = [message for turn in turns for message in turn["messages"]]
+    updated_at = {}
+    for turn in turns:
+        updated_at[turn["session_id"]] = max(turn["updated_at"], updated_at.get(turn["session_id"], turn["updated_at"]))
+
+    try:
+        get_collection(CHAT_HISTORIES_COLLECTION).insert_many(history_docs, ordered=False)
+    except BulkWriteError as e:
+        if any(error["code"] != DUPLICATE_KEY_ERROR for error in e.details["writeErrors"]) or e.details.get("writeConcernErrors"):
+            raise
+    Conversation.get_collection().bulk_write(
+        [UpdateOne({"session_id": session_id}, {"$max": {"updated_at": timestamp}}) for session_id, timestamp in updated_at.items()],
+        ordered=False
+    )
+
+def read_chat_messages(session_id):
+    """Returns the messages of a chat session in the order they were written."""
+    cursor = get_collection(CHAT_HISTORIES_COLLECTION).find({"SessionId": session_id}, {"_id": 0, "History": 1}).sort("_id", 1)
+    return messages_from_dict([json.loads(document["History"]) for document in cursor])
+
+class ChatTurnWriter:
+    """
+    Bounded write-behind queue for chat turns. A background thread drains the queue and writes the turns in batches,
+    so the answer reaches the user before the database writes finish. Pending turns are flushed on shutdown.
+    A batch that still fails after max_retries is spilled to spill_path and written again once the database accepts writes,
+    and the failure is logged and counted in stats. on_written is called with the turns of every batch once it is stored.
+    """
+
+    def __init__(self, spill_path, on_written=None, max_queue_size=1000, batch_size=100, max_retries=3):
+        self.queue = queue.Queue(maxsize=max_queue_size)
+        self.spill_path = spill_path
+        self.on_written = on_written
+        self.batch_size = batch_size
+        self.max_retries = max_retries
+        self.written = 0
+        self.failed = 0
+        self.last_error = None
+        self.thread = threading.Thread(target=self._run, name="chat-turn-writer", daemon=True)
+        self.thread.start()
+        atexit.register(self.flush)
+
+    def submit(self, session_id, user_message, ai_message, user_id=None):
+        """Queues a chat turn of the user, blocking while the queue is full."""
+        self.queue.put(new_chat_turn(session_id, user_message, ai_message, user_id))
+
+    def flush(self):
+        """Blocks until every queued turn has been written or spilled."""
+        self.queue.join()
+
+    def stats(self):
+        """Returns the number of queued, written, failed and spilled turns and the last write error."""
+        return {
+            "pending": self.queue.qsize(),
+            "written": self.written,
+            "failed": self.failed,
+            "spilled": len(self._read_spilled()),
+            "last_error": self.last_error,
+        }
+
+    def _run(self):
+        self._write_spilled()
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if self._write(batch):
+                self._write_spilled()
+            else:
+                self._spill(batch)
+
+            for _ in batch:
+                self.queue.task_done()
+
+    def _write(self, batch):
+        """Writes a batch, retrying with a growing delay. Returns True if it was written."""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                write_chat_turns(batch)
+                self.written += len(batch)
+                self._notify(batch)
+                return True
+            except Exception as e:
+                self.last_error = str(e)
+                logging.warning(f"Error writing {len(batch)} chat turns (attempt {attempt}): {e}")
+                if attempt < self.max_retries:
+                    sleep(attempt)
+        return False
+
+    def _notify(self, turns):
+        if self.on_written is None:
+            return
+        try:
+            self.on_written(turns)
+        except Exception as e:
+            logging.warning(f"Error after writing {len(turns)} chat turns: {e}")
+
+    def _spill(self, batch):
+        """Appends a batch that could not be written to the spill file."""
+        self.failed += len(batch)
+        try:
+            os.makedirs(os.path.dirname(self.spill_path), exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for turn in batch:
+                    f.write(json_util.dumps(turn, json_options=SPILL_JSON_OPTIONS) + "\n")
+            logging.error(f"Spilled {len(batch)} chat turns to {self.spill_path} after {self.max_retries} failed attempts: {self.last_error}")
+        except OSError as e:
+            logging.error(f"Lost {len(batch)} chat turns, they could neither be written nor spilled: {e}")
+
+    def _read_spilled(self):
+        try:
+            with open(self.spill_path, encoding="utf-8") as f:
+                return [json_util.loads(line, json_options=SPILL_JSON_OPTIONS) for line in f if line.strip()]
+        except FileNotFoundError:
+            return []
+
+    def _write_spilled(self):
+        """Writes the spilled turns in batches, and removes the spill file once all of them are stored."""
+        turns = self._read_spilled()
+        for start in range(0, len(turns), self.batch_size):
+            try:
+                write_chat_turns(turns[start:start + self.batch_size])
+            except Exception as e:
+                self.last_error = str(e)
+                return
+            self._notify(turns[start:start + self.batch_size])
+        if turns:
+            os.remove(self.spill_path)
+            self.written += len(turns)
+            logging.info(f"Wrote {len(turns)} spilled chat turns")
+
+@st.cache_resource(show_spinner=False)
+def get_chat_turn_writer():
+    """Returns the write-behind queue for chat turns shared by the whole process."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return ChatTurnWriter(
+        os.path.join(current_dir, SPILL_PATH),
+        on_written=invalidate_chat_turn_histories,
+        max_queue_size=int(get_secret("chat", "WRITE_BEHIND_QUEUE_SIZE", 1000)),
+        batch_size=int(get_secret("chat", "WRITE_BEHIND_BATCH_SIZE", 100)),
+    )
+
+def invalidate_chat_turn_histories(turns):
+    """Drops the cached history pages of the users of the written turns, whose conversations' updated_at just changed."""
+    from tools.chat import invalidate_chat_history
+
+    for user_id in {turn["user_id"] for turn in turns if turn.get("user_id") is not None}:
+        invalidate_chat_history(user_id)
+
+def is_write_behind_enabled():
+    """Returns True if chat turns should be written off the request thread."""
+    return bool(get_secret("chat", "WRITE_BEHIND", False))
\ No newline at end of file
@@ -0,0 +1,101 @@
+import math
+import streamlit as st
+from utils.helpers import get_secret
+
+MESSAGE_OVERHEAD_TOKENS = 8
+CHARS_PER_TOKEN = 3
+SUMMARY_PROMPT = """
+Ringkas percakapan berikut antara pengguna dan chatbot dalam beberapa kalimat. \
+Pertahankan nama, angka, dan fakta penting yang mungkin dibutuhkan untuk menjawab pertanyaan berikutnya.
+"""
+
+@st.cache_resource(show_spinner=False)
+def load_tokenizer(model_name):
+    """Loads the tokenizer of a model, or returns None if it cannot be loaded, e.g. for a gated model without access."""
+    try:
+        from transformers import AutoTokenizer
+        return AutoTokenizer.from_pretrained(model_name, token=get_secret("hf", "HUGGINGFACEHUB_API_TOKEN"))
+    except Exception as e:
+        print(f"Failed to load tokenizer of {model_name}, estimating token counts instead: {e}")
+        return None
+
+def count_tokens(text, tokenizer):
+    """Counts the tokens of a text, estimating from its length if no tokenizer is available."""
+    if not text:
+        return 0
+    if tokenizer is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(tokenizer.encode(text, add_special_tokens=False))
+
+def count_message_tokens(messages, tokenizer):
+    """Counts the tokens of a list of chat messages, including the chat template overhead of each message."""
+    return sum(count_tokens(message["content"], tokenizer) + MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+def truncate_to_tokens(text, max_tokens, tokenizer):
+    """Cuts a text down to at most max_tokens tokens."""
+    if max_tokens <= 0:
+        return ""
+    if tokenizer is None:
+        return text[:max_tokens * CHARS_PER_TOKEN]
+    token_ids = tokenizer.encode(text, add_special_tokens=False)
+    if len(token_ids) <= max_tokens:
+        return text
+    return tokenizer.decode(token_ids[:max_tokens])
+
+def get_prompt_budget(model_config):
+    """
+    Returns the number of prompt tokens available for a request: the model's context window minus the tokens
+    reserved for the answer, capped by chat.PROMPT_TOKEN_BUDGET.
+    """
+    context_window = int(get_secret("chat", "CONTEXT_WINDOW", 8192))
+    budget = int(get_secret("chat", "PROMPT_TOKEN_BUDGET", 6000))
+    return max(0, min(budget, context_window - model_config["max_tokens"]))
+
+def fit_context(context, max_tokens, tokenizer, separator="\n\n"):
+    """
+    Fits the retrieved context into max_tokens tokens. Documents are kept whole in ranking order until the next
+    one does not fit. The first document is truncated if it does not fit on its own.
+    """
+    documents = context.split(separator) if context else []
+    fitted, used = [], 0
+    for document in documents:
+        tokens = count_tokens(document, tokenizer)
+        if used + tokens > max_tokens:
+            if not fitted:
+                fitted.append(truncate_to_tokens(document, max_tokens, tokenizer))
+            break
+        fitted.append(document)
+        used += tokens
+    return separator.join(fitted)
+
+def split_history(history, max_tokens, tokenizer):
+    """
+    Splits the earlier messages of a conversation into the older messages and the most recent whole turns
+    that fit into max_tokens tokens. A turn is a user message with the answers that follow it.
+    """
+    turns = []
+    for message in history:
+        if message["role"] == "user" or not turns:
+            turns.append([])
+        turns[-1].append(message)
+
+    recent, used = [], 0
+    for turn in reversed(turns):
+        tokens = count_message_tokens(turn, tokenizer)
+        if used + tokens > max_tokens:
+            break
+        recent = turn + recent
+        used += tokens
+    return history[:len(history) - len(recent)], recent
+
+def summarize_messages(messages, previous_summary, llm_model, max_tokens):
+    """Folds the given messages into the rolling summary of the conversation with the LLM."""
+    transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+    if previous_summary:
+        transcript = f"Ringkasan sebelumnya: {previous_summary}\n{transcript}"
+    response = llm_model.chat_completion(
+        [{"role": "user", "content": f"{SUMMARY_PROMPT}\n{transcript}"}],
+        max_tokens=max_tokens,
+        temperature=0.2,
+    )
+    return response.choices[0].message.content.strip()
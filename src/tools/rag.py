@@ -1,42 +1,293 @@
 import os
+import re
+import hashlib
 import streamlit as st
-from PyPDF2 import PdfReader
-from langchain_mongodb.vectorstores import MongoDBAtlasVectorSearch
-from langchain.docstore.document import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_huggingface import HuggingFaceEmbeddings
+from time import perf_counter
+from tools.BM25Index import STEMMER_VERSION, BM25Index, tokenize
 from tools.JSONLoader import JSONLoader
+from tools.CrossEncoderReranker import CrossEncoderReranker
+from tools.cache import CachedEmbeddings, get_model_registry, get_query_embedding_cache, get_retrieval_cache
+from tools.chunking import chunk_pages, get_chunking_policy, get_policy_hash
+from tools.extraction import delete_cached_pages, extract_pdf_pages, prune_cached_pages
+from tools.LocalVectorStore import LocalVectorStore
+from tools.OnnxEmbeddings import OnnxEmbeddings
 from tools.db import get_collection
+from tools.metrics import count, span
+from tools.prompt import load_tokenizer
+from utils.helpers import get_secret
 
 DOCS_DIR = "../../assets/pdfs"
 JSON_DIR = "../../assets/json"
+LOCAL_INDEX_DIR = "../../assets/index"
+ONNX_MODEL_DIR = "../../assets/cache/onnx"
+EMBEDDING_MODEL_NAME = "firqaaa/indo-sentence-bert-base"
+RERANKER_MODEL_NAME = "cross-encoder/mmarco-mMiniLMv2-L12-H384-v1"
+# Source filter of the vectors queries that matches every vector. None matches the vectors without a source.
+ALL_SOURCES = ""
+VECTORS_PAGE_PROJECTION = {"_id": 0, "text": 1, "source": 1, "page": 1, "section": 1}
+# Sorting on source first lets the source index serve the grouping without reading the vector documents.
+VECTOR_SOURCE_COUNTS_PIPELINE = [
+    {"$sort": {"source": 1}},
+    {"$group": {"_id": "$source", "count": {"$sum": 1}}},
+    {"$sort": {"count": -1}},
+]
 
-def get_retriever(model):
-    """Returns a retriever object using the specified embedding model."""
-    vectors_collection = get_collection("vectors")
-    index_name = "vector_index"
+index_version = 0
+
+def get_index_version():
+    """Returns the version of the vector index, which changes whenever vectors are created or deleted."""
+    return index_version
 
-    vector_store = MongoDBAtlasVectorSearch(
-        embedding=model,
-        collection=vectors_collection,
-        index_name=index_name,
+def bump_index_version():
+    """Marks the vector index as changed and drops the retrieval results cached against the old version."""
+    global index_version
+    index_version += 1
+    get_retrieval_cache().invalidate()
+
+def get_retriever(model, k=4):
+    """Returns a retriever object using the specified embedding model and the configured backend."""
+    if get_secret("rag", "RETRIEVER_BACKEND", "atlas") == "local":
+        vector_store = get_local_vector_store(model)
+        search_kwargs = {"k": k}
+    else:
+        from langchain_mongodb.vectorstores import MongoDBAtlasVectorSearch
+        vectors_collection = get_collection("vectors")
+        index_name = "vector_index"
+
+        vector_store = MongoDBAtlasVectorSearch(
+            embedding=model,
+            collection=vectors_collection,
+            index_name=index_name,
+        )
+        search_kwargs = {"k": k, "post_filter_pipeline": [{"$project": {"terms": 0, "terms_version": 0}}]}
+
+    return vector_store.as_retriever(search_type="similarity", search_kwargs=search_kwargs)
+
+def retrieve_documents(prompt, model, k=4):
+    """
+    Returns the top-k documents for the prompt with the configured retrieval mode, served from the retrieval cache when possible.
+    With reranking enabled, rag.RERANK_CANDIDATES_FACTOR times k candidates are fetched and at most k of them are kept.
+    """
+    retrieval_mode = get_secret("rag", "RETRIEVAL_MODE", "dense")
+    rerank = is_rerank_enabled()
+    retrieval_cache = get_retrieval_cache()
+    cache_key = (
+        prompt,
+        k,
+        get_embedding_model_id(model),
+        get_secret("rag", "RETRIEVER_BACKEND", "atlas"),
+        retrieval_mode,
+        get_reranker_model_name() if rerank else None,
+        get_index_version(),
     )
+    docs = retrieval_cache.get(cache_key)
+    if docs is None:
+        num_candidates = k * int(get_secret("rag", "RERANK_CANDIDATES_FACTOR", 5)) if rerank else k
+        if retrieval_mode == "dense":
+            docs = dense_search(prompt, model, num_candidates)
+        elif retrieval_mode == "lexical":
+            docs = lexical_search(prompt, num_candidates)
+        else:
+            docs = hybrid_search(prompt, model, num_candidates)
+        if rerank:
+            docs = rerank_documents(prompt, docs, k)
+        retrieval_cache.set(cache_key, docs)
+    return docs
 
-    return vector_store.as_retriever(search_type="similarity", search_kwargs={"k": 4})
+def dense_search(prompt, model, k=4):
+    """Returns the top-k documents by embedding similarity."""
+    with span("vector_search"):
+        return get_retriever(model, k=k).invoke(prompt)
 
-@st.cache_data(show_spinner=False)
-def get_all_vectors():
-    """Retrieves all vectors from the vectors collection."""
+def lexical_search(prompt, k=4):
+    """Returns the top-k documents by BM25 score."""
+    with span("lexical_search"):
+        return get_lexical_index().similarity_search(prompt, k=k)
+
+def hybrid_search(prompt, model, k=4):
+    """
+    Returns the top-k documents of the dense and lexical rankings fused with reciprocal rank fusion.
+    Both searches over-fetch rag.HYBRID_CANDIDATES_FACTOR times k candidates, so documents ranked highly by only one of them can still make the cut.
+    """
+    num_candidates = k * int(get_secret("rag", "HYBRID_CANDIDATES_FACTOR", 4))
+    dense_docs = dense_search(prompt, model, num_candidates)
+    lexical_docs = lexical_search(prompt, num_candidates)
+    with span("rank_fusion"):
+        return reciprocal_rank_fusion([dense_docs, lexical_docs], k, rrf_k=int(get_secret("rag", "RRF_K", 60)))
+
+def reciprocal_rank_fusion(rankings, k=4, rrf_k=60):
+    """Fuses ranked lists of documents by summing 1 / (rrf_k + rank) over the lists each document appears in."""
+    scores, docs = {}, {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = (doc.metadata.get("source"), doc.page_content)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    return [docs[key] for key in sorted(scores, key=scores.get, reverse=True)[:k]]
+
+def rerank_documents(prompt, docs, k=4):
+    """
+    Reranks the candidate documents with the cross-encoder and keeps at most k of them scoring at least rag.RERANK_THRESHOLD,
+    and at least rag.RERANK_MIN_K. The score is added to the metadata of every kept document.
+    """
+    reranker = load_reranker(get_reranker_model_name())
+    with span("rerank"):
+        ranked = reranker.rerank(
+            prompt,
+            docs,
+            top_k=k,
+            threshold=float(get_secret("rag", "RERANK_THRESHOLD", 0.3)),
+            min_k=int(get_secret("rag", "RERANK_MIN_K", 1)),
+        )
+    count("rerank_candidates", len(docs))
+    count("context_passages", len(ranked))
+
+    for doc, score in ranked:
+        doc.metadata["rerank_score"] = score
+    return [doc for doc, _ in ranked]
+
+def load_reranker(model_name):
+    """Returns the cross-encoder reranker from the model registry, loading it if needed."""
+    return get_model_registry().get(*get_reranker_spec(model_name))
+
+def get_reranker_spec(model_name):
+    """Returns the model registry key of the cross-encoder reranker and the loader that creates it."""
+    latency_budget_ms = get_secret("rag", "RERANK_LATENCY_BUDGET_MS", 300)
+    return ("reranker", model_name), lambda: CrossEncoderReranker(
+        model_name,
+        max_length=int(get_secret("rag", "RERANK_MAX_LENGTH", 512)),
+        latency_budget_ms=float(latency_budget_ms) if latency_budget_ms else None,
+    )
+
+def get_reranker_model_name():
+    """Returns the name of the cross-encoder in rag.RERANKER_MODEL, or RERANKER_MODEL_NAME."""
+    return get_secret("rag", "RERANKER_MODEL", RERANKER_MODEL_NAME)
+
+def is_rerank_enabled():
+    """Returns True if retrieved documents should be reranked with the cross-encoder."""
+    return bool(get_secret("rag", "RERANK_ENABLED", False))
+
+def get_lexical_index():
+    """
+    Returns the in-process BM25 index over the vectors collection, rebuilt whenever this process creates or deletes vectors.
+    The index version is the staleness key, so retrieval runs no extra queries to check it.
+    """
+    return load_lexical_index(get_index_version())
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_lexical_index(index_version):
+    """
+    Builds the BM25 index from the texts and the terms tokenized at ingestion, cached per version of the vector index.
+    Terms stored by an older version of the stemmer are tokenized again, so they match the terms of the queries.
+    """
     vectors_collection = get_collection("vectors")
-    cursor = vectors_collection.find({})
+    texts, metadatas, terms = [], [], []
+    for document in vectors_collection.find({}, {"_id": 0, "embedding": 0}):
+        texts.append(document.pop("text"))
+        stored_terms = document.pop("terms", None)
+        terms.append(stored_terms if document.pop("terms_version", None) == STEMMER_VERSION else None)
+        metadatas.append(document)
+    return BM25Index(texts, metadatas, terms)
 
-    vectors = []
-    for document in cursor:
-        vectors.append({
-            "text": document["text"],
-        })
+def get_local_index_path():
+    """Returns the absolute path of the LOCAL_INDEX_DIR directory."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, LOCAL_INDEX_DIR)
+
+def get_local_vector_store(model):
+    """
+    Returns the in-process vector store searched with the given embedding model, reloading the index whenever it is rebuilt.
+    The cached index holds no model, so it never keeps a model alive that the model registry evicted or replaced.
+    """
+    index_path = get_local_index_path()
+    build_id = LocalVectorStore.get_build_id(index_path)
+    if build_id is None:
+        raise Exception("Local vector index not found! Build it from the Documents tab first.")
+    return load_local_vector_store(index_path, build_id).bind(model)
+
+@st.cache_resource(show_spinner=False, max_entries=1)
+def load_local_vector_store(index_path, build_id):
+    """Loads the local vector index from disk, cached per index build."""
+    return LocalVectorStore(index_path, nprobe=int(get_secret("rag", "IVF_NPROBE", 8)))
+
+def build_local_index():
+    """
+    Builds the local vector index from the documents stored in the vectors collection.
+    Returns the index metadata, or None if the collection has no documents to index.
+    """
+    try:
+        vectors_collection = get_collection("vectors")
+        vectors, texts, metadatas = [], [], []
+        for document in vectors_collection.find({}, {"_id": 0, "terms": 0, "terms_version": 0}):
+            vectors.append(document.pop("embedding"))
+            texts.append(document.pop("text"))
+            metadatas.append(document)
+        if not texts:
+            return None
+
+        index_meta = LocalVectorStore.build(
+            get_local_index_path(),
+            vectors,
+            texts,
+            metadatas,
+            index_type=get_secret("rag", "LOCAL_INDEX_TYPE", "auto"),
+            ivf_min_vectors=int(get_secret("rag", "IVF_MIN_VECTORS", 20000)),
+        )
+        bump_index_version()
+        return index_meta
+    except Exception as e:
+        raise Exception("Failed to build local vector index!") from e
+
+def get_vectors_criteria(search="", source=ALL_SOURCES):
+    """Returns the vectors query for a case-insensitive text search and a source file filter."""
+    criteria = {}
+    if search:
+        criteria["text"] = {"$regex": re.escape(search), "$options": "i"}
+    if source != ALL_SOURCES:
+        criteria["source"] = source
+    return criteria
+
+@st.cache_data(show_spinner=False)
+def get_vectors_page(page=1, page_size=50, search="", source=ALL_SOURCES):
+    """Retrieves one page of the vectors collection without the embeddings, optionally filtered by text and source file."""
+    try:
+        vectors_collection = get_collection("vectors")
+        cursor = (
+            vectors_collection.find(get_vectors_criteria(search, source), VECTORS_PAGE_PROJECTION)
+            .sort("_id", 1)
+            .skip((page - 1) * page_size)
+            .limit(page_size)
+        )
+        return [
+            {"text": document["text"], "source": document.get("source"), "page": document.get("page"), "section": document.get("section")}
+            for document in cursor
+        ]
+    except Exception as e:
+        raise Exception("Failed to get vectors!") from e
 
-    return vectors
+@st.cache_data(show_spinner=False)
+def count_vectors(search="", source=ALL_SOURCES):
+    """
+    Counts the vectors matching a text search and source file filter on the server.
+    Without a search or filter the count comes from the collection metadata.
+    """
+    try:
+        vectors_collection = get_collection("vectors")
+        criteria = get_vectors_criteria(search, source)
+        if not criteria:
+            return vectors_collection.estimated_document_count()
+        return vectors_collection.count_documents(criteria)
+    except Exception as e:
+        raise Exception("Failed to count vectors!") from e
+
+@st.cache_data(show_spinner=False)
+def get_vector_source_counts():
+    """Returns the number of vectors per source file, largest first."""
+    try:
+        vectors_collection = get_collection("vectors")
+        return {source["_id"]: source["count"] for source in vectors_collection.aggregate(VECTOR_SOURCE_COUNTS_PIPELINE)}
+    except Exception as e:
+        raise Exception("Failed to count vectors!") from e
 
 def upload_pdf(uploaded_file):
     """Save PDF file to the DOCS_DIR directory."""
@@ -60,7 +311,10 @@ def delete_pdf(filename):
 
         file_path = os.path.join(abs_dir_path, filename)
         if os.path.exists(file_path):
+            file_hash = get_file_hash(file_path)
             os.remove(file_path)
+            delete_source_vectors([filename])
+            delete_cached_pages(file_hash)
             st.success(f"Successfully deleted {filename}")
         else:
             st.warning(f"File {filename} does not exist")
@@ -89,7 +343,10 @@ def delete_json(filename):
 
         file_path = os.path.join(abs_dir_path, filename)
         if os.path.exists(file_path):
+            file_hash = get_file_hash(file_path)
             os.remove(file_path)
+            delete_source_vectors([filename])
+            delete_cached_pages(file_hash)
             st.success(f"Successfully deleted {filename}")
         else:
             st.warning(f"File {filename} does not exist")
@@ -101,104 +358,262 @@ def delete_all_vectors():
     try:
         vectors_collection = get_collection("vectors")
         vectors_collection.delete_many({})
+        bump_index_version()
     except Exception as e:
         raise Exception("Failed to delete vectors!") from e
 
+def delete_source_vectors(sources):
+    """Deletes the vectors of the given source files from the vectors collection."""
+    try:
+        vectors_collection = get_collection("vectors")
+        result = vectors_collection.delete_many({"source": {"$in": list(sources)}})
+        if result.deleted_count:
+            bump_index_version()
+        return result.deleted_count
+    except Exception as e:
+        raise Exception("Failed to delete vectors!") from e
+
+def delete_stale_vectors(index_hashes):
+    """Deletes the vectors of the given source files that were indexed with another hash than the file's current one."""
+    return delete_vectors_matching([{"source": source, "content_hash": {"$ne": index_hash}} for source, index_hash in index_hashes.items()])
+
+def delete_partial_vectors(index_hashes):
+    """Deletes the vectors of the given source files that were indexed with the file's current hash, rolling back a failed re-index."""
+    return delete_vectors_matching([{"source": source, "content_hash": index_hash} for source, index_hash in index_hashes.items()])
+
+def delete_vectors_matching(criteria):
+    """Deletes the vectors matching any of the criteria."""
+    if not criteria:
+        return 0
+    try:
+        vectors_collection = get_collection("vectors")
+        result = vectors_collection.delete_many({"$or": criteria})
+        if result.deleted_count:
+            bump_index_version()
+        return result.deleted_count
+    except Exception as e:
+        raise Exception("Failed to delete vectors!") from e
+
+def delete_untagged_vectors(extension):
+    """
+    Deletes the vectors of one file type that were stored before source files and content hashes were tracked.
+    Untagged JSON vectors carry the JSON file path as source, untagged PDF vectors do not.
+    """
+    try:
+        vectors_collection = get_collection("vectors")
+        json_source = {"$regex": "\\.json$"}
+        source_filter = json_source if extension == ".json" else {"$not": json_source}
+        result = vectors_collection.delete_many({"content_hash": {"$exists": False}, "source": source_filter})
+        if result.deleted_count:
+            bump_index_version()
+        return result.deleted_count
+    except Exception as e:
+        raise Exception("Failed to delete vectors!") from e
+
+def get_indexed_sources(extension):
+    """
+    Returns the content hash of every indexed source file with the given extension,
+    or None for a file whose vectors carry several hashes because an earlier sync was interrupted.
+    """
+    vectors_collection = get_collection("vectors")
+    return {
+        source["_id"]: source["content_hashes"][0] if len(source["content_hashes"]) == 1 else None
+        for source in vectors_collection.aggregate(get_indexed_sources_pipeline(extension))
+    }
+
+def get_indexed_sources_pipeline(extension):
+    """Returns the aggregation that groups the content hashes of the indexed files with the given extension by source."""
+    return [
+        {"$match": {"source": {"$regex": f"\\{extension}$"}, "content_hash": {"$exists": True}}},
+        {"$group": {"_id": "$source", "content_hashes": {"$addToSet": "$content_hash"}}},
+    ]
+
+def get_file_hash(file_path):
+    """Returns the SHA-256 hash of a file's content."""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+def sync_vectors(folder_path, extension, load_documents, prune_cache=None):
+    """
+    Re-indexes the files with the given extension in folder_path incrementally.
+    Only new or changed files are embedded, and the vectors of deleted files are removed. A file also counts as changed
+    when its chunking policy or the chunker changed, since its vectors are tagged with get_policy_hash.
+    The old vectors of a changed file are only deleted once its new vectors are stored. If storing fails, the new vectors
+    stored so far are deleted instead, so the file keeps its old vectors and is re-indexed by the next sync.
+    load_documents takes a dict of file path to content hash and returns the Document objects per file path.
+    prune_cache, if given, takes the set of content hashes of the current files and drops the cached data of others.
+    """
+    delete_untagged_vectors(extension)
+    indexed_sources = get_indexed_sources(extension)
+    file_hashes = {
+        filename: get_file_hash(os.path.join(folder_path, filename))
+        for filename in os.listdir(folder_path) if filename.endswith(extension)
+    }
+
+    if prune_cache is not None:
+        prune_cache(set(file_hashes.values()))
+
+    index_hashes = {filename: get_policy_hash(content_hash, get_chunking_policy(filename)) for filename, content_hash in file_hashes.items()}
+
+    changed = [filename for filename, index_hash in index_hashes.items() if indexed_sources.get(filename) != index_hash]
+    removed = [source for source in indexed_sources if source not in file_hashes]
+    delete_source_vectors(removed)
+
+    changed_files = {os.path.join(folder_path, filename): file_hashes[filename] for filename in changed}
+    docs, loaded = [], {}
+    for file_path, file_docs in load_documents(changed_files).items():
+        filename = os.path.basename(file_path)
+        loaded[filename] = index_hashes[filename]
+        for doc in file_docs:
+            doc.metadata.update({"source": filename, "content_hash": index_hashes[filename]})
+        docs.extend(file_docs)
+
+    # Vectors left with the new hash by an interrupted sync are dropped first, so they are not stored twice.
+    delete_partial_vectors(loaded)
+    stats = store_vectors(docs) if docs else {"chunks": 0, "seconds": 0.0, "chunks_per_sec": 0.0}
+    if stats is None:
+        delete_partial_vectors(loaded)
+    else:
+        delete_stale_vectors(loaded)
+        stats.update({
+            "new": len([filename for filename in changed if filename not in indexed_sources]),
+            "changed": len([filename for filename in changed if filename in indexed_sources]),
+            "removed": len(removed),
+            "unchanged": len(file_hashes) - len(changed),
+        })
+    return stats
+
 def create_vectors():
-    """Create vectors from all the PDF files in the DOCS_DIR directory."""
+    """Create vectors for the new or changed PDF files in the DOCS_DIR directory."""
     current_dir = os.path.dirname(os.path.abspath(__file__))
     abs_dir_path = os.path.join(current_dir, DOCS_DIR)
-    return process_pdfs_in_folder(abs_dir_path)
+    return sync_vectors(abs_dir_path, ".pdf", load_pdf_documents, prune_cache=prune_cached_pages)
 
 def create_json_vectors():
-    """Create vectors from all the JSON files in the JSON_DIR directory."""
+    """Create vectors for the new or changed JSON files in the JSON_DIR directory."""
     current_dir = os.path.dirname(os.path.abspath(__file__))
     abs_dir_path = os.path.join(current_dir, JSON_DIR)
+    return sync_vectors(abs_dir_path, ".json", load_json_documents)
 
-    for filename in os.listdir(abs_dir_path):
-        if filename.endswith(".json"):
+def load_json_documents(files):
+    """Loads the records of the given JSON files and chunks them with each file's chunking policy, grouped by file path."""
+    tokenizer = load_tokenizer(EMBEDDING_MODEL_NAME)
+    docs = {}
+    for file_path in files:
+        try:
             loader = JSONLoader(
-                file_path=os.path.join(abs_dir_path, filename),
+                file_path=file_path,
                 text_content=False
             )
+            policy = get_chunking_policy(os.path.basename(file_path))
+            docs[file_path] = [
+                chunk
+                for record in loader.load()
+                for chunk in chunk_pages([record.page_content], policy, tokenizer, metadata=record.metadata, paged=False)
+            ]
+        except Exception as e:
+            print(f"Error processing file {file_path}: {e}")
+    return docs
 
-            data = loader.load()
-            store_vectors(data)
-
-def process_pdfs_in_folder(folder_path):
-    """Processes all PDF files in the given folder path."""
-    file_exception = ["Tatib Siswa 23-24.pdf", "Kalender Akademik 23-24.pdf"]
-    for filename in os.listdir(folder_path):
-        if filename.endswith(".pdf"):
-            file_path = os.path.join(folder_path, filename)
-            try:
-                with open(file_path, "rb") as f:
-                    pdf_reader = PdfReader(f)
-                    text = "".join(page.extract_text() for page in pdf_reader.pages)
-                if filename in file_exception:
-                    process_vectors_with_splitter(text)
-                else:
-                    process_vectors_without_splitter(text)
-            except Exception as e:
-                print(f"Error processing file {filename}: {e}")
-
-def process_vectors_with_splitter(text):
-    """Processes vectors with text splitting for a given text."""
-    try:
-        docs = get_text_chunks(text)
-        store_vectors(docs)
-    except Exception as e:
-        print(f"Error in process_vectors_with_splitter: {e}")
+def load_pdf_documents(files):
+    """Extracts the text of the given PDF files page by page and chunks it with each file's chunking policy, grouped by file path."""
+    tokenizer = load_tokenizer(EMBEDDING_MODEL_NAME)
+    docs = {}
+    for file_path, pages in extract_pdf_pages(files).items():
+        docs[file_path] = chunk_pages(pages, get_chunking_policy(os.path.basename(file_path)), tokenizer)
+    return docs
 
-def process_vectors_without_splitter(text):
-    """Processes vectors without text splitting."""
+def store_vectors(text_chunks):
+    """
+    Embeds a list of Document objects in batches and bulk-inserts the vectors into the database,
+    together with the stemmed terms the lexical index is built from.
+    Returns the ingestion stats, including the throughput in chunks per second.
+    """
     try:
-        doc = Document(page_content=text, metadata={"source": "local"})
-        store_vectors([doc])
-    except Exception as e:
-        print(f"Error in process_vectors_without_splitter: {e}")
+        embeddings = load_embedding_model(EMBEDDING_MODEL_NAME)
+        embed_batch_size = int(get_secret("rag", "EMBED_BATCH_SIZE", 64))
+        insert_batch_size = int(get_secret("rag", "INSERT_BATCH_SIZE", 1000))
+        vectors_collection = get_collection("vectors")
 
-def get_text_chunks(raw_text):
-    """Splits raw text into chunks and returns a list of Document objects."""
-    try:
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=500,
-            chunk_overlap=50,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
-        )
-        text_chunks = text_splitter.split_text(raw_text)
-        docs = text_splitter.create_documents(text_chunks)
-        return docs
-    except Exception as e:
-        print(f"Error in get_text_chunks: {e}")
-        return []
+        start_time = perf_counter()
+        pending = []
+        for start in range(0, len(text_chunks), embed_batch_size):
+            batch = text_chunks[start:start + embed_batch_size]
+            vectors = embeddings.embed_documents([doc.page_content for doc in batch])
+            for doc, vector in zip(batch, vectors):
+                pending.append({"text": doc.page_content, "embedding": vector, "terms": tokenize(doc.page_content), "terms_version": STEMMER_VERSION, **doc.metadata})
 
-def store_vectors(text_chunks):
-    """Stores vectors in the database from a list of Document objects."""
-    try:
-        model_name = "firqaaa/indo-sentence-bert-base"
-        embeddings = load_embedding_model(model_name)
+            if len(pending) >= insert_batch_size:
+                vectors_collection.insert_many(pending, ordered=False)
+                pending = []
 
-        vectors_collection = get_collection("vectors")
-        index_name = "vector_index"
+        if pending:
+            vectors_collection.insert_many(pending, ordered=False)
+        bump_index_version()
 
-        MongoDBAtlasVectorSearch.from_documents(
-            documents=text_chunks,
-            embedding=embeddings,
-            collection=vectors_collection,
-            index_name=index_name,
-        )
+        duration = perf_counter() - start_time
+        stats = {
+            "chunks": len(text_chunks),
+            "seconds": duration,
+            "chunks_per_sec": len(text_chunks) / duration if duration > 0 else 0.0,
+        }
+        print(f"Stored {stats['chunks']} vectors in {stats['seconds']:.1f}s ({stats['chunks_per_sec']:.1f} chunks/sec)")
+        return stats
     except Exception as e:
         print(f"Error in store_vectors: {e}")
+        return None
 
 def load_embedding_model(model_name):
-    """Loads the HuggingFace embedding model."""
+    """Returns the embedding model from the model registry, loading it if needed."""
+    return get_model_registry().get(*get_embedding_model_spec(model_name))
+
+def get_embedding_model_spec(model_name):
+    """
+    Returns the model registry key of the embedding model with the backend in rag.EMBEDDING_BACKEND,
+    and the loader that creates it with cached query embeddings.
+    """
+    backend = get_secret("rag", "EMBEDDING_BACKEND", "torch")
+    loader = lambda: CachedEmbeddings(create_embeddings(model_name, backend), get_query_embedding_cache(), namespace=f"{model_name}:{backend}")
+    return ("embedding", model_name, backend), loader
+
+def get_embedding_model_id(model):
+    """Returns what identifies an embedding model in cache keys: the model name and backend it was loaded with."""
+    return getattr(model, "namespace", None) or type(model).__name__
+
+def create_embeddings(model_name, backend="torch"):
+    """
+    Creates the embeddings of a model with the given backend: "torch" runs the sentence-transformers model in PyTorch,
+    "onnx" runs it in ONNX Runtime, int8-quantized unless rag.ONNX_QUANTIZE is false.
+    """
+    batch_size = int(get_secret("rag", "EMBED_BATCH_SIZE", 64))
+    if backend == "onnx":
+        quantize = bool(get_secret("rag", "ONNX_QUANTIZE", True))
+        num_threads = get_secret("rag", "ONNX_THREADS")
+        return OnnxEmbeddings(
+            model_name,
+            get_onnx_model_dir(model_name),
+            quantize=quantize,
+            batch_size=batch_size,
+            num_threads=int(num_threads) if num_threads else None,
+        )
+    elif backend != "torch":
+        raise ValueError(f"Unknown embedding backend: {backend}")
+
+    from langchain_huggingface import HuggingFaceEmbeddings
+
     model_kwargs = {'device': 'cpu'}
-    encode_kwargs = {'normalize_embeddings': False}
+    encode_kwargs = {'normalize_embeddings': False, 'batch_size': batch_size}
 
     return HuggingFaceEmbeddings(
         model_name=model_name,
         model_kwargs=model_kwargs,
         encode_kwargs=encode_kwargs
-    )
\ No newline at end of file
+    )
+
+def get_onnx_model_dir(model_name):
+    """Returns the absolute path of the directory the ONNX export of a model is cached in."""
+    current_dir = os.path.dirname(os.path.abspath(__file__))
+    return os.path.join(current_dir, ONNX_MODEL_DIR, model_name.replace("/", "--"))
@@ -1,9 +1,11 @@
 import os
 import streamlit as st
 from models.User import User
-from utils.helpers import hash_password, check_password
+from utils.helpers import hash_password, check_password, create_thumbnail, delete_thumbnail
 
 USER_IMAGE_DIR = "../../assets/users"
+# Seconds the users table and statistics stay cached. Logins and registrations also clear them.
+USER_LIST_CACHE_TTL = 60
 
 def create_user(user_data):
     """Creates a new user and saves their profile picture if provided."""
@@ -22,6 +24,33 @@ def get_all_users():
     """Retrieves all users."""
     return User.get_all()
 
+@st.cache_data(show_spinner=False, ttl=USER_LIST_CACHE_TTL)
+def get_users_page(page=1, page_size=50, search="", sort_by="created_at", descending=True):
+    """Retrieves one page of users for the users table, without password hashes."""
+    return User.get_page(search, sort_by, descending, skip=(page - 1) * page_size, limit=page_size)
+
+@st.cache_data(show_spinner=False, ttl=USER_LIST_CACHE_TTL)
+def count_users(search=""):
+    """Counts the users matching the search."""
+    return User.count(search)
+
+@st.cache_data(show_spinner=False, ttl=USER_LIST_CACHE_TTL)
+def get_user_stats():
+    """Retrieves the total, active and administrator user counts."""
+    return User.get_stats()
+
+@st.cache_data(show_spinner=False, ttl=USER_LIST_CACHE_TTL)
+def get_usernames():
+    """Retrieves the ID and username of every user."""
+    return User.get_usernames()
+
+def clear_user_list_caches():
+    """Drops the cached users table pages, counts, statistics and usernames."""
+    get_users_page.clear()
+    count_users.clear()
+    get_user_stats.clear()
+    get_usernames.clear()
+
 def update_user(criteria, new_data):
     """Updates user data based on the given criteria."""
     return User.update(criteria, new_data)
@@ -54,7 +83,7 @@ def remove_picture(user_data):
     return update_user({"username": user_data["username"]}, user_data)
 
 def save_picture(uploaded_file, username):
-    """Saves an uploaded picture to the USER_IMAGE_DIR directory."""
+    """Saves an uploaded picture and its thumbnail to the USER_IMAGE_DIR directory."""
     try:
         current_dir = os.path.dirname(os.path.abspath(__file__))
         abs_dir_path = os.path.join(current_dir, USER_IMAGE_DIR)
@@ -64,6 +93,7 @@ def save_picture(uploaded_file, username):
         file_path = os.path.join(abs_dir_path, f"{username}.{file_extension}")
         with open(file_path, "wb") as f:
             f.write(uploaded_file.getbuffer())
+        create_thumbnail(file_path)
 
         return f"{username}.{file_extension}"
     except Exception as e:
@@ -71,7 +101,7 @@ def save_picture(uploaded_file, username):
         return None
 
 def delete_picture(filename):
-    """Delete a picture from the USER_IMAGE_DIR directory."""
+    """Delete a picture and its thumbnail from the USER_IMAGE_DIR directory."""
     try:
         current_dir = os.path.dirname(os.path.abspath(__file__))
         abs_dir_path = os.path.join(current_dir, USER_IMAGE_DIR)
@@ -79,6 +109,7 @@ def delete_picture(filename):
         file_path = os.path.join(abs_dir_path, filename)
         if os.path.exists(file_path):
             os.remove(file_path)
+        delete_thumbnail(file_path)
     except Exception as e:
         st.error(f"Failed to delete picture: {e}")
 
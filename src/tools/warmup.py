@@ -0,0 +1,60 @@
+import threading
+import streamlit as st
+
+DEFAULT_MODEL_CONFIG = {
+    "model_name": "meta-llama/Meta-Llama-3-8B-Instruct",
+    "temperature": 1.0,
+    "top_p": 0.8,
+    "max_tokens": 4000
+}
+
+class ModelWarmup:
+    """
+    Loads the models into the process-wide model registry in a background thread, so pages render while they load.
+    A request that needs a model before the warm-up finished waits for the same load instead of loading it twice.
+    """
+
+    def __init__(self, model_config):
+        self.model_config = model_config
+        self.error = None
+        self.done = threading.Event()
+        self.thread = threading.Thread(target=self._run, name="model-warmup", daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def wait(self, timeout=None):
+        """Blocks until the warm-up finished, or the timeout in seconds passed. Returns True if it finished."""
+        return self.done.wait(timeout)
+
+    def _run(self):
+        from tools.metrics import Trace, record_trace
+        from tools.chat import load_llm_model
+        from tools.prompt import load_tokenizer
+        from tools.rag import EMBEDDING_MODEL_NAME, get_reranker_model_name, is_rerank_enabled, load_embedding_model, load_reranker
+
+        trace = Trace("model_warmup")
+        try:
+            with trace.span("load_embedding_model"):
+                load_embedding_model(EMBEDDING_MODEL_NAME).embed_documents(["pemanasan"])
+            with trace.span("load_tokenizers"):
+                load_tokenizer(EMBEDDING_MODEL_NAME)
+                load_tokenizer(self.model_config["model_name"])
+            with trace.span("load_llm_model"):
+                load_llm_model(self.model_config)
+            if is_rerank_enabled():
+                with trace.span("load_reranker"):
+                    load_reranker(get_reranker_model_name())
+        except Exception as e:
+            self.error = e
+            print(f"Error warming up models: {e}")
+        finally:
+            record_trace(trace)
+            self.done.set()
+
+@st.cache_resource(show_spinner=False)
+def start_model_warmup():
+    """Starts warming up the default models once per process and returns the warm-up."""
+    warmup = ModelWarmup(DEFAULT_MODEL_CONFIG)
+    warmup.start()
+    return warmup
@@ -2,8 +2,9 @@ import os
 import bcrypt
 import pytz
 import base64
-import huggingface_hub
+import mimetypes
 import streamlit as st
+from functools import lru_cache
 
 SYSTEM_MESSAGE = """
 Anda adalah chatbot berbahasa Indonesia yang bertugas untuk menjawab pertanyaan terkait SMP Santo Leo III. \
@@ -12,6 +13,9 @@ Abaikan konteks jika tidak relevan dengan pertanyaan.
 """
 SYSTEM_MESSAGE_DICT = {"role": "system", "content": SYSTEM_MESSAGE}
 
+USER_IMAGE_DIR = "assets/users"
+THUMBNAIL_SIZE = (128, 128)
+
 def hash_password(password):
     """Hashes a password using bcrypt."""
     salt = bcrypt.gensalt()
@@ -34,9 +38,10 @@ def initialize_session():
         'chat_session_id': None,
         'chat_title': None,
         'messages': [SYSTEM_MESSAGE_DICT],
-        'llm_model': None,
-        'embedding_model': None,
-        'user_preview_id': None
+        'model_config': None,
+        'user_preview_id': None,
+        'history_pages': 1,
+        'history_summary': None
     }
 
     for key, value in session_defaults.items():
@@ -55,9 +60,10 @@ def clear_session():
         'chat_session_id',
         'chat_title',
         'messages',
-        'llm_model',
-        'embedding_model',
-        'user_preview_id'
+        'model_config',
+        'user_preview_id',
+        'history_pages',
+        'history_summary'
     ]
 
     for key in session_keys:
@@ -68,6 +74,7 @@ def clear_chat_states():
     st.session_state.chat_session_id = None
     st.session_state.messages = [SYSTEM_MESSAGE_DICT]
     st.session_state.chat_title = None
+    st.session_state.history_summary = None
 
 def check_auth(page):
     """Checks if a user is authorized to view a page."""
@@ -78,6 +85,13 @@ def check_auth(page):
     elif page == "Dashboard":
         return st.session_state.is_authenticated and st.session_state.is_admin
 
+def get_secret(section, key, default=None):
+    """Returns a value from the Streamlit secrets, or the default if it is not set."""
+    try:
+        return st.secrets[section].get(key, default)
+    except (KeyError, FileNotFoundError):
+        return default
+
 def convert_to_local(utc_dt):
     """Converts UTC datetime to local timezone."""
     local_tz = pytz.timezone("Asia/Jakarta")
@@ -85,15 +99,61 @@ def convert_to_local(utc_dt):
 
 def authorize_hf():
     """Authorizes Hugging Face API using a token."""
+    import huggingface_hub
     huggingface_hub.login(st.secrets.hf.HUGGINGFACEHUB_API_TOKEN)
 
-def convert_image_to_base64(filename):
-    """Converts an image file to base64 string."""
+def get_thumbnail_path(image_path):
+    """Returns the path of the PNG thumbnail of a picture in the user image directory."""
+    image_dir = os.path.dirname(image_path)
+    name = os.path.splitext(os.path.basename(image_path))[0]
+    return os.path.join(image_dir, "thumbnails", f"{name}.png")
+
+def create_thumbnail(image_path):
+    """Resizes a picture into a small PNG thumbnail next to it and returns the thumbnail path."""
+    from PIL import Image
+
+    thumbnail_path = get_thumbnail_path(image_path)
+    os.makedirs(os.path.dirname(thumbnail_path), exist_ok=True)
+    with Image.open(image_path) as image:
+        if image.mode not in ("RGB", "RGBA", "L", "LA", "P"):
+            image = image.convert("RGBA")
+        image.thumbnail(THUMBNAIL_SIZE)
+        image.save(thumbnail_path, "PNG", optimize=True)
+    return thumbnail_path
+
+def delete_thumbnail(image_path):
+    """Deletes the thumbnail of a picture if it exists."""
+    thumbnail_path = get_thumbnail_path(image_path)
+    if os.path.exists(thumbnail_path):
+        os.remove(thumbnail_path)
+
+def encode_image(path):
+    """Reads and base64-encodes an image file."""
+    with open(path, "rb") as image_file:
+        return base64.b64encode(image_file.read()).decode()
+
+@lru_cache(maxsize=256)
+def encode_thumbnail(path, mtime):
+    """
+    Base64-encodes a thumbnail, cached per file and modification time, so a changed file is re-read.
+    Only thumbnails are cached: they are at most THUMBNAIL_SIZE, which keeps the cache small, while full-size pictures can be megabytes.
+    """
+    return encode_image(path)
+
+def convert_image_to_base64(filename, thumbnail=True):
+    """
+    Converts a user's picture, or by default its thumbnail, to a base64 data URI.
+    Pictures saved before thumbnails existed get their thumbnail created on first use.
+    """
     try:
-        path = os.path.join("assets/users", filename)
-        with open(path, "rb") as image_file:
-            encoded_string = base64.b64encode(image_file.read()).decode()
-            return f"data:image/png;base64,{encoded_string}"
+        path = os.path.join(USER_IMAGE_DIR, filename)
+        if thumbnail:
+            thumbnail_path = get_thumbnail_path(path)
+            if not os.path.exists(thumbnail_path) or os.path.getmtime(thumbnail_path) < os.path.getmtime(path):
+                create_thumbnail(path)
+            return f"data:image/png;base64,{encode_thumbnail(thumbnail_path, os.path.getmtime(thumbnail_path))}"
+        mime_type = mimetypes.guess_type(path)[0] or "image/png"
+        return f"data:{mime_type};base64,{encode_image(path)}"
     except Exception as e:
         st.error(f"Error converting image to base64: {e}")
-        return ""
\ No newline at end of file
+        return ""
@@ -0,0 +1,35 @@
+import pytest
+
+from tools.BM25Index import BM25Index, stem, tokenize
+
+@pytest.mark.parametrize("word, root", [
+    ("pemerintah", "perintah"),
+    ("perintah", "perintah"),
+    ("pemeriksaan", "periksa"),
+    ("pemberitahuan", "beritahu"),
+    ("ditanya", "tanya"),
+    ("bertanya", "tanya"),
+    ("menanyakan", "tanya"),
+    ("penilaian", "nilai"),
+    ("menilai", "nilai"),
+    ("pendidikan", "didik"),
+    ("mempunyai", "punyai"),
+    ("dipunyai", "punyai"),
+    ("diperlukan", "perlu"),
+    ("memperhatikan", "hati"),
+    ("diberikan", "beri"),
+    ("menulis", "tulis"),
+    ("pengumuman", "umum"),
+    ("sekolahnya", "sekolah"),
+    ("kelas", "kelas"),
+])
+def test_stem(word, root):
+    assert stem(word) == root
+
+def test_tokenize_keeps_numbers_and_drops_stopwords():
+    assert tokenize("Jadwal ujian kelas 7 pada 12/2023 adalah 23-24") == ["jadwal", "ujian", "kelas", "7", "12/2023", "23-24"]
+
+def test_search_matches_inflected_forms():
+    index = BM25Index(["Pengumuman dari pemerintah daerah", "Penilaian akhir semester", "Jadwal ekstrakurikuler"])
+    assert index.similarity_search("nilai semester", k=1)[0].page_content == "Penilaian akhir semester"
+    assert index.similarity_search("perintah", k=1)[0].page_content == "Pengumuman dari pemerintah daerah"
@@ -0,0 +1,86 @@
+import json
+import threading
+import pytest
+from contextlib import nullcontext
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+pytest.importorskip("streamlit")
+from tools import cache, chat, llm, prompt
+from tools.chat import generate_response_stream
+
+MODEL_CONFIG = {"model_name": "sse-test-model", "temperature": 0.2, "top_p": 0.8, "max_tokens": 64}
+TOKENS = ["Siswa ", "masuk ", "pukul ", "06.45."]
+
+@pytest.fixture
+def sse_server():
+    """An OpenAI-compatible server that streams TOKENS as server-sent events, and the requests it received."""
+    requests = []
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            requests.append(json.loads(self.rfile.read(int(self.headers["Content-Length"]))))
+            chunks = [{"choices": [{"delta": {"role": "assistant"}}]}]
+            chunks += [{"choices": [{"delta": {"content": token}}]} for token in TOKENS]
+            chunks += [{"choices": [{"delta": {}, "finish_reason": "stop"}]}]
+            data = ("".join(f"data: {json.dumps(chunk)}\n\n" for chunk in chunks) + "data: [DONE]\n\n").encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1", requests
+    server.shutdown()
+
+@pytest.fixture
+def saved_turns(monkeypatch, sse_server):
+    """Points the chat at the SSE server, with retrieval, the database and the embedding model stubbed out."""
+    base_url, _ = sse_server
+    secrets = {
+        ("llm", "PROVIDER"): "openai",
+        ("llm", "BASE_URL"): base_url,
+        ("cache", "SEMANTIC_CACHE_ENABLED"): False,
+        ("chat", "COALESCE_REQUESTS"): False,
+        ("chat", "SUMMARIZE_HISTORY"): False,
+    }
+    fake_get_secret = lambda section, key, default=None: secrets.get((section, key), default)
+    for module in (cache, chat, llm, prompt):
+        monkeypatch.setattr(module, "get_secret", fake_get_secret)
+
+    saved_turns = []
+    monkeypatch.setattr(chat.st, "session_state", SimpleNamespace(
+        chat_session_id="session-1",
+        user_id="user-1",
+        history_summary=None,
+        messages=[{"role": "system", "content": "Anda adalah chatbot sekolah."}, {"role": "user", "content": "Jam berapa masuk?"}],
+    ))
+    monkeypatch.setattr(chat, "use_models", lambda model_config=None: nullcontext())
+    monkeypatch.setattr(chat, "start_chat_session", lambda prompt: None)
+    monkeypatch.setattr(chat, "retrieve_context", lambda prompt: "Siswa masuk pukul 06.45.")
+    monkeypatch.setattr(chat, "load_tokenizer", lambda model_name: None)
+    monkeypatch.setattr(chat, "insert_chat_session", lambda session_id, messages: saved_turns.append((session_id, messages)))
+    return saved_turns
+
+def test_generate_response_stream_yields_the_server_tokens(sse_server, saved_turns):
+    _, requests = sse_server
+    tokens = list(generate_response_stream("Jam berapa masuk?", MODEL_CONFIG))
+
+    assert tokens == TOKENS
+    assert saved_turns == [("session-1", {"user": "Jam berapa masuk?", "ai": "".join(TOKENS)})]
+    assert requests[0]["stream"] is True
+    assert requests[0]["model"] == "sse-test-model"
+    assert "Siswa masuk pukul 06.45." in requests[0]["messages"][-1]["content"]
+
+def test_abandoned_stream_is_not_saved(saved_turns):
+    tokens = generate_response_stream("Jam berapa masuk?", MODEL_CONFIG)
+    assert next(tokens) == TOKENS[0]
+    tokens.close()
+    assert saved_turns == []
@@ -0,0 +1,84 @@
+import threading
+import pytest
+from time import perf_counter
+
+pytest.importorskip("streamlit")
+from tools.evaluations import evaluation
+from tools.evaluations.evaluation import RateLimiter, evaluate_chatbot, evaluate_question
+
+MODEL_CONFIG = {"model_name": "meta-llama/Meta-Llama-3-8B-Instruct", "temperature": 1.0, "top_p": 0.8, "max_tokens": 100}
+
+class NoRateLimit:
+    def wait(self):
+        pass
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    sleeps = []
+    monkeypatch.setattr(evaluation, "sleep", sleeps.append)
+    return sleeps
+
+def failing(times):
+    """Returns a simulate_response stand-in that fails the given number of times, then answers."""
+    calls = []
+
+    def simulate_response(prompt, model_config, llm_model, retrieve):
+        calls.append(prompt)
+        if len(calls) <= times:
+            raise ConnectionError("server unavailable")
+        return "jawaban"
+    return simulate_response
+
+def test_rate_limiter_spaces_calls():
+    rate_limiter = RateLimiter(20)
+    start_time = perf_counter()
+    for _ in range(5):
+        rate_limiter.wait()
+    assert perf_counter() - start_time >= 4 / 20 - 0.01
+
+def test_rate_limiter_spaces_concurrent_calls():
+    rate_limiter = RateLimiter(50)
+    start_time = perf_counter()
+    threads = [threading.Thread(target=rate_limiter.wait) for _ in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert perf_counter() - start_time >= 9 / 50 - 0.01
+
+def test_rate_limiter_without_rate_does_not_wait():
+    rate_limiter = RateLimiter(0)
+    start_time = perf_counter()
+    for _ in range(100):
+        rate_limiter.wait()
+    assert perf_counter() - start_time < 0.05
+
+def test_failed_question_is_retried_with_backoff(monkeypatch, sleeps):
+    monkeypatch.setattr(evaluation, "simulate_response", failing(2))
+    result = evaluate_question(1, "Halo?", "Hai", MODEL_CONFIG, None, None, NoRateLimit(), max_retries=3)
+    assert result["Response"] == "jawaban"
+    assert result["Attempts"] == 3
+    assert result["Time Taken (s)"] is not None
+    assert sleeps == [2, 4]
+
+def test_question_fails_after_the_last_retry(monkeypatch, sleeps):
+    monkeypatch.setattr(evaluation, "simulate_response", failing(10))
+    result = evaluate_question(1, "Halo?", "Hai", MODEL_CONFIG, None, None, NoRateLimit(), max_retries=2)
+    assert result["Response"] == "Error: server unavailable"
+    assert result["Attempts"] == 3
+    assert result["Time Taken (s)"] is None
+    assert sleeps == [2, 4]
+
+def test_stub_run_is_offline(monkeypatch):
+    saved = []
+    monkeypatch.setattr(evaluation, "save_results", lambda results, model_config, wall_time: saved.append(results) or "results.csv")
+    monkeypatch.setattr(evaluation, "load_and_extract_conversations", lambda name: pytest.fail("The stub run loaded the remote dataset"))
+    monkeypatch.setattr(evaluation, "retrieve_documents", lambda prompt, model: pytest.fail("The stub run searched the vector store"))
+    monkeypatch.setattr(evaluation, "use_models", lambda model_config: pytest.fail("The stub run loaded models"))
+
+    assert evaluate_chatbot(MODEL_CONFIG, use_stub=True) == "results.csv"
+    results = saved[0]
+    assert len(results) == 5
+    assert all(result["Attempts"] == 1 for result in results)
+    assert "06.45" in results[0]["Response"]
+    assert "Oktober" in results[1]["Response"]
@@ -0,0 +1,33 @@
+import pytest
+
+pytest.importorskip("streamlit")
+from tools import extraction
+
+def extract_or_fail(file_path, start, end):
+    """Extracts placeholder page texts, failing for the second page range of bad.pdf."""
+    if file_path == "bad.pdf" and start > 0:
+        raise ValueError("corrupt page")
+    return [f"{file_path} {page}" for page in range(start, end)]
+
+@pytest.fixture
+def cache_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(extraction, "get_cache_root", lambda: str(tmp_path))
+    monkeypatch.setattr(extraction, "get_secret", lambda section, key, default=None: 2)
+    monkeypatch.setattr(extraction, "count_pages", lambda file_path: 2 * extraction.PAGES_PER_TASK)
+    monkeypatch.setattr(extraction, "extract_page_range", extract_or_fail)
+    return tmp_path
+
+def test_file_with_a_failed_page_range_is_left_out_and_not_cached(cache_root, capsys):
+    results = extraction.extract_pdf_pages({"good.pdf": "hash-good", "bad.pdf": "hash-bad"})
+    assert list(results) == ["good.pdf"]
+    assert results["good.pdf"][-1] == f"good.pdf {2 * extraction.PAGES_PER_TASK - 1}"
+    assert extraction.read_cached_pages("hash-good") == results["good.pdf"]
+    assert extraction.read_cached_pages("hash-bad") is None
+    assert capsys.readouterr().out.count("Error extracting pages") == 1
+
+def test_prune_deletes_the_pages_of_other_files(cache_root):
+    extraction.write_cached_pages("hash-old", ["a"])
+    extraction.write_cached_pages("hash-new", ["b"])
+    extraction.prune_cached_pages({"hash-new"})
+    assert extraction.read_cached_pages("hash-old") is None
+    assert extraction.read_cached_pages("hash-new") == ["b"]
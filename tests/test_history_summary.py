@@ -0,0 +1,49 @@
+import pytest
+from types import SimpleNamespace
+
+pytest.importorskip("streamlit")
+from tools import chat
+
+def message(role, content):
+    return {"role": role, "content": content}
+
+HISTORY = [
+    message("user", "Q1"), message("assistant", "A1"),
+    message("user", "Q2"), message("assistant", "A2"),
+    message("user", "Q3"), message("assistant", "A3"),
+]
+
+@pytest.fixture
+def summarized(monkeypatch):
+    """Summarizes by appending the contents of the new messages to the previous summary, recording every call."""
+    calls = []
+
+    def summarize_messages(messages, previous_summary, llm_model, max_tokens):
+        calls.append([m["content"] for m in messages])
+        return " ".join([previous_summary] + [m["content"] for m in messages]).strip()
+
+    monkeypatch.setattr(chat, "summarize_messages", summarize_messages)
+    monkeypatch.setattr(chat, "load_llm_model", lambda model_config: None)
+    monkeypatch.setattr(chat.st, "session_state", SimpleNamespace(history_summary=None))
+    return calls
+
+def test_only_messages_that_dropped_out_since_the_last_request_are_summarized(summarized):
+    assert chat.get_history_summary(HISTORY[:2], {}, 64) == "Q1 A1"
+    assert chat.get_history_summary(HISTORY[:4], {}, 64) == "Q1 A1 Q2 A2"
+    assert chat.get_history_summary(HISTORY[:4], {}, 64) == "Q1 A1 Q2 A2"
+    assert summarized == [["Q1", "A1"], ["Q2", "A2"]]
+
+def test_turns_back_in_the_window_leave_the_summary(summarized):
+    chat.get_history_summary(HISTORY[:4], {}, 64)
+    assert chat.get_history_summary(HISTORY[:2], {}, 64) == "Q1 A1"
+    assert summarized == [["Q1", "A1", "Q2", "A2"], ["Q1", "A1"]]
+
+    assert chat.get_history_summary(HISTORY[:4], {}, 64) == "Q1 A1 Q2 A2"
+    assert chat.get_history_summary(HISTORY[:6], {}, 64) == "Q1 A1 Q2 A2 Q3 A3"
+    assert summarized[2:] == [["Q3", "A3"]]
+
+def test_summary_is_rebuilt_when_the_dropped_messages_change(summarized):
+    chat.get_history_summary(HISTORY[:2], {}, 64)
+    edited = [message("user", "Q1 baru"), message("assistant", "A1")]
+    assert chat.get_history_summary(edited, {}, 64) == "Q1 baru A1"
+    assert summarized == [["Q1", "A1"], ["Q1 baru", "A1"]]
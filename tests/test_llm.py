@@ -0,0 +1,76 @@
+import json
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+pytest.importorskip("streamlit")
+from tools.llm import LlamaCppLLM, OpenAICompatibleLLM, StubLLM, apply_chat_template, to_chunk
+
+CHUNKS = [
+    {"choices": [{"delta": {"role": "assistant"}}]},
+    {"choices": [{"delta": {"content": "Halo"}}]},
+    {"choices": [{"delta": {"content": " dunia"}}]},
+    {"choices": [{"delta": {}, "finish_reason": "stop"}]},
+]
+
+class FakeLlama:
+    """Stands in for llama_cpp.Llama, streaming the same chunks as a llama.cpp model."""
+
+    def create_chat_completion(self, messages, stream=False, **kwargs):
+        for chunk in CHUNKS:
+            yield json.loads(json.dumps(chunk))
+
+def make_llamacpp_llm():
+    llm = LlamaCppLLM.__new__(LlamaCppLLM)
+    llm.model_path = "model.gguf"
+    llm.model = FakeLlama()
+    llm._lock = threading.Lock()
+    return llm
+
+@pytest.fixture
+def sse_server():
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers["Content-Length"]))
+            body = "".join(f"data: {json.dumps(chunk)}\n\n" for chunk in CHUNKS) + "data: [DONE]\n\n"
+            data = body.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+
+def test_to_chunk_gives_every_delta_content():
+    assert [to_chunk(chunk).choices[0].delta.content for chunk in json.loads(json.dumps(CHUNKS))] == [None, "Halo", " dunia", None]
+
+def test_openai_compatible_stream(sse_server):
+    llm = OpenAICompatibleLLM(sse_server, "model")
+    chunks = llm.chat_completion([{"role": "user", "content": "Halo"}], stream=True)
+    assert "".join(chunk.choices[0].delta.content or "" for chunk in chunks) == "Halo dunia"
+
+def test_llamacpp_stream_releases_lock_when_closed():
+    llm = make_llamacpp_llm()
+    chunks = llm.chat_completion([{"role": "user", "content": "Halo"}], stream=True)
+    next(chunks)
+    assert llm._lock.locked()
+    chunks.close()
+    assert not llm._lock.locked()
+
+def test_stub_streams_answer_from_context():
+    chunks = StubLLM().chat_completion([{"role": "user", "content": "Konteks: Masuk pukul 06.45 \nBerikut ini adalah pertanyaan"}], stream=True)
+    assert [chunk.choices[0].delta.content for chunk in chunks] == ["Masuk pukul 06.45"]
+
+def test_mistral_template_folds_system_message():
+    messages = [{"role": "system", "content": "Sistem"}, {"role": "user", "content": "\nKonteks: x"}]
+    assert apply_chat_template(messages, "mistralai/Mistral-7B-Instruct-v0.3") == [{"role": "user", "content": "Sistem \nKonteks: x"}]
+    assert apply_chat_template(messages, "meta-llama/Meta-Llama-3-8B-Instruct") == messages
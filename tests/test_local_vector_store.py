@@ -0,0 +1,70 @@
+import os
+import numpy as np
+import pytest
+
+from tools.LocalVectorStore import LocalVectorStore
+
+class FixedEmbedding:
+    """Embeds every query as the same vector."""
+
+    def __init__(self, vector):
+        self.vector = vector
+
+    def embed_query(self, text):
+        return self.vector
+
+def build(index_dir, count=8, dim=4, seed=0):
+    vectors = np.random.default_rng(seed).random((count, dim)).tolist()
+    texts = [f"teks {i}" for i in range(count)]
+    metadatas = [{"source": f"doc{i % 2}.pdf"} for i in range(count)]
+    return vectors, LocalVectorStore.build(index_dir, vectors, texts, metadatas)
+
+def test_build_without_documents_raises_and_keeps_no_index(tmp_path):
+    with pytest.raises(ValueError):
+        LocalVectorStore.build(tmp_path, [], [], [])
+    assert LocalVectorStore.get_build_id(tmp_path) is None
+    with pytest.raises(FileNotFoundError):
+        LocalVectorStore(tmp_path)
+
+def test_rebuild_switches_builds_without_touching_an_open_store(tmp_path):
+    vectors, _ = build(tmp_path)
+    store = LocalVectorStore(tmp_path)
+    old_build_id = store.build_id
+
+    build(tmp_path, seed=1)
+    assert LocalVectorStore.get_build_id(tmp_path) != old_build_id
+    assert sorted(os.listdir(tmp_path)) == sorted([LocalVectorStore.CURRENT_FILE, LocalVectorStore.get_build_id(tmp_path)])
+
+    results = store.bind(FixedEmbedding(vectors[3])).similarity_search("kueri", k=1)
+    assert results[0].page_content == "teks 3"
+
+def test_bind_returns_a_view_with_the_embedding(tmp_path):
+    vectors, _ = build(tmp_path)
+    store = LocalVectorStore(tmp_path)
+    bound = store.bind(FixedEmbedding(vectors[5]))
+    assert bound is not store
+    assert store._embedding is None
+    assert bound.similarity_search("kueri", k=1)[0].page_content == "teks 5"
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf"])
+def test_filter_searches_only_matching_documents(tmp_path, index_type):
+    vectors = np.random.default_rng(0).random((8, 4)).tolist()
+    texts = [f"teks {i}" for i in range(8)]
+    metadatas = [{"source": f"doc{i % 2}.pdf"} for i in range(8)]
+    LocalVectorStore.build(tmp_path, vectors, texts, metadatas, index_type=index_type, nlist=2)
+    store = LocalVectorStore(tmp_path, nprobe=2)
+
+    results = store.similarity_search_by_vector(vectors[4], k=8, filter={"source": "doc1.pdf"})
+    assert len(results) == 4
+    assert {doc.metadata["source"] for doc in results} == {"doc1.pdf"}
+    results = store.similarity_search_by_vector(vectors[4], k=8, filter={"source": {"$in": ["doc0.pdf"]}})
+    assert results[0].page_content == "teks 4"
+    assert {doc.metadata["source"] for doc in results} == {"doc0.pdf"}
+
+def test_unsupported_search_arguments_are_rejected(tmp_path):
+    vectors, _ = build(tmp_path)
+    store = LocalVectorStore(tmp_path)
+    with pytest.raises(ValueError):
+        store.similarity_search_by_vector(vectors[0], k=1, filter={"source": {"$regex": "doc"}})
+    with pytest.raises(TypeError):
+        store.similarity_search_by_vector(vectors[0], k=1, pre_filter={"source": "doc0.pdf"})
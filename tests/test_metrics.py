@@ -0,0 +1,59 @@
+import threading
+from time import sleep
+import pytest
+
+pytest.importorskip("streamlit")
+from tools import metrics
+from tools.metrics import MongoSink, PrometheusSink, Trace
+
+class BlockedCollection:
+    """Stands in for the metrics collection, blocking inserts until it is released."""
+
+    def __init__(self):
+        self.released = threading.Event()
+        self.documents = []
+
+    def insert_many(self, documents, ordered=True):
+        self.released.wait(5)
+        self.documents += documents
+
+def test_nested_spans_are_not_counted_twice():
+    trace = Trace("chat")
+    with trace.span("vector_search"):
+        with trace.span("embed_prompt"):
+            sleep(0.05)
+    assert trace.spans["embed_prompt"] >= 50
+    assert trace.spans["vector_search"] < 25
+
+def test_mongo_sink_does_not_block_and_drops_when_full(monkeypatch):
+    collection = BlockedCollection()
+    monkeypatch.setattr(metrics, "get_collection", lambda name: collection)
+    sink = MongoSink(max_queue_size=2, batch_size=1)
+
+    for _ in range(5):
+        sink.emit(Trace("chat"))
+    assert sink.dropped >= 2
+
+    collection.released.set()
+    sink.flush()
+    assert 1 <= len(collection.documents) <= 3
+
+def test_prometheus_sink_writes_off_the_request_path(tmp_path):
+    recorder = metrics.MetricsRecorder()
+    file_path = tmp_path / "chatbot_metrics.prom"
+    sink = PrometheusSink(recorder, str(file_path), interval=60)
+    recorder.sinks.append(sink)
+
+    trace = Trace("chat")
+    trace.add_span("vector_search", 12.0)
+    recorder.record(trace)
+    for _ in range(50):
+        if file_path.exists():
+            break
+        sleep(0.01)
+    assert 'chatbot_stage_latency_ms_count{stage="vector_search"} 1' in file_path.read_text()
+
+    recorder.record(trace)
+    assert 'chatbot_stage_latency_ms_count{stage="vector_search"} 1' in file_path.read_text()
+    sink.flush()
+    assert 'chatbot_stage_latency_ms_count{stage="vector_search"} 2' in file_path.read_text()
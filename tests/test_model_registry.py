@@ -0,0 +1,32 @@
+import gc
+import weakref
+
+from tools.ModelRegistry import ModelRegistry
+
+class FakeModel:
+    """Stands in for a loaded model."""
+
+def test_held_models_are_not_evicted():
+    registry = ModelRegistry(max_entries=1)
+    with registry.use("embedding", FakeModel):
+        registry.get("reranker", FakeModel)
+        registry.get("llm", FakeModel)
+        assert "embedding" in [model["key"] for model in registry.stats()["models"]]
+    assert [model["key"] for model in registry.stats()["models"]] == ["llm"]
+
+def test_evicted_models_are_freed():
+    registry = ModelRegistry(max_entries=1)
+    model = weakref.ref(registry.get("embedding", FakeModel))
+    registry.get("reranker", FakeModel)
+    gc.collect()
+    assert model() is None
+    assert registry.stats()["evictions"] == 1
+
+def test_concurrent_loads_share_one_instance():
+    from concurrent.futures import ThreadPoolExecutor
+
+    registry = ModelRegistry()
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        models = list(executor.map(lambda _: registry.get("embedding", FakeModel), range(16)))
+    assert len({id(model) for model in models}) == 1
+    assert registry.stats()["loads"] == 1
@@ -0,0 +1,33 @@
+import pytest
+
+from tools.OnnxEmbeddings import OnnxEmbeddings
+
+def fake_export(files):
+    """Returns an _export stand-in that writes the given files, raising if one of them is None."""
+    def _export(model_name, model_dir):
+        for name, content in files.items():
+            if content is None:
+                raise RuntimeError("export interrupted")
+            (model_dir / name).write_text(content)
+    return classmethod(lambda cls, model_name, model_dir: _export(model_name, model_dir))
+
+def test_export_is_renamed_into_place(tmp_path, monkeypatch):
+    monkeypatch.setattr(OnnxEmbeddings, "_export", fake_export({OnnxEmbeddings.MODEL_FILE: "onnx", OnnxEmbeddings.CONFIG_FILE: "{}"}))
+    model_dir = tmp_path / "model"
+    OnnxEmbeddings.export("model", model_dir)
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["model"]
+    assert (model_dir / OnnxEmbeddings.MODEL_FILE).read_text() == "onnx"
+
+def test_interrupted_export_leaves_nothing_behind(tmp_path, monkeypatch):
+    monkeypatch.setattr(OnnxEmbeddings, "_export", fake_export({OnnxEmbeddings.MODEL_FILE: "onnx", OnnxEmbeddings.CONFIG_FILE: None}))
+    with pytest.raises(RuntimeError):
+        OnnxEmbeddings.export("model", tmp_path / "model")
+    assert list(tmp_path.iterdir()) == []
+
+def test_export_replaces_a_partial_export(tmp_path, monkeypatch):
+    model_dir = tmp_path / "model"
+    model_dir.mkdir()
+    (model_dir / OnnxEmbeddings.CONFIG_FILE).write_text("partial")
+    monkeypatch.setattr(OnnxEmbeddings, "_export", fake_export({OnnxEmbeddings.MODEL_FILE: "onnx", OnnxEmbeddings.CONFIG_FILE: "{}"}))
+    OnnxEmbeddings.export("model", model_dir)
+    assert (model_dir / OnnxEmbeddings.CONFIG_FILE).read_text() == "{}"
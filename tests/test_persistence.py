@@ -0,0 +1,61 @@
+import pytest
+
+pytest.importorskip("streamlit")
+from tools import persistence
+from tools.persistence import ChatTurnWriter
+
+class FlakyWrites:
+    """Stands in for write_chat_turns, failing until it is told the database is back."""
+
+    def __init__(self):
+        self.up = False
+        self.turns = []
+
+    def __call__(self, turns):
+        if not self.up:
+            raise ConnectionError("database unavailable")
+        self.turns += turns
+
+@pytest.fixture
+def writes(monkeypatch):
+    writes = FlakyWrites()
+    monkeypatch.setattr(persistence, "write_chat_turns", writes)
+    monkeypatch.setattr(persistence, "sleep", lambda seconds: None)
+    return writes
+
+def test_failed_batch_is_spilled_and_written_once_the_database_is_back(tmp_path, writes):
+    writer = ChatTurnWriter(str(tmp_path / "spool" / "chat_turns.jsonl"), max_retries=2)
+    writer.submit("session-1", "Halo", "Hai")
+    writer.flush()
+
+    stats = writer.stats()
+    assert stats["spilled"] == 1 and stats["failed"] == 1 and stats["written"] == 0
+    assert "database unavailable" in stats["last_error"]
+
+    writes.up = True
+    writer.submit("session-1", "Apa kabar?", "Baik")
+    writer.flush()
+
+    user_messages = sorted(turn["messages"][0]["History"] for turn in writes.turns)
+    assert len(user_messages) == 2
+    assert "Halo" in user_messages[1] and "Apa kabar?" in user_messages[0]
+    assert all(turn["updated_at"].tzinfo is not None for turn in writes.turns)
+    assert writer.stats()["spilled"] == 0 and writer.stats()["written"] == 2
+    assert not (tmp_path / "spool" / "chat_turns.jsonl").exists()
+
+def test_written_turns_are_reported_after_they_are_stored(tmp_path, writes):
+    written = []
+    writer = ChatTurnWriter(str(tmp_path / "chat_turns.jsonl"), on_written=lambda turns: written.append([turn["user_id"] for turn in turns]), max_retries=1)
+    writer.submit("session-1", "Halo", "Hai", "user-1")
+    writer.flush()
+    assert written == []
+
+    writes.up = True
+    writer.submit("session-2", "Apa kabar?", "Baik", "user-2")
+    writer.flush()
+    assert sorted(user_id for user_ids in written for user_id in user_ids) == ["user-1", "user-2"]
+
+def test_new_chat_turn_assigns_message_ids_once():
+    turn = persistence.new_chat_turn("session-1", "Halo", "Hai")
+    assert len({message["_id"] for message in turn["messages"]}) == 2
+    assert all(message["SessionId"] == "session-1" for message in turn["messages"])
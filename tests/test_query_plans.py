@@ -0,0 +1,62 @@
+import os
+import uuid
+import pytest
+
+pytest.importorskip("streamlit")
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+from tools.benchmarks import query_plan_check
+from tools.db import INDEXES, check_query_plans, ensure_indexes, find_plan_stages, find_winning_plans
+
+MONGODB_TEST_URI = os.environ.get("MONGODB_TEST_URI", "mongodb://localhost:27017")
+
+@pytest.fixture
+def db():
+    """A throwaway database on the local mongod at MONGODB_TEST_URI. The tests are skipped if none is running."""
+    client = MongoClient(MONGODB_TEST_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command("ping")
+    except PyMongoError:
+        client.close()
+        pytest.skip(f"No mongod reachable at {MONGODB_TEST_URI}")
+    db = client.get_database(f"chatbot_test_{uuid.uuid4().hex[:8]}")
+    try:
+        yield db
+    finally:
+        client.drop_database(db.name)
+        client.close()
+
+def test_indexes_are_created(db):
+    ensure_indexes(db)
+    for collection_name, indexes in INDEXES.items():
+        names = set(db.get_collection(collection_name).index_information())
+        assert {index.document["name"] for index in indexes} <= names
+
+def test_no_query_shape_scans_a_collection(db):
+    ensure_indexes(db)
+    report = check_query_plans(db)
+    assert report
+    assert [row for row in report if row["COLLSCAN"] is not False] == []
+
+def test_query_shapes_scan_without_indexes(db):
+    db.get_collection("users").insert_one({"username": "x", "email": "x"})
+    report = check_query_plans(db)
+    assert any(row["COLLSCAN"] for row in report)
+
+def test_check_fails_when_a_plan_cannot_be_explained(monkeypatch):
+    report = [
+        {"Collection": "users", "Query": "User.get_one by username", "Plan": "LIMIT > FETCH > IXSCAN", "COLLSCAN": False},
+        {"Collection": "vectors", "Query": "delete_source_vectors", "Plan": "Error: not authorized", "COLLSCAN": None},
+    ]
+    monkeypatch.setattr(query_plan_check, "check_query_plans", lambda db=None: report)
+    assert query_plan_check.run_check() is False
+    monkeypatch.setattr(query_plan_check, "check_query_plans", lambda db=None: report[:1])
+    assert query_plan_check.run_check() is True
+
+def test_winning_plans_are_found_in_aggregation_explains():
+    explain = {"stages": [
+        {"$cursor": {"queryPlanner": {"winningPlan": {"stage": "PROJECTION_COVERED", "inputStage": {"stage": "IXSCAN"}}}}},
+        {"$group": {}},
+    ]}
+    plans = find_winning_plans(explain)
+    assert find_plan_stages(plans) == ["PROJECTION_COVERED", "IXSCAN"]
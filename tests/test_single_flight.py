@@ -0,0 +1,79 @@
+import gc
+import threading
+import time
+import pytest
+
+pytest.importorskip("streamlit")
+from tools.cache import SingleFlight
+
+def tokens():
+    yield from ["Halo", " ", "dunia"]
+
+def test_do_shares_result_with_concurrent_callers():
+    single_flight = SingleFlight()
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return "jawaban"
+
+    threads = [threading.Thread(target=lambda: results.append(single_flight.do("key", compute))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {result for result, _ in results} == {"jawaban"}
+
+def test_do_runs_itself_after_timeout():
+    single_flight = SingleFlight(timeout=0.1)
+    release = threading.Event()
+    leader = threading.Thread(target=lambda: single_flight.do("key", lambda: release.wait(2)))
+    leader.start()
+    time.sleep(0.05)
+
+    assert single_flight.do("key", lambda: "own") == ("own", False)
+    release.set()
+    leader.join()
+
+def test_stream_followers_receive_all_items():
+    single_flight = SingleFlight()
+    leader, shared = single_flight.stream("key", tokens)
+    follower, follower_shared = single_flight.stream("key", tokens)
+
+    assert (shared, follower_shared) == (False, True)
+    assert "".join(leader) == "Halo dunia"
+    assert "".join(follower) == "Halo dunia"
+
+def test_stream_dropped_before_start_releases_key():
+    single_flight = SingleFlight(timeout=1)
+    leader, _ = single_flight.stream("key", tokens)
+    follower, _ = single_flight.stream("key", tokens)
+    del leader
+    gc.collect()
+
+    with pytest.raises(RuntimeError):
+        list(follower)
+    items, shared = single_flight.stream("key", tokens)
+    assert not shared
+    assert "".join(items) == "Halo dunia"
+
+def test_stream_follower_times_out():
+    single_flight = SingleFlight(timeout=0.1)
+
+    def slow_tokens():
+        time.sleep(1)
+        yield "terlambat"
+
+    leader, _ = single_flight.stream("key", slow_tokens)
+    consumer = threading.Thread(target=lambda: list(leader))
+    consumer.start()
+    time.sleep(0.05)
+    follower, _ = single_flight.stream("key", slow_tokens)
+
+    with pytest.raises(TimeoutError):
+        list(follower)
+    consumer.join()